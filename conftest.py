@@ -0,0 +1,10 @@
+"""Test configuration"""
+
+import pytest
+from kcidb_io.schema import cache
+
+
+@pytest.fixture(autouse=True)
+def isolate_cache(tmp_path, monkeypatch):
+    """Keep the compiled validation code cache within the test's directory"""
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path / "cache"))
@@ -1,3 +1,3 @@
 """Kernel CI reporting I/O data"""
 
-from kcidb_io import schema, misc # noqa Silence flake8 "imported but unused" warning
+from kcidb_io import schema, misc, stream # noqa Silence flake8 "imported but unused" warning
@@ -1,11 +1,21 @@
 """Kernel CI reporting I/O data - misc definitions"""
 
 import os
-from itertools import repeat
+import json
+import hashlib
 
 # Check light assertions only, if True
 LIGHT_ASSERTS = not os.environ.get("KCIDB_IO_HEAVY_ASSERTS", "")
 
+# Validate with schema-specific compiled code first, if True.
+# Use the generic JSON schema validator only, if False.
+COMPILED_VALIDATION = not os.environ.get("KCIDB_IO_GENERIC_VALIDATION", "")
+
+# The directory to cache compiled validation code in, or None to disable the
+# cache. Taken from KCIDB_IO_CACHE_DIR environment variable, disabled if it's
+# not set, or empty.
+CACHE_DIR = os.environ.get("KCIDB_IO_CACHE_DIR") or None
+
 # A dictionary of JSON value types, and their identity / sorting key.
 JSON_TYPES = {
     type(None): 0,
@@ -31,20 +41,145 @@ def json_sort_key(value, set_depth=0):
     Returns: The sorting key.
     """
     type_identity = JSON_TYPES[type(value)]
-    set_depth -= 1
     if type_identity == JSON_TYPES[list]:
+        set_depth -= 1
+        keys = [json_sort_key(v, set_depth) for v in value]
+        if set_depth >= 0:
+            keys.sort()
+        value = tuple(keys)
+    elif type_identity == JSON_TYPES[dict]:
+        set_depth -= 1
         value = tuple(sorted(
-            map(json_sort_key, value, repeat(set_depth)),
-            key=(None if set_depth >= 0 else lambda v: 0)
+            (k, json_sort_key(v, set_depth)) for k, v in value.items()
         ))
-    elif type_identity == JSON_TYPES[dict]:
-        value = tuple(sorted(map(
-            lambda kv: (kv[0], json_sort_key(kv[1], set_depth)),
-            value.items()
-        )))
     return (type_identity, value)
 
 
+def _json_encode_str(value):
+    """Produce a canonical binary encoding of a JSON string"""
+    data = value.encode("utf-8", "surrogatepass")
+    return b"s%d:%b" % (len(data), data)
+
+
+# A dictionary of JSON scalar types, and functions producing canonical binary
+# encodings of their values
+_JSON_SCALAR_ENCODERS = {
+    type(None): lambda value: b"n",
+    bool: lambda value: b"t" if value else b"f",
+    int: lambda value: b"i%d;" % value,
+    # Adding zero turns negative zero into positive, equal to it
+    float: lambda value: b"r%b;" % repr(value + 0.0).encode(),
+    str: _json_encode_str,
+}
+
+
+def _json_encode(value, set_depth):
+    """
+    Produce a canonical binary encoding of a JSON value, which is equal for
+    two values if, and only if, their sorting keys are equal. Containers
+    with unordered sets inside are encoded with the digests of their
+    canonical contents, and the rest with their canonical JSON text.
+
+    Args:
+        value:      The JSON value to encode.
+        set_depth:  The container depth up to which arrays should be
+                    considered unordered sets.
+
+    Returns: The encoding bytes.
+    """
+    value_type = type(value)
+    if value_type in _JSON_SCALAR_ENCODERS:
+        return _JSON_SCALAR_ENCODERS[value_type](value)
+    # If there are no unordered sets inside, encode as canonical JSON text
+    if set_depth <= 0:
+        text = _json_dumps_canonical(value)
+        if text is not None:
+            data = text.encode("utf-8", "surrogatepass")
+            return b"j%d:%b" % (len(data), data)
+    set_depth -= 1
+    type_identity = JSON_TYPES[value_type]
+    if type_identity == JSON_TYPES[list]:
+        encodings = [_json_encode(v, set_depth) for v in value]
+        if set_depth >= 0:
+            encodings.sort()
+        return b"l" + _json_hash(encodings)
+    assert type_identity == JSON_TYPES[dict]
+    return b"d" + _json_hash(
+        _json_encode(k, set_depth) + _json_encode(v, set_depth)
+        for k, v in sorted(value.items())
+    )
+
+
+# The encoder producing canonical JSON text, with arrays considered ordered
+_JSON_CANONICAL_ENCODER = json.JSONEncoder(
+    sort_keys=True, ensure_ascii=False, allow_nan=False,
+    separators=(",", ":")
+)
+
+
+def _json_positive_zero(value):
+    """Copy a JSON value replacing negative zeros with positive ones"""
+    if isinstance(value, float):
+        return value + 0.0
+    if isinstance(value, (list, tuple)):
+        return [_json_positive_zero(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _json_positive_zero(v) for k, v in value.items()}
+    return value
+
+
+def _json_dumps_canonical(value):
+    """
+    Produce a canonical JSON text for a JSON value, with arrays considered
+    ordered, which is equal for two values if, and only if, their sorting
+    keys are equal.
+
+    Args:
+        value:  The JSON value to produce the text for.
+
+    Returns:
+        The JSON text, or None if the value cannot be represented with it
+        (contains NaNs, infinities, or non-JSON types).
+    """
+    try:
+        text = _JSON_CANONICAL_ENCODER.encode(value)
+        # Negative zeros are equal to positive ones, normalize
+        if "-0.0" in text:
+            text = _JSON_CANONICAL_ENCODER.encode(_json_positive_zero(value))
+    except (TypeError, ValueError):
+        return None
+    return text
+
+
+def _json_hash(encodings):
+    """
+    Hash a sequence of canonical JSON value encodings.
+
+    Args:
+        encodings:  An iterable of encodings to hash.
+
+    Returns: The digest bytes.
+    """
+    return hashlib.blake2b(b"".join(encodings), digest_size=20).digest()
+
+
+def json_digest(value, set_depth=0):
+    """
+    Produce a canonical digest of a JSON value: the same for any two values
+    compared equal by json_cmp(), and (practically) different for any two
+    values compared unequal. Can be computed once and kept to compare
+    values faster.
+
+    Args:
+        value:      The JSON value to produce the digest for.
+        set_depth:  The container depth up to which arrays should be
+                    considered unordered sets.
+
+    Returns: The digest bytes.
+    """
+    return _json_hash((_json_encode(value, set_depth),))
+
+
 def json_cmp(a, b, set_depth=0):
     """
     Compare two (sorted) JSON values.
@@ -60,6 +195,9 @@ def json_cmp(a, b, set_depth=0):
          0 - a == b,
          1 - a > b.
     """
+    # Only build the (big) sorting keys, if the values are different
+    if json_digest(a, set_depth) == json_digest(b, set_depth):
+        return 0
     a_key = json_sort_key(a, set_depth)
     b_key = json_sort_key(b, set_depth)
     return 0 if a_key == b_key else (-1 if a_key < b_key else 1)
@@ -1,24 +1,82 @@
-"""Kernel CI reporting I/O schema"""
-from kcidb_io.schema.abstract import Version as VA  # noqa: F401
-from kcidb_io.schema.v01_01 import Version as V1_1  # noqa: F401
-from kcidb_io.schema.v02_00 import Version as V2_0  # noqa: F401
-from kcidb_io.schema.v03_00 import Version as V3_0  # noqa: F401
-from kcidb_io.schema.v04_00 import Version as V4_0  # noqa: F401
-from kcidb_io.schema.v04_01 import Version as V4_1  # noqa: F401
-from kcidb_io.schema.v04_02 import Version as V4_2  # noqa: F401
-from kcidb_io.schema.v04_03 import Version as V4_3  # noqa: F401
-from kcidb_io.schema.v04_04 import Version as V4_4  # noqa: F401
-from kcidb_io.schema.v04_05 import Version as V4_5  # noqa: F401
-from kcidb_io.schema.v05_00 import Version as V5_0  # noqa: F401
-from kcidb_io.schema.v05_01 import Version as V5_1  # noqa: F401
-from kcidb_io.schema.v05_02 import Version as V5_2  # noqa: F401
-from kcidb_io.schema.v05_03 import Version as V5_3  # noqa: F401
-
-# Legacy versions
-V1 = V1_1  # noqa: F401
-V2 = V2_0  # noqa: F401
-V3 = V3_0  # noqa: F401
-V4 = V4_0  # noqa: F401
-
-# Latest version of the schema
-LATEST = V5_3
+"""
+Kernel CI reporting I/O schema
+
+The version classes (and other definitions) are loaded on first access, so
+importing the package doesn't build any schemas. Note that accessing a
+version loads all the versions preceding it, as it inherits from them.
+"""
+from importlib import import_module
+
+# A dictionary of the names of definitions loaded on first access, and
+# tuples of the names of modules defining them, and their names there
+_LAZY = dict(
+    VA=("abstract", "Version"),
+    COPY_ON_WRITE=("abstract", "COPY_ON_WRITE"),
+    ValidationFailure=("abstract", "ValidationFailure"),
+    ValidData=("abstract", "ValidData"),
+    Builder=("abstract", "Builder"),
+    Index=("index", "Index"),
+    DanglingReference=("index", "DanglingReference"),
+    V1_1=("v01_01", "Version"),
+    V2_0=("v02_00", "Version"),
+    V3_0=("v03_00", "Version"),
+    V4_0=("v04_00", "Version"),
+    V4_1=("v04_01", "Version"),
+    V4_2=("v04_02", "Version"),
+    V4_3=("v04_03", "Version"),
+    V4_4=("v04_04", "Version"),
+    V4_5=("v04_05", "Version"),
+    V5_0=("v05_00", "Version"),
+    V5_1=("v05_01", "Version"),
+    V5_2=("v05_02", "Version"),
+    V5_3=("v05_03", "Version"),
+    # Legacy versions
+    V1=("v01_01", "Version"),
+    V2=("v02_00", "Version"),
+    V3=("v03_00", "Version"),
+    V4=("v04_00", "Version"),
+    # Latest version of the schema
+    LATEST=("v05_03", "Version"),
+)
+
+
+def __getattr__(name):
+    """
+    Load a definition on first access.
+
+    Args:
+        name:   The name of the definition to load.
+
+    Returns:
+        The loaded definition.
+
+    Raises:
+        AttributeError - the definition doesn't exist.
+    """
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr_name = _LAZY[name]
+    value = getattr(import_module(f"{__name__}.{module_name}"), attr_name)
+    # Don't get here again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the module's definitions, including the ones not loaded yet"""
+    return sorted(set(globals()) | set(_LAZY))
+
+
+def get(major, minor):
+    """
+    Get a schema version by its numbers.
+
+    Args:
+        major:  The major number of the version to get.
+        minor:  The minor number of the version to get.
+
+    Returns:
+        The schema version with the specified numbers, or None, if not found.
+    """
+    # It's loaded on access, pylint: disable=undefined-variable
+    return LATEST.lookup(major, minor)  # noqa: F821
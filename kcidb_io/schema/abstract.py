@@ -1,25 +1,1047 @@
 """Kernel CI reporting I/O schema - abstract definitions"""
 
+from array import array
+from collections import namedtuple
 from copy import deepcopy
 from abc import ABC, ABCMeta, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from functools import lru_cache
+from operator import itemgetter
+from itertools import chain, islice, repeat
+from tempfile import TemporaryFile
+import heapq
+import json
 import random
+import sys
+import zlib
+from urllib.parse import unquote
 import jsonschema
-from kcidb_io.misc import LIGHT_ASSERTS, json_cmp
+from kcidb_io.misc import LIGHT_ASSERTS, COMPILED_VALIDATION, json_cmp
+from kcidb_io.stream import parse, Writer
+from kcidb_io.schema.compiler import UnsupportedSchema, compile_schema
+from kcidb_io.schema.formats import FORMAT_CHECKER
+from kcidb_io.schema.index import Index, get_links, get_order, \
+    init_worker, find_dangling_references, find_dangling_references_in_worker
+
+# It's OK, pylint: disable=too-many-lines
+
+# Minimum number of objects to validate per parallel task
+PARALLEL_CHUNK_SIZE_MIN = 256
+
+# Default number of partitions (temporary files) to split objects into,
+# when deduplicating them out of memory
+DEDUP_PARTITIONS = 64
+
+# Number of objects read from a stream to measure at once, when splitting
+SPLIT_BATCH_SIZE = 64
+
+# The value of "copy" arguments requesting the data to be copied on write:
+# only the containers being modified are copied, and the rest is shared with
+# the original data. Neither must be modified in place afterwards.
+COPY_ON_WRITE = "on_write"
+
+# The metadata map value meaning metadata can appear anywhere in a value
+# (except under "misc" properties)
+METADATA_ANYWHERE = "anywhere"
+
+# A validation error located in the data: the name of the top-level list
+# containing the invalid object (an empty string for errors outside
+# objects), the object's ID (a single value, or a tuple of values of the
+# ID fields, like get_ids() returns), or None if unknown, or not in an
+# object, the JSON pointer to the invalid value, and the error message
+ValidationFailure = namedtuple(
+    "ValidationFailure", "obj_list_name obj_id pointer message"
+)
+
+
+def _get_obj_pointer(schema_cls, obj_list_name):
+    """
+    Get the JSON pointer (URI fragment) to the schema of objects in a
+    top-level list of data, for a given Version subclass.
+
+    Args:
+        schema_cls:     The Version subclass to get the pointer for.
+        obj_list_name:  The name of the object list to get the pointer for,
+                        or an empty string to get the pointer to the whole
+                        data schema.
+
+    Returns:
+        The JSON pointer, or None if the schema doesn't describe the objects.
+    """
+    if not obj_list_name:
+        return "#"
+    try:
+        schema_cls.json["properties"][obj_list_name]["items"]
+    except (KeyError, TypeError):
+        return None
+    return f"#/properties/{obj_list_name}/items"
 
 
 @lru_cache(maxsize=None)
-def _build_validator_for(schema_cls):
-    """Return a compiled Draft7 validator for a given Version subclass.
+def _build_validator_for(schema_cls, obj_list_name=""):
+    """Return a compiled Draft7 validator for a given Version subclass, and
+    either the whole data (empty obj_list_name), or objects in the
+    specified top-level list.
 
     Cached per-class via lru_cache; safe across supported Python versions.
     """
-    return jsonschema.Draft7Validator(
+    validator = jsonschema.Draft7Validator(
         schema=schema_cls.json,
-        format_checker=jsonschema.Draft7Validator.FORMAT_CHECKER,
+        format_checker=FORMAT_CHECKER,
+    )
+    if obj_list_name:
+        # Resolve references against the whole schema, as descending does
+        pointer = _get_obj_pointer(schema_cls, obj_list_name)
+        validator = validator.evolve(
+            schema=True if pointer is None else
+            schema_cls.json["properties"][obj_list_name]["items"]
+        )
+    return validator
+
+
+@lru_cache(maxsize=None)
+def _build_compiled_validators_for(schema_cls):
+    """Return a dictionary of functions checking validity of data for a
+    given Version subclass, compiled from its schema. The functions are
+    keyed by the names of the object lists they check the objects of, and
+    the function checking the whole data is keyed by an empty string.
+    Return None if compiled validation is disabled, or the schema is not
+    supported by the compiler.
+
+    Cached per-class via lru_cache.
+    """
+    if not COMPILED_VALIDATION:
+        return None
+    pointers = {
+        name: _get_obj_pointer(schema_cls, name)
+        for name in schema_cls.graph
+    }
+    try:
+        functions = compile_schema(
+            schema_cls.json,
+            # Keep the code (and its cache key) the same across processes
+            pointers=sorted(set(pointers.values()) - {None}),
+            format_checker=FORMAT_CHECKER,
+            cache_name=f"v{schema_cls.major}.{schema_cls.minor}",
+        )
+    except UnsupportedSchema:
+        return None
+    return {
+        name: (lambda obj: True) if pointer is None else functions[pointer]
+        for name, pointer in pointers.items()
+    }
+
+
+def _build_compiled_validator_for(schema_cls, obj_list_name=""):
+    """Return a function checking validity of either the whole data (empty
+    obj_list_name), or objects in the specified top-level list, for a given
+    Version subclass, compiled from its schema. Return None if compiled
+    validation is disabled, or the schema is not supported by the compiler.
+    """
+    validators = _build_compiled_validators_for(schema_cls)
+    return None if validators is None else validators[obj_list_name]
+
+
+def _explain_invalid_obj(schema_cls, obj_list_name, index, obj):
+    """
+    Raise the error explaining why an object in a top-level list of data
+    is invalid.
+
+    Args:
+        schema_cls:     The Version subclass the object is invalid for.
+        obj_list_name:  The name of the list containing the object.
+        index:          The index of the object in the list.
+        obj:            The invalid object.
+
+    Raises:
+        `jsonschema.exceptions.ValidationError` describing the problem,
+        with the path relative to the data.
+    """
+    error = jsonschema.exceptions.best_match(
+        _build_validator_for(schema_cls, obj_list_name).iter_errors(obj)
+    )
+    assert LIGHT_ASSERTS or error is not None, \
+        "Compiled validator rejected valid data"
+    if error is not None:
+        # Make the error relative to the whole data
+        error.relative_path.extendleft((index, obj_list_name))
+        error.relative_schema_path.extendleft(
+            ("items", obj_list_name, "properties")
+        )
+        raise error
+
+
+def _find_invalid_obj(schema_cls, obj_list_name, objs):
+    """
+    Find the first invalid object in a list.
+
+    Args:
+        schema_cls:     The Version subclass to validate against.
+        obj_list_name:  The name of the top-level list the objects belong
+                        to.
+        objs:           The list of objects to check.
+
+    Returns:
+        The index of the first invalid object, or None if all are valid.
+    """
+    is_valid = _build_compiled_validator_for(schema_cls, obj_list_name) or \
+        _build_validator_for(schema_cls, obj_list_name).is_valid
+    for index, obj in enumerate(objs):
+        if not is_valid(obj):
+            return index
+    return None
+
+
+def _chunk_obj_lists(obj_lists, workers):
+    """
+    Split objects in lists into chunks for processing in parallel, a few
+    per worker, to balance load.
+
+    Args:
+        obj_lists:  A dictionary of object list names, and lists of objects.
+        workers:    The number of worker processes to split the objects
+                    for.
+
+    Returns:
+        A list of tuples, one per chunk, in the order of the lists and the
+        objects: the name of the chunk's object list, the offset of the
+        chunk's first object in it, and the list of the chunk's objects.
+    """
+    chunk_size = max(
+        PARALLEL_CHUNK_SIZE_MIN,
+        -(-sum(map(len, obj_lists.values())) // (workers * 4))
+    )
+    return [
+        (name, offset, objs[offset:offset + chunk_size])
+        for name, objs in obj_lists.items()
+        for offset in range(0, len(objs), chunk_size)
+    ]
+
+
+def _get_json_pointer(path):
+    """
+    Format a JSON pointer (RFC 6901) to a value within a JSON document.
+
+    Args:
+        path:   An iterable of property names and array indexes leading to
+                the value from the root.
+
+    Returns:
+        The JSON pointer string.
+    """
+    return "".join(
+        "/" + str(token).replace("~", "~0").replace("/", "~1")
+        for token in path
     )
 
 
+def _get_obj_id(id_fields, obj):
+    """
+    Get the ID of an object, as get_ids() returns it.
+
+    Args:
+        id_fields:  The names of the object's ID fields.
+        obj:        The object to get the ID of. Doesn't have to be valid.
+
+    Returns:
+        The ID: a single value, or a tuple of values of the ID fields, or
+        None if the object is not a dictionary, or is missing an ID field.
+    """
+    if not isinstance(obj, dict) or any(f not in obj for f in id_fields):
+        return None
+    if len(id_fields) == 1:
+        return obj[next(iter(id_fields))]
+    return tuple(obj[f] for f in id_fields)
+
+
+def _iter_invalid_objs(schema_cls, obj_list_name, objs):
+    """
+    Find invalid objects in a top-level list of data, and describe where
+    each of their validation errors is.
+
+    Args:
+        schema_cls:     The Version subclass to validate against.
+        obj_list_name:  The name of the top-level list the objects belong
+                        to.
+        objs:           The list of objects to check.
+
+    Returns:
+        A generator of tuples, one per invalid object: the object's index
+        in the list, and a list of ValidationFailure named tuples describing
+        its errors.
+    """
+    id_fields = schema_cls.id_fields.get(obj_list_name, ())
+    is_valid = _build_compiled_validator_for(schema_cls, obj_list_name)
+    validator = _build_validator_for(schema_cls, obj_list_name)
+    for index, obj in enumerate(objs):
+        if is_valid is not None and is_valid(obj):
+            continue
+        obj_id = _get_obj_id(id_fields, obj)
+        failures = [
+            ValidationFailure(
+                obj_list_name, obj_id,
+                _get_json_pointer(
+                    chain((obj_list_name, index), error.absolute_path)
+                ),
+                error.message
+            )
+            for error in validator.iter_errors(obj)
+        ]
+        assert LIGHT_ASSERTS or is_valid is None or failures, \
+            "Compiled validator rejected valid data"
+        if failures:
+            yield index, failures
+
+
+@lru_cache(maxsize=None)
+def _get_id_getters(schema_cls):
+    """
+    Return a dictionary of object list names and functions retrieving the
+    IDs of objects in them, as Version.get_ids() returns them, for a given
+    Version subclass. Cached per-class.
+    """
+    return {
+        obj_list_name: itemgetter(*id_fields)
+        for obj_list_name, id_fields in schema_cls.id_fields.items()
+    }
+
+
+def _intern_id(obj_id):
+    """Intern the strings in an object ID (as returned by get_ids())"""
+    if isinstance(obj_id, str):
+        return sys.intern(obj_id)
+    if isinstance(obj_id, tuple):
+        return tuple(sys.intern(value) if isinstance(value, str) else value
+                     for value in obj_id)
+    return obj_id
+
+
+def _get_array_typecode(max_value):
+    """
+    Get the code of the smallest array.array type able to store unsigned
+    integers up to the specified value.
+    """
+    for typecode in "BHIQ":
+        if max_value < 1 << (array(typecode).itemsize * 8):
+            return typecode
+    raise OverflowError(f"Value {max_value} is too large for an array")
+
+
+def _pick_second_randomly():
+    """
+    Pick either of two deduplicated attribute values randomly, the same way
+    databases are expected to.
+
+    Returns:
+        True if the second value should be picked, false otherwise.
+    """
+    return random.getrandbits(1)
+
+
+def _merge_objs(first, second, pick_second):
+    """
+    Merge the second object into the first, unless the same.
+
+    Args:
+        first:          The object to merge into.
+        second:         The object to merge from.
+        pick_second:    A function called for each attribute present in both
+                        objects, without arguments. If it returns false, the
+                        first object's value is kept, otherwise the second
+                        object's value is picked.
+
+    Returns:
+        The first object.
+    """
+    if first is not second:
+        for attr in first:
+            if attr in second and pick_second():
+                first[attr] = second[attr]
+        for attr in second:
+            if attr not in first:
+                first[attr] = second[attr]
+    return first
+
+
+def _dedup_objs(obj_dict, id_fields, objs, pick_second, copies=None):
+    """
+    Add objects to a dictionary of objects keyed by their IDs, merging those
+    with IDs already in the dictionary into the objects there.
+
+    Args:
+        obj_dict:       The dictionary to add the objects to, with their
+                        IDs (as returned by get_ids()) as keys.
+        id_fields:      The names of the objects' ID fields.
+        objs:           An iterable of objects to add.
+        pick_second:    A function called for each merged attribute, see
+                        _merge_objs().
+        copies:         A set of id()s of the objects in the dictionary
+                        which are copies and can be merged into, if others
+                        need to be copied first. None, if any object can be
+                        merged into. Will be updated with new copies.
+    """
+    get_id = itemgetter(*id_fields)
+    for obj in objs:
+        obj_id = get_id(obj)
+        first = obj_dict.setdefault(obj_id, obj)
+        if first is obj:
+            continue
+        if copies is not None and id(first) not in copies:
+            first = obj_dict[obj_id] = dict(first)
+            copies.add(id(first))
+        _merge_objs(first, obj, pick_second)
+
+
+def _dedup_spilled_objs(file, obj_id_fields, pick_second):
+    """
+    Deduplicate objects spilled to a file by Version._spill_objs(), as
+    Version.dedup() would.
+
+    Args:
+        file:           The text file with the spilled objects.
+        obj_id_fields:  A list of the names of ID fields of objects in each
+                        object list, in the order of the lists' positions.
+        pick_second:    A function called for each merged attribute, see
+                        _merge_objs().
+
+    Returns:
+        A list of the deduplicated items, each a list containing the
+        object's list position, its (first) index in the list, and the
+        object, in the order of the first appearance.
+    """
+    item_dict = {}
+    file.seek(0)
+    for line in file:
+        item = json.loads(line)
+        obj_list_pos, _, obj = item
+        first = item_dict.setdefault(
+            (obj_list_pos, tuple(map(obj.get, obj_id_fields[obj_list_pos]))),
+            item
+        )
+        if first is not item:
+            _merge_objs(first[2], obj, pick_second)
+    return list(item_dict.values())
+
+
+def _join_spilled_objs(skeleton, obj_list_names, files):
+    """
+    Join a dataset with object lists empty, and its (deduplicated) objects
+    spilled to files, sorted by object list positions and indexes.
+
+    Args:
+        skeleton:       The dataset with object lists empty.
+        obj_list_names: A list of the names of object lists, in the order of
+                        the lists' positions.
+        files:          A list of text files with the spilled objects.
+
+    Returns:
+        A generator of tuples describing the dataset in the format generated
+        by kcidb_io.stream.parse().
+    """
+    items = heapq.merge(*(map(json.loads, file) for file in files),
+                        key=lambda item: item[:2])
+    item = next(items, None)
+    for name, value in skeleton.items():
+        yield name, None, value
+        index = 0
+        while item is not None and obj_list_names[item[0]] == name:
+            yield name, index, item[2]
+            index += 1
+            item = next(items, None)
+
+
+def _group_objs(schema_cls, data):
+    """
+    Group objects in a dataset along the schema's graph: each object goes
+    into the group of its first parent present in the dataset (in the
+    order of the graph), or starts a new group, if there's none. So each
+    checkout is grouped with its builds, their tests, and incidents.
+
+    Args:
+        schema_cls:     The schema version (a Version subclass) the data
+                        adheres to, exactly.
+        data:           The dataset to group the objects of.
+
+    Returns:
+        A list of groups, in the order of their first objects, each a list
+        of tuples of an object's list name, and the object, with parents
+        going before their children.
+    """
+    links = get_links(schema_cls)
+    # Object list names, and dictionaries of object IDs and group lists
+    obj_groups = {}
+    groups = []
+    for obj_list_name in get_order(schema_cls):
+        id_groups = obj_groups[obj_list_name] = {}
+        get_id = _get_id_getters(schema_cls)[obj_list_name]
+        for obj in data.get(obj_list_name, ()):
+            obj_id = get_id(obj)
+            group = id_groups.get(obj_id)
+            if group is None:
+                for parent_obj_list_name, fields in links[obj_list_name]:
+                    group = obj_groups[parent_obj_list_name].get(
+                        obj.get(fields[0]) if len(fields) == 1 else
+                        tuple(map(obj.get, fields))
+                    )
+                    if group is not None:
+                        break
+                else:
+                    group = []
+                    groups.append(group)
+                id_groups[obj_id] = group
+            group.append((obj_list_name, obj))
+    return groups
+
+
+def _get_origin(obj_list_name, obj):
+    """Get an object's origin, ignoring the name of its list"""
+    del obj_list_name
+    return obj["origin"]
+
+
+def _get_shard_getter(key, shards):
+    """
+    Get a function returning the shard of an object.
+
+    Args:
+        key:    A function accepting an object's list name and the object,
+                and returning its (hashable, JSON-serializable) sharding
+                key, or None to use the object's origin.
+        shards: The number of shards to distribute the keys over, by their
+                stable hashes, or None to use the keys as shards.
+
+    Returns:
+        A function accepting an object's list name and the object, and
+        returning its shard.
+    """
+    if key is None:
+        key = _get_origin
+    assert callable(key)
+    if shards is None:
+        return key
+    assert isinstance(shards, int) and shards > 0
+
+    @lru_cache(maxsize=4096)
+    def get_key_shard(obj_key):
+        """Get the shard number of a key"""
+        return zlib.crc32(json.dumps(obj_key).encode()) % shards
+
+    return lambda obj_list_name, obj: get_key_shard(key(obj_list_name, obj))
+
+
+class _Packer:
+    """A packer of objects into datasets within size limits"""
+
+    def __init__(self, schema_cls, skeleton, max_bytes, max_objects):
+        """
+        Initialize the packer.
+
+        Args:
+            schema_cls:     The schema version (a Version subclass) the
+                            objects adhere to, exactly.
+            skeleton:       The dataset's top-level properties, other than
+                            object lists, e.g. the version, to put into
+                            every dataset.
+            max_bytes:      The maximum size of each dataset serialized with
+                            json.dumps() (with default separators) in
+                            bytes, or None for no limit.
+            max_objects:    The maximum number of objects in each dataset,
+                            or None for no limit.
+        """
+        self.schema_cls = schema_cls
+        self.skeleton = skeleton
+        self.max_bytes = float("inf") if max_bytes is None else max_bytes
+        self.max_objects = \
+            float("inf") if max_objects is None else max_objects
+        # The object lists of the dataset being packed
+        self.lists = {}
+        # The serialized size of the dataset being packed
+        self.size = len(json.dumps(skeleton))
+        # The number of objects in the dataset being packed
+        self.count = 0
+
+    @staticmethod
+    def get_list_size(obj_list_name):
+        """
+        Get the serialized size an object list name adds to a dataset, with
+        the separator, the colon, and the brackets.
+        """
+        return len(json.dumps(obj_list_name)) + 4
+
+    def get_size(self, objs):
+        """
+        Get the serialized size of objects, with the separators before
+        them, or zero, if the size is not limited.
+
+        Args:
+            objs:   A list of the objects.
+
+        Returns:
+            The size of the objects.
+        """
+        if self.max_bytes == float("inf"):
+            return 0
+        # The brackets take as much as the separators
+        return len(json.dumps(objs))
+
+    def fits(self, group, group_size, empty=False):
+        """
+        Check if a group of objects fits into the dataset being packed.
+
+        Args:
+            group:      A list of tuples of object list names and objects.
+            group_size: The size of the group's objects, as returned by
+                        get_size().
+            empty:      True, if the fit into an empty dataset should be
+                        checked instead.
+
+        Returns:
+            True if the group fits, False otherwise.
+        """
+        lists = {} if empty else self.lists
+        return (0 if empty else self.count) + len(group) <= \
+            self.max_objects and \
+            (len(json.dumps(self.skeleton)) if empty else self.size) + \
+            group_size + sum(
+                self.get_list_size(name)
+                for name in {name for name, _ in group}
+                if name not in lists
+            ) <= self.max_bytes
+
+    def add(self, group, group_size):
+        """
+        Add a group of objects to the dataset being packed.
+
+        Args:
+            group:      A list of tuples of object list names and objects.
+            group_size: The size of the group's objects, as returned by
+                        get_size().
+        """
+        for obj_list_name, obj in group:
+            objs = self.lists.get(obj_list_name)
+            if objs is None:
+                objs = self.lists[obj_list_name] = []
+                self.size += self.get_list_size(obj_list_name)
+            objs.append(obj)
+        self.size += group_size
+        self.count += len(group)
+
+    def flush(self):
+        """
+        Finish the dataset being packed, and start a new one.
+
+        Returns:
+            The packed dataset.
+        """
+        data = dict(self.skeleton)
+        for name in self.schema_cls.id_fields:
+            if name in self.lists:
+                data[name] = self.lists[name]
+        assert LIGHT_ASSERTS or self.schema_cls.is_valid_exactly(data)
+        self.lists = {}
+        self.size = len(json.dumps(self.skeleton))
+        self.count = 0
+        return data
+
+
+def _pack_objs(packer, groups, keep_groups=True):
+    """
+    Pack groups of objects into datasets within size limits, keeping each
+    group in one dataset, if it fits into one, and requested.
+
+    Args:
+        packer:         The _Packer to pack the objects with.
+        groups:         An iterable of groups of objects, each a list of
+                        tuples of an object's list name and the object.
+        keep_groups:    True, if a group which doesn't fit into the
+                        dataset being packed should start a new one, if it
+                        fits there. False, if groups should only be used to
+                        measure objects in batches.
+
+    Returns:
+        A generator of datasets with objects. A dataset exceeds the limits
+        only if it has a single object.
+    """
+    for group in groups:
+        group_size = packer.get_size([obj for _, obj in group])
+        if not packer.fits(group, group_size):
+            # If the group fits into a new dataset, start one
+            if keep_groups and packer.fits(group, group_size, empty=True):
+                yield packer.flush()
+            # Else split the group between datasets
+            else:
+                for item in group:
+                    item_size = packer.get_size([item[1]])
+                    if packer.count and not packer.fits([item], item_size):
+                        yield packer.flush()
+                    packer.add([item], item_size)
+                continue
+        packer.add(group, group_size)
+    if packer.count:
+        yield packer.flush()
+
+
+def _inherit_obj_through(versions, states, first, obj_list_name, obj, add):
+    """
+    Inherit an object through a series of major versions, starting with the
+    specified one, inheriting the objects the versions add on the way
+    through the rest of the versions too.
+
+    Args:
+        versions:       A list of the major versions to inherit through, in
+                        history order. Each must have its own _inherit_obj()
+                        method.
+        states:         A list of the states of inheritance for each
+                        version.
+        first:          The position of the version to start with.
+        obj_list_name:  The name of the object's list in the version
+                        previous to the starting one.
+        obj:            The object to inherit.
+        add:            A function to call with a tuple for each inherited
+                        added object: its final list name, and the object.
+
+    Returns:
+        The final name of the object list and the inherited object.
+    """
+    # It's a recursion step, pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+    # No it's not, pylint: disable=protected-access
+    for pos in range(first, len(versions)):
+        version = versions[pos]
+        obj, added_objs = \
+            version._inherit_obj(states[pos], obj_list_name, obj)
+        obj_list_name = version._inherit_obj_list_name(obj_list_name)
+        for added_obj_list_name, added_obj in added_objs:
+            add(_inherit_obj_through(versions, states, pos + 1,
+                                     added_obj_list_name, added_obj, add))
+    return obj_list_name, obj
+
+
+def _get_inherited_names(names, versions):
+    """
+    Get the names of top-level properties of data inherited through a
+    series of major versions, in the order inheriting them one version at
+    a time produces: with the renamed object lists after the rest.
+
+    Args:
+        names:      A list of the names of the data's top-level properties,
+                    in order.
+        versions:   A list of the major versions the data is inherited
+                    through, in history order.
+
+    Returns:
+        A list of the inherited names of the properties, in order.
+    """
+    # No it's not, pylint: disable=protected-access
+    for version in versions:
+        renamed = [
+            name for name in names
+            if name and name in version.previous.graph and
+            version._inherit_obj_list_name(name) != name
+        ]
+        names = [name for name in names if name not in renamed] + \
+            list(map(version._inherit_obj_list_name, renamed))
+    return names
+
+
+@lru_cache(maxsize=None)
+def _get_history(schema_cls):
+    """Return the history tuple of a Version subclass. Cached per-class."""
+    return tuple(reversed(tuple(schema_cls.lineage)))
+
+
+@lru_cache(maxsize=None)
+def _get_registry(schema_cls):
+    """
+    Return the version registry for the lineage of a Version subclass.
+    Cached per-class.
+
+    Returns:
+        A dictionary of (major, minor) version number tuples and
+        versions in the lineage.
+    """
+    registry = {}
+    for version in schema_cls.lineage:
+        registry.setdefault((version.major, version.minor), version)
+    return registry
+
+
+@lru_cache(maxsize=None)
+def _get_registry_runs(schema_cls):
+    """
+    Return version registries for runs of consecutive versions in the
+    lineage of a Version subclass, which retrieve the schema version from
+    data the same way. Cached per-class.
+
+    Returns:
+        A tuple of tuples, one per run, in the lineage order, each
+        containing the first version in the run, a dictionary of (major,
+        minor) version number tuples and versions in the run, and a
+        dictionary of major version numbers and the latest versions with
+        them in the run.
+    """
+    runs = []
+    get_version = None
+    for version in schema_cls.lineage:
+        # No it's not, pylint: disable=protected-access
+        if version._get_version.__func__ is not get_version:
+            get_version = version._get_version.__func__
+            runs.append((version, {}, {}))
+        runs[-1][1].setdefault((version.major, version.minor), version)
+        runs[-1][2].setdefault(version.major, version)
+    return tuple(runs)
+
+
+def _map_metadata(root, schema, refs=()):
+    """
+    Map where metadata can appear in data valid according to a JSON schema.
+
+    Args:
+        root:   The root schema to resolve references against.
+        schema: The (sub)schema to map.
+        refs:   A tuple of the references being resolved, to detect
+                recursion with.
+
+    Returns:
+        A metadata map: None if metadata cannot appear, True if the value
+        itself is metadata, METADATA_ANYWHERE if metadata can appear
+        anywhere, or a dictionary of property names (and None for array
+        items) and metadata maps of their values.
+    """
+    if schema is True:
+        return METADATA_ANYWHERE
+    if not isinstance(schema, dict):
+        return None
+    types = schema.get("type", ())
+    types = [types] if isinstance(types, str) else types
+    # If nothing restricts the value to a non-container, or a literal
+    if not types and not any(
+        keyword in schema for keyword in
+        ("$ref", "allOf", "anyOf", "oneOf", "const", "enum")
+    ) or any(
+        isinstance(value, (dict, list))
+        for value in chain((schema.get("const"),), schema.get("enum", ()))
+    ):
+        return METADATA_ANYWHERE
+    maps = []
+    if "$ref" in schema:
+        ref = schema["$ref"]
+        if ref in refs or not ref.startswith("#"):
+            return METADATA_ANYWHERE
+        target = root
+        for token in ref[1:].split("/")[1:]:
+            token = unquote(token).replace("~1", "/").replace("~0", "~")
+            target = target[int(token) if isinstance(target, list)
+                            else token]
+        maps.append(_map_metadata(root, target, refs + (ref,)))
+    for keyword in ("allOf", "anyOf", "oneOf"):
+        maps.extend(_map_metadata(root, subschema, refs)
+                    for subschema in schema.get(keyword, []))
+    if "object" in types or "properties" in schema:
+        if schema.get("additionalProperties", True) is not False or \
+                schema.get("patternProperties"):
+            return METADATA_ANYWHERE
+        maps.append({
+            name: True if name.startswith("_") else
+            None if name == "misc" else
+            _map_metadata(root, subschema, refs)
+            for name, subschema in schema.get("properties", {}).items()
+        })
+    if "array" in types or "items" in schema:
+        items = schema.get("items", True)
+        maps.append({None: _merge_metadata_maps(
+            [_map_metadata(root, subschema, refs) for subschema in items]
+            if isinstance(items, list) else
+            [_map_metadata(root, items, refs)]
+        )})
+    return _merge_metadata_maps(maps)
+
+
+def _merge_metadata_maps(maps):
+    """
+    Merge metadata maps describing alternative locations of metadata.
+
+    Args:
+        maps:   A list of metadata maps to merge.
+
+    Returns:
+        The merged metadata map.
+    """
+    merged = None
+    for metadata_map in maps:
+        if metadata_map is None:
+            continue
+        if merged is None:
+            merged = metadata_map
+        elif metadata_map is METADATA_ANYWHERE or \
+                merged is METADATA_ANYWHERE or \
+                metadata_map is True or merged is True:
+            # Metadata can be mixed with non-metadata
+            return METADATA_ANYWHERE
+        else:
+            merged = {
+                name: _merge_metadata_maps([merged.get(name),
+                                            metadata_map.get(name)])
+                for name in {**merged, **metadata_map}
+            }
+    if isinstance(merged, dict):
+        merged = {
+            name: value for name, value in merged.items()
+            if value is not None
+        } or None
+    return merged
+
+
+@lru_cache(maxsize=None)
+def _get_metadata_map(schema_cls):
+    """
+    Return the map of where metadata can appear in data valid according to
+    a Version subclass (see _map_metadata()). Cached per-class.
+    """
+    return _map_metadata(schema_cls.json, schema_cls.json)
+
+
+def _has_metadata(node):
+    """Check if a dataset node has metadata anywhere"""
+    if isinstance(node, dict):
+        return any(
+            k.startswith("_") or k != "misc" and _has_metadata(v)
+            for k, v in node.items()
+        )
+    if isinstance(node, list):
+        return any(_has_metadata(v) for v in node)
+    return False
+
+
+def _has_mapped_metadata(node, metadata_map):
+    """
+    Check if a dataset node has metadata in the locations described by a
+    metadata map (see _map_metadata()).
+    """
+    if metadata_map is METADATA_ANYWHERE:
+        return _has_metadata(node)
+    if isinstance(node, dict):
+        return any(
+            name in node and (
+                value_map is True or
+                _has_mapped_metadata(node[name], value_map)
+            )
+            for name, value_map in metadata_map.items()
+            if name is not None
+        )
+    if isinstance(node, list) and None in metadata_map:
+        items_map = metadata_map[None]
+        # Check items with metadata fields only quickly
+        if isinstance(items_map, dict) and None not in items_map and \
+                all(value_map is True for value_map in items_map.values()):
+            return any(
+                name in item
+                for item in node if isinstance(item, dict)
+                for name in items_map
+            )
+        return any(_has_mapped_metadata(item, items_map) for item in node)
+    return False
+
+
+def _strip_metadata(node):
+    """Strip metadata from anywhere in a dataset node, in place"""
+    if isinstance(node, dict):
+        for k, v in list(node.items()):
+            if k.startswith("_"):
+                del node[k]
+            elif k != "misc":
+                _strip_metadata(v)
+    elif isinstance(node, list):
+        for v in node:
+            _strip_metadata(v)
+
+
+def _strip_mapped_metadata(node, metadata_map):
+    """
+    Strip metadata from the locations in a dataset node described by a
+    metadata map (see _map_metadata()), in place.
+    """
+    if metadata_map is METADATA_ANYWHERE:
+        _strip_metadata(node)
+    elif isinstance(node, dict):
+        for name, value_map in metadata_map.items():
+            if name is None or name not in node:
+                continue
+            if value_map is True:
+                del node[name]
+            else:
+                _strip_mapped_metadata(node[name], value_map)
+    elif isinstance(node, list) and None in metadata_map:
+        items_map = metadata_map[None]
+        for item in node:
+            _strip_mapped_metadata(item, items_map)
+
+
+def _strip_metadata_on_write(node):
+    """
+    Strip metadata from anywhere in a dataset node, copying the containers
+    being modified. Return the node, if it had no metadata, or the stripped
+    copy.
+    """
+    new_node = node
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k.startswith("_"):
+                if new_node is node:
+                    new_node = dict(node)
+                del new_node[k]
+            elif k != "misc":
+                new_v = _strip_metadata_on_write(v)
+                if new_v is not v:
+                    if new_node is node:
+                        new_node = dict(node)
+                    new_node[k] = new_v
+    elif isinstance(node, list):
+        for i, v in enumerate(node):
+            new_v = _strip_metadata_on_write(v)
+            if new_v is not v:
+                if new_node is node:
+                    new_node = list(node)
+                new_node[i] = new_v
+    return new_node
+
+
+def _strip_mapped_metadata_on_write(node, metadata_map):
+    """
+    Strip metadata from the locations in a dataset node described by a
+    metadata map (see _map_metadata()), copying the containers being
+    modified. Return the node, if it had no metadata, or the stripped copy.
+    """
+    if metadata_map is METADATA_ANYWHERE:
+        return _strip_metadata_on_write(node)
+    new_node = node
+    if isinstance(node, dict):
+        for name, value_map in metadata_map.items():
+            if name is None or name not in node:
+                continue
+            if value_map is True:
+                if new_node is node:
+                    new_node = dict(node)
+                del new_node[name]
+                continue
+            value = node[name]
+            new_value = _strip_mapped_metadata_on_write(value, value_map)
+            if new_value is not value:
+                if new_node is node:
+                    new_node = dict(node)
+                new_node[name] = new_value
+    elif isinstance(node, list) and None in metadata_map:
+        items_map = metadata_map[None]
+        for i, item in enumerate(node):
+            new_item = _strip_mapped_metadata_on_write(item, items_map)
+            if new_item is not item:
+                if new_node is node:
+                    new_node = list(node)
+                new_node[i] = new_item
+    return new_node
+
+
 class MetaVersion(ABCMeta):
     """Abstract schema version metaclass"""
     def __init__(cls, name, bases, _dict, **kwargs):
@@ -53,6 +1075,8 @@ class MetaVersion(ABCMeta):
             if base is Version:
                 assert "_inherit" not in _dict, \
                     "First version has own _inherit() method"
+                assert "_inherit_obj" not in _dict, \
+                    "First version has own _inherit_obj() method"
             # Else, this is not the first non-abstract version
             else:
                 assert cls.major >= base.major, \
@@ -61,6 +1085,9 @@ class MetaVersion(ABCMeta):
                     "Minor version has own _inherit() method"
                 assert cls.major == base.major or "_inherit" in _dict, \
                     "Major version has no own _inherit() method"
+                assert cls.major > base.major or \
+                    "_inherit_obj" not in _dict, \
+                    "Minor version has own _inherit_obj() method"
                 assert cls.major > base.major or cls.minor > base.minor, \
                     "Minor version number is lower than the previous one"
             assert isinstance(cls.json, dict)
@@ -132,13 +1159,14 @@ class MetaVersion(ABCMeta):
         first version (the direct child of the abstract version) and ending
         with this one.
         """
-        return tuple(reversed(tuple(cls.lineage)))
+        return _get_history(cls)
 
 
 class InheritanceImpossible(Exception):
     """Inheritance into new schema is impossible as data is ambiguous"""
 
 
+# It's the core, pylint: disable=too-many-public-methods
 class Version(ABC, metaclass=MetaVersion):
     """Abstract schema version"""
 
@@ -161,7 +1189,7 @@ class Version(ABC, metaclass=MetaVersion):
     # A map of object names and dictionaries of their ID fields and types
     id_fields = None
 
-    # Validator compiled per-class via module-level lru_cache
+    # Validators compiled per-class via module-level lru_cache
 
     @classmethod
     @abstractmethod
@@ -216,8 +1244,14 @@ class Version(ABC, metaclass=MetaVersion):
             A schema version exactly-compatible with the data version, or
             None, if not found.
         """
-        for version in cls.lineage:
-            if version.is_compatible_directly(data):
+        for first, _, latest in _get_registry_runs(cls):
+            # No it's not, pylint: disable=protected-access
+            major, minor = first._get_version(data)
+            try:
+                version = latest.get(major)
+            except TypeError:
+                continue
+            if version is not None and minor <= version.minor:
                 return version
         return None
 
@@ -249,11 +1283,31 @@ class Version(ABC, metaclass=MetaVersion):
             The schema exactly-compatible with the data version, or None, if
             not found.
         """
-        for version in cls.lineage:
-            if version.is_compatible_exactly(data):
+        for first, registry, _ in _get_registry_runs(cls):
+            # No it's not, pylint: disable=protected-access
+            try:
+                version = registry.get(first._get_version(data))
+            except TypeError:
+                continue
+            if version is not None:
                 return version
         return None
 
+    @classmethod
+    def lookup(cls, major, minor):
+        """
+        Look up a schema version in the history of this one, by its numbers.
+
+        Args:
+            major:  The major number of the version to look up.
+            minor:  The minor number of the version to look up.
+
+        Returns:
+            The schema version with the specified numbers, or None, if not
+            found.
+        """
+        return _get_registry(cls).get((major, minor))
+
     @classmethod
     def is_compatible(cls, data):
         """
@@ -281,19 +1335,36 @@ class Version(ABC, metaclass=MetaVersion):
         Returns:
             The number of objects in the data set.
         """
-        assert cls.is_compatible(data)
-        assert LIGHT_ASSERTS or cls.is_valid(data)
-        return sum(len(data[k])
-                   for k in cls.get_exactly_compatible(data).graph
-                   if k and k in data)
+        version = cls.get_exactly_compatible(data)
+        assert version is not None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        # No it's not, pylint: disable=protected-access
+        return version._count(data)
+
+    @classmethod
+    def _count(cls, data):
+        """
+        Calculate number of objects of any type in an I/O data set adhering to
+        this schema version exactly, without checking it.
+
+        Args:
+            data:   The data set to count the objects in.
+
+        Returns:
+            The number of objects in the data set.
+        """
+        return sum(len(data[k]) for k in cls.graph if k and k in data)
 
     @classmethod
-    def get_ids(cls, data):
+    def get_ids(cls, data, intern=False):
         """
         Get the IDs of objects in a data set.
 
         Args:
             data:   The data set to extract object IDs from.
+            intern: True if the strings in the IDs should be interned (see
+                    sys.intern()), so the IDs repeated across data sets are
+                    stored only once. False to return them as is.
 
         Returns:
             A dictionary of object list names (types), and lists of IDs of
@@ -302,96 +1373,614 @@ class Version(ABC, metaclass=MetaVersion):
             match the types, the order, and the number of the object's ID
             fields as described by the schema's "id_fields" attribute.
         """
-        assert cls.is_compatible(data)
-        assert LIGHT_ASSERTS or cls.is_valid(data)
+        version = cls.get_exactly_compatible(data)
+        assert version is not None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        # No it's not, pylint: disable=protected-access
+        return version._get_ids(data, intern)
+
+    @classmethod
+    def _get_ids(cls, data, intern=False):
+        """
+        Get the IDs of objects in a data set adhering to this schema version
+        exactly, without checking it.
+
+        Args:
+            data:   The data set to extract object IDs from.
+            intern: True if the strings in the IDs should be interned.
+
+        Returns:
+            A dictionary of object list names (types), and lists of IDs of
+            objects in the data set, as get_ids() returns.
+        """
         return {
-            obj_list_name: [
-                obj[list(id_fields)[0]]
-                if len(id_fields) == 1 else
-                tuple(obj[n] for n in id_fields)
-                for obj in data[obj_list_name]
-            ]
-            for obj_list_name, id_fields in
-            cls.get_exactly_compatible(data).id_fields.items()
+            obj_list_name: list(cls.iter_ids(obj_list_name,
+                                             data[obj_list_name],
+                                             intern=intern))
+            for obj_list_name in cls.id_fields
             if data.get(obj_list_name, [])
         }
 
     @classmethod
-    def validate_exactly(cls, data):
+    def iter_ids(cls, obj_list_name, objs, intern=False):
         """
-        Validate the data against this schema version only.
+        Extract the IDs of objects of a type, one by one, without
+        validating them.
 
         Args:
-            data:   The data to validate. Will not be changed.
+            obj_list_name:  The name of the object list (the type) the
+                            objects belong to, in this schema version.
+            objs:           An iterable of the objects to extract the IDs
+                            of, e.g. a generator, consumed lazily.
+            intern:         True if the strings in the IDs should be interned
+                            (see sys.intern()). False to return them as is.
 
         Returns:
-            The validated (but unchanged) data.
-
-        Raises:
-            `jsonschema.exceptions.ValidationError` if the data did not adhere
-            to this version of the schema.
+            An iterator returning the ID of each object, as get_ids() does.
         """
-        # Validate using the compiled validator cached per-class
-        _build_validator_for(cls).validate(data)
-        return data
+        ids = map(_get_id_getters(cls)[obj_list_name], objs)
+        return map(_intern_id, ids) if intern else ids
 
     @classmethod
-    def is_valid_exactly(cls, data):
+    def get_id_keys(cls, data):
         """
-        Check if data is valid according to this schema version only.
+        Get compact surrogate keys of objects' IDs in a data set: a small
+        integer for each distinct ID of each object type.
 
         Args:
-            data:   The data to check against the schema.
+            data:   The data set to extract object ID keys from.
 
         Returns:
-            True if the data is valid, false otherwise.
+            A dictionary of object list names (types), and tuples, each
+            containing an array.array of keys of the objects' IDs in the
+            list order, and a list of the distinct IDs (as returned by
+            get_ids()) in the order of appearance, indexed by the keys.
         """
-        try:
-            cls.validate_exactly(data)
-        except jsonschema.exceptions.ValidationError:
-            return False
-        return True
+        version = cls.get_exactly_compatible(data)
+        assert version is not None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        # No it's not, pylint: disable=protected-access
+        return version._get_id_keys(data)
 
     @classmethod
-    def validate(cls, data):
+    def _get_id_keys(cls, data):
         """
-        Validate the data against this or a previous schema version.
+        Get compact surrogate keys of objects' IDs in a data set adhering to
+        this schema version exactly, without checking it.
 
         Args:
-            data:   The data to validate. Will not be changed.
+            data:   The data set to extract object ID keys from.
 
         Returns:
-            The validated (but unchanged) data.
-
-        Raises:
-            `jsonschema.exceptions.ValidationError` if the data did not adhere
-            to this or a previous version of the schema.
+            A dictionary of object list names (types), and tuples of key
+            arrays and ID lists, as get_id_keys() returns.
         """
-        exactly_compatible = cls.get_exactly_compatible(data)
-        # Produce this version's validation failure if not compatible
-        return (exactly_compatible or cls).validate_exactly(data)
+        id_keys = {}
+        for obj_list_name in cls.id_fields:
+            objs = data.get(obj_list_name, [])
+            if not objs:
+                continue
+            # Distinct IDs and their keys, in the order of appearance
+            keys = {}
+            id_keys[obj_list_name] = (
+                array(
+                    _get_array_typecode(len(objs) - 1),
+                    (keys.setdefault(obj_id, len(keys))
+                     for obj_id in cls.iter_ids(obj_list_name, objs))
+                ),
+                list(keys)
+            )
+        return id_keys
 
     @classmethod
-    def is_valid(cls, data):
+    def index(cls, data):
         """
-        Check if data is valid according to this or previous schema version.
+        Build an index of objects in a data set by their IDs, and of the
+        parent/child links between them, in a single pass.
 
         Args:
-            data:   The data to check against the schema.
+            data:   The data set to index. Must not be changed while the
+                    index is in use.
 
         Returns:
-            True if the data is valid, false otherwise.
+            The Index of the data, for the schema version it adheres to,
+            exactly.
         """
-        try:
-            cls.validate(data)
-        except jsonschema.exceptions.ValidationError:
-            return False
-        return True
+        version = cls.get_exactly_compatible(data)
+        assert version is not None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        return Index(version, data)
 
     @classmethod
-    def new(cls):
+    def check_references(cls, data, known_ids=None, workers=None):
         """
-        Create an empty dataset for this schema version.
+        Find references from objects in a data set to their parents (e.g.
+        from builds to checkouts, or from incidents to tests and issues),
+        which don't resolve to objects in the data set, or to the
+        externally-known IDs, if specified.
+
+        Args:
+            data:       The data set to check.
+            known_ids:  A dictionary of object list names, and containers
+                        of IDs of objects known to exist outside the data
+                        set (e.g. sets), as get_ids() returns them for the
+                        data's version. None to only resolve references
+                        within the data set. Optional, default is None.
+            workers:    The number of worker processes to check objects
+                        with, in parallel. None or 1 to check in the
+                        calling process only. Optional, default is None.
+
+        Returns:
+            A list of DanglingReference named tuples, one for each
+            unresolved reference, in the order of objects' lists in the
+            schema's "id_fields" attribute, then of their parents' lists in
+            the graph, and then of the objects.
+        """
+        version = cls.get_exactly_compatible(data)
+        assert version is not None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        # No it's not, pylint: disable=protected-access
+        return version._check_references(data, known_ids, workers)
+
+    @classmethod
+    def _check_references(cls, data, known_ids, workers):
+        """
+        Find unresolved references from objects in a data set adhering to
+        this schema version exactly, to their parents, without checking it.
+
+        Args:
+            data:       The data set to check.
+            known_ids:  Same as for check_references().
+            workers:    Same as for check_references().
+
+        Returns:
+            A list of DanglingReference named tuples, as check_references()
+            returns.
+        """
+        version = cls
+        obj_lists = {
+            name: data[name] for name in version.id_fields
+            if data.get(name)
+        }
+        id_maps = (
+            {name: set(version.iter_ids(name, objs))
+             for name, objs in obj_lists.items()},
+        ) + ((known_ids,) if known_ids else ())
+        obj_lists = {
+            name: objs for name, objs in obj_lists.items()
+            if get_links(version)[name]
+        }
+        if workers is None or workers <= 1:
+            return list(chain.from_iterable(
+                find_dangling_references(version, name, objs, *id_maps)
+                for name, objs in obj_lists.items()
+            ))
+        chunks = _chunk_obj_lists(obj_lists, workers)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=init_worker,
+                                 initargs=id_maps) as executor:
+            return list(chain.from_iterable(executor.map(
+                find_dangling_references_in_worker,
+                repeat(version),
+                (name for name, _, _ in chunks),
+                (objs for _, _, objs in chunks)
+            )))
+
+    @classmethod
+    def validate_exactly(cls, data, workers=None):
+        """
+        Validate the data against this schema version only.
+
+        Args:
+            data:       The data to validate. Will not be changed.
+            workers:    The number of worker processes to validate objects
+                        in the data's top-level lists with, in parallel.
+                        None or 1 to validate in the calling process only.
+                        Optional, default is None.
+
+        Returns:
+            The validated (but unchanged) data.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not adhere
+            to this version of the schema. If validated in parallel, and
+            objects were invalid, the error describes the first invalid
+            object in the data, instead of being the best match among all
+            errors.
+        """
+        if workers is not None and workers > 1 and isinstance(data, dict):
+            return cls._validate_exactly_parallel(data, workers)
+        is_valid = _build_compiled_validator_for(cls)
+        # If there's no compiled validator, or it rejected the data
+        if is_valid is None or not is_valid(data):
+            # Have the generic validator explain what's wrong
+            _build_validator_for(cls).validate(data)
+            assert LIGHT_ASSERTS or is_valid is None, \
+                "Compiled validator rejected valid data"
+        else:
+            assert LIGHT_ASSERTS or _build_validator_for(cls).is_valid(data), \
+                "Compiled validator accepted invalid data"
+        return data
+
+    @classmethod
+    def _validate_exactly_parallel(cls, data, workers):
+        """
+        Validate the data against this schema version only, validating
+        objects in its top-level lists in parallel, using a process pool.
+
+        Args:
+            data:       The data to validate. Will not be changed.
+            workers:    The number of worker processes to use.
+
+        Returns:
+            The validated (but unchanged) data.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not adhere
+            to this version of the schema.
+        """
+        obj_lists = {
+            name: objs for name, objs in data.items()
+            if name and name in cls.graph and isinstance(objs, list)
+        }
+        # Validate everything except the objects in this process
+        cls.validate_exactly({
+            name: [] if name in obj_lists else value
+            for name, value in data.items()
+        })
+        chunks = _chunk_obj_lists(obj_lists, workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _find_invalid_obj,
+                repeat(cls),
+                (name for name, _, _ in chunks),
+                (objs for _, _, objs in chunks)
+            )
+            for (name, offset, _), index in zip(chunks, results):
+                if index is None:
+                    continue
+                executor.shutdown(cancel_futures=True)
+                index += offset
+                _explain_invalid_obj(cls, name, index,
+                                     obj_lists[name][index])
+        return data
+
+    @classmethod
+    def validate_stream(cls, stream):
+        """
+        Validate the data read from a stream incrementally, against this or
+        a previous schema version. Only keep one object from the data's
+        top-level lists in memory at a time, as long as the data's version
+        comes before them.
+
+        Args:
+            stream: The file-like object to read the data's JSON text (or its
+                    UTF-8 encoding) from.
+
+        Returns:
+            The schema version exactly-compatible with the data.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not adhere
+            to this or a previous version of the schema.
+            `json.JSONDecodeError` if the stream did not contain a JSON
+            object.
+        """
+        version = None
+        # Top-level properties, with object lists empty
+        skeleton = {}
+        # Items of top-level lists read before the version was known
+        pending = []
+
+        def add_item(name, index, value):
+            """Validate an object, or add a non-object item to skeleton"""
+            if name in version.graph:
+                # No it's not, pylint: disable=protected-access
+                version._validate_obj_exactly(name, index, value)
+            else:
+                skeleton[name].append(value)
+
+        for name, index, value in parse(stream):
+            if index is None:
+                skeleton[name] = value
+                if name == "version":
+                    # Produce this version's failures if not compatible
+                    version = cls.get_exactly_compatible(skeleton) or cls
+                    version.validate_exactly(skeleton)
+                    for args in pending:
+                        add_item(*args)
+                    pending = []
+            elif version is None:
+                pending.append((name, index, value))
+            else:
+                add_item(name, index, value)
+        if version is None:
+            version = cls
+            for args in pending:
+                add_item(*args)
+        version.validate_exactly(skeleton)
+        return version
+
+    @classmethod
+    def _validate_obj_exactly(cls, obj_list_name, index, obj):
+        """
+        Validate an object from a top-level list of data, against this
+        schema version only, without validating the rest of the data.
+
+        Args:
+            obj_list_name:  The name of the list containing the object.
+            index:          The index of the object in the list.
+            obj:            The object to validate. Will not be changed.
+
+        Returns:
+            The validated (but unchanged) object.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the object did not
+            adhere to this version of the schema, with the path relative to
+            the data.
+        """
+        is_valid = _build_compiled_validator_for(cls, obj_list_name) or \
+            _build_validator_for(cls, obj_list_name).is_valid
+        if not is_valid(obj):
+            _explain_invalid_obj(cls, obj_list_name, index, obj)
+        return obj
+
+    @classmethod
+    def validate_object(cls, obj_list_name, obj):
+        """
+        Validate an object from a top-level list of data against this
+        schema version only, without the data around it.
+
+        Args:
+            obj_list_name:  The name of the list the object belongs to.
+            obj:            The object to validate. Will not be changed.
+
+        Returns:
+            The validated (but unchanged) object.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the object did not
+            adhere to this version of the schema, with the path relative to
+            the object.
+        """
+        assert obj_list_name and obj_list_name in cls.graph, \
+            f"Unknown object list name {obj_list_name!r}"
+        is_valid = _build_compiled_validator_for(cls, obj_list_name)
+        if is_valid is None or not is_valid(obj):
+            _build_validator_for(cls, obj_list_name).validate(obj)
+            assert LIGHT_ASSERTS or is_valid is None, \
+                "Compiled validator rejected valid data"
+        return obj
+
+    @classmethod
+    def is_valid_object(cls, obj_list_name, obj):
+        """
+        Check if an object from a top-level list of data is valid according
+        to this schema version only, without the data around it.
+
+        Args:
+            obj_list_name:  The name of the list the object belongs to.
+            obj:            The object to check.
+
+        Returns:
+            True if the object is valid, false otherwise.
+        """
+        assert obj_list_name and obj_list_name in cls.graph, \
+            f"Unknown object list name {obj_list_name!r}"
+        is_valid = _build_compiled_validator_for(cls, obj_list_name) or \
+            _build_validator_for(cls, obj_list_name).is_valid
+        return is_valid(obj)
+
+    @classmethod
+    def is_valid_exactly(cls, data):
+        """
+        Check if data is valid according to this schema version only.
+
+        Args:
+            data:   The data to check against the schema.
+
+        Returns:
+            True if the data is valid, false otherwise.
+        """
+        is_valid = _build_compiled_validator_for(cls)
+        if is_valid is None:
+            return _build_validator_for(cls).is_valid(data)
+        valid = is_valid(data)
+        assert LIGHT_ASSERTS or \
+            valid == _build_validator_for(cls).is_valid(data), \
+            "Compiled validator disagrees with the generic one"
+        return valid
+
+    @classmethod
+    def _iter_failures_exactly(cls, data):
+        """
+        Validate the data against this schema version only, generating
+        located descriptions of every validation error, object by object.
+        Only explain the errors of parts of the data which the compiled
+        validator rejects.
+
+        Args:
+            data:   The data to validate. Will not be changed.
+
+        Returns:
+            A generator of ValidationFailure named tuples.
+        """
+        obj_lists = {
+            name: objs for name, objs in data.items()
+            if name and name in cls.graph and isinstance(objs, list)
+        } if isinstance(data, dict) else {}
+        skeleton = {
+            name: [] if name in obj_lists else value
+            for name, value in data.items()
+        } if obj_lists else data
+        is_valid = _build_compiled_validator_for(cls)
+        if is_valid is None or not is_valid(skeleton):
+            for error in _build_validator_for(cls).iter_errors(skeleton):
+                yield ValidationFailure(
+                    "", None, _get_json_pointer(error.absolute_path),
+                    error.message
+                )
+        for name, objs in obj_lists.items():
+            for _, failures in _iter_invalid_objs(cls, name, objs):
+                yield from failures
+
+    @classmethod
+    def get_failures(cls, data, limit=None):
+        """
+        Validate the data against this or a previous schema version, and
+        describe where each validation error is, stopping after a number of
+        them.
+
+        Args:
+            data:   The data to validate. Will not be changed.
+            limit:  The maximum number of errors to describe, or None to
+                    describe all of them.
+
+        Returns:
+            A list of ValidationFailure named tuples, one per error, ordered
+            by their location in the data, with the errors outside objects
+            first. Empty if the data is valid.
+        """
+        assert limit is None or (isinstance(limit, int) and limit >= 0)
+        # Produce this version's failures if not compatible
+        version = cls.get_exactly_compatible(data) or cls
+        # No it's not, pylint: disable=protected-access
+        failures = list(islice(version._iter_failures_exactly(data), limit))
+        assert LIGHT_ASSERTS or limit == 0 or \
+            (not failures) == version.is_valid_exactly(data)
+        return failures
+
+    @classmethod
+    def partition_valid(cls, data):
+        """
+        Split data adhering to this or a previous schema version into the
+        valid objects and the invalid ones, instead of rejecting it all.
+
+        Args:
+            data:   The data to partition. Will not be changed. Everything
+                    except the objects in its top-level lists must be valid.
+
+        Returns:
+            A tuple of two items: the data containing only the valid objects
+            (sharing them with the original data), in the same order, and
+            a list of ValidationFailure named tuples describing the errors of
+            every invalid object, with pointers into the original data.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data outside the
+            objects did not adhere to this or a previous version of the
+            schema.
+        """
+        # Produce this version's validation failure if not compatible
+        version = cls.get_exactly_compatible(data) or cls
+        if not isinstance(data, dict):
+            version.validate_exactly(data)
+        valid_data = {
+            name: [] if name and name in version.graph and
+            isinstance(value, list) else value
+            for name, value in data.items()
+        }
+        version.validate_exactly(valid_data)
+        failures = []
+        for name, objs in valid_data.items():
+            if not name or name not in version.graph:
+                continue
+            start = 0
+            for index, obj_failures in \
+                    _iter_invalid_objs(version, name, data[name]):
+                objs.extend(data[name][start:index])
+                failures.extend(obj_failures)
+                start = index + 1
+            objs.extend(data[name][start:])
+        assert LIGHT_ASSERTS or version.is_valid_exactly(valid_data)
+        return valid_data, failures
+
+    @classmethod
+    def validate(cls, data, workers=None):
+        """
+        Validate the data against this or a previous schema version.
+
+        Args:
+            data:       The data to validate. Will not be changed.
+            workers:    The number of worker processes to validate objects
+                        in the data's top-level lists with, in parallel.
+                        None or 1 to validate in the calling process only.
+                        Optional, default is None.
+
+        Returns:
+            The validated (but unchanged) data.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not adhere
+            to this or a previous version of the schema. If validated in
+            parallel, and objects were invalid, the error describes the first
+            invalid object in the data, instead of being the best match among
+            all errors.
+        """
+        exactly_compatible = cls.get_exactly_compatible(data)
+        # Produce this version's validation failure if not compatible
+        return (exactly_compatible or cls).validate_exactly(data,
+                                                            workers=workers)
+
+    @classmethod
+    def validated(cls, data, workers=None):
+        """
+        Validate the data against this or a previous schema version, and
+        get a handle remembering the data is valid, and which version it
+        adheres to, for operating on it without checking it again.
+
+        Args:
+            data:       The data to validate. Will not be changed. Must not
+                        be changed afterwards, while the handle is in use.
+            workers:    The number of worker processes to validate objects
+                        in the data's top-level lists with, in parallel.
+                        None or 1 to validate in the calling process only.
+                        Optional, default is None.
+
+        Returns:
+            The ValidData handle of the data.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not adhere
+            to this or a previous version of the schema.
+        """
+        # Produce this version's validation failure if not compatible
+        version = cls.get_exactly_compatible(data) or cls
+        return ValidData(version, version.validate_exactly(data,
+                                                           workers=workers))
+
+    @classmethod
+    def is_valid(cls, data):
+        """
+        Check if data is valid according to this or previous schema version.
+
+        Args:
+            data:   The data to check against the schema.
+
+        Returns:
+            True if the data is valid, false otherwise.
+        """
+        try:
+            cls.validate(data)
+        except jsonschema.exceptions.ValidationError:
+            return False
+        return True
+
+    @classmethod
+    def prewarm(cls):
+        """
+        Build the compiled validators for this and all previous schema
+        versions in advance, storing their code in the on-disk cache (see
+        kcidb_io.schema.cache), if enabled, for other processes to load.
+        """
+        for version in cls.history:
+            _build_compiled_validators_for(version)
+
+    @classmethod
+    def new(cls):
+        """
+        Create an empty dataset for this schema version.
 
         Returns:
             An empty dataset adhering to this schema version.
@@ -414,19 +2003,23 @@ class Version(ABC, metaclass=MetaVersion):
         """
         assert cls.is_compatible_exactly(data)
         assert LIGHT_ASSERTS or cls.is_valid_exactly(data)
+        return cls._has_metadata(data)
 
-        def node_has_metadata(node):
-            """Check if a dataset node has metadata"""
-            if isinstance(node, dict):
-                return any(
-                    k.startswith("_") or k != "misc" and node_has_metadata(v)
-                    for k, v in node.items()
-                )
-            if isinstance(node, list):
-                return any(node_has_metadata(v) for v in node)
-            return False
+    @classmethod
+    def _has_metadata(cls, data):
+        """
+        Check if a dataset adhering to this schema version exactly has
+        metadata, without checking the dataset.
 
-        return node_has_metadata(data)
+        Args:
+            data:   The dataset to check.
+
+        Returns:
+            True if the dataset has metadata fields.
+        """
+        metadata_map = _get_metadata_map(cls)
+        return metadata_map is not None and \
+            _has_mapped_metadata(data, metadata_map)
 
     @classmethod
     def strip_metadata(cls, data, copy=True):
@@ -437,231 +2030,969 @@ class Version(ABC, metaclass=MetaVersion):
             data:   The dataset to remove metadata from.
             copy:   True, if the data should be copied before handling.
                     False, if the metadata should be removed in-place.
+                    COPY_ON_WRITE, if only the containers with metadata
+                    removed should be copied.
 
         Returns:
             The (copy of the) dataset with metadata removed.
         """
         assert cls.is_compatible_exactly(data)
         assert LIGHT_ASSERTS or cls.is_valid_exactly(data)
+        return cls._strip_metadata(data, copy)
+
+    @classmethod
+    def _strip_metadata(cls, data, copy):
+        """
+        Remove metadata from a dataset adhering to this schema version
+        exactly, if any, without checking the dataset.
+
+        Args:
+            data:   The dataset to remove metadata from.
+            copy:   True, if the data should be copied before handling.
+                    False, if the metadata should be removed in-place.
+                    COPY_ON_WRITE, if only the containers with metadata
+                    removed should be copied.
 
+        Returns:
+            The (copy of the) dataset with metadata removed.
+        """
+        metadata_map = _get_metadata_map(cls)
+        if copy == COPY_ON_WRITE:
+            return data if metadata_map is None else \
+                _strip_mapped_metadata_on_write(data, metadata_map)
         # Copy the data, if requested
         if copy:
             data = deepcopy(data)
+        if metadata_map is not None:
+            _strip_mapped_metadata(data, metadata_map)
+        return data
+
+    @staticmethod
+    @abstractmethod
+    def _inherit(data):
+        """
+        Inherit data, i.e. convert data adhering to the previous major version
+        of the schema to satisfy this version of the schema. Doesn't update
+        the data's version numbers.
+
+        Args:
+            data:   The data to inherit. Will be modified in place.
+
+        Returns:
+            The inherited data.
+
+        Raises:
+            InheritanceImpossible - the previous schema's data is ambiguous
+                                    and cannot be inherited. Read the message,
+                                    disambiguate/cleanup, and retry.
+        """
+
+    @staticmethod
+    def _inherit_obj_list_name(obj_list_name):
+        """
+        Get the name an object list of the previous major version of the
+        schema has in this version.
+
+        Args:
+            obj_list_name:  The name of the object list in the previous major
+                            version.
+
+        Returns:
+            The name of the object list in this version.
+        """
+        return obj_list_name
+
+    @staticmethod
+    def _inherit_obj(state, obj_list_name, obj):
+        """
+        Inherit an object, i.e. convert an object adhering to the previous
+        major version of the schema to satisfy this version of the schema.
+        Optional, major versions defining it can be inherited through in a
+        single pass over the objects with _inherit_objs().
+
+        Args:
+            state:          A dictionary shared by all the objects of the
+                            data being inherited, to keep the state of the
+                            inheritance in, initially empty.
+            obj_list_name:  The name of the object list the object belongs
+                            to, in the previous major version.
+            obj:            The object to inherit. Will not be modified.
+
+        Returns:
+            The inherited object: either the original object, if it needed
+            no changes, or its modified copy, sharing the unmodified values
+            with it. And an iterable of tuples for the objects to add to the
+            data: the name of the object list (in this version) and the
+            object.
+
+        Raises:
+            InheritanceImpossible - the previous schema's object is ambiguous
+                                    and cannot be inherited. Read the message,
+                                    disambiguate/cleanup, and retry.
+        """
+        # Only a placeholder, pylint: disable=unused-argument
+        assert False, "Version has no own _inherit_obj() method"
+
+    @classmethod
+    def _inherit_objs(cls, data, versions):
+        """
+        Inherit data through a series of major versions in a single pass over
+        its objects, taking each object through all the versions in turn.
+        Doesn't update the data's version numbers.
+
+        Args:
+            data:       The data to inherit. Must adhere to the version
+                        previous to the first one of the series. Its
+                        top-level will be modified in place, but the object
+                        lists and the objects will be replaced, not modified.
+            versions:   A list of the major versions to inherit the data
+                        through, in history order. Each must have its own
+                        _inherit_obj() method.
+
+        Returns:
+            The inherited data.
+
+        Raises:
+            InheritanceImpossible - the previous schema's data is ambiguous
+                                    and cannot be inherited. Read the message,
+                                    disambiguate/cleanup, and retry.
+        """
+        # No it's not, pylint: disable=protected-access
+        assert all("_inherit_obj" in version.__dict__ for version in versions)
+        # The state of inheritance for each version
+        states = [{} for _ in versions]
+        # Objects added by the versions, per final object list name
+        added_obj_lists = {}
+
+        def add_obj(item):
+            """Add an inherited added object to added_obj_lists"""
+            added_obj_lists.setdefault(item[0], []).append(item[1])
+
+        def inherit_obj_list(obj_list_name, objs):
+            """
+            Inherit a list of objects through all the versions, adding the
+            objects the versions add on the way to added_obj_lists.
+
+            Returns:
+                The final name of the object list, and the list of inherited
+                objects.
+            """
+            # Prepare the steps of inheriting the objects through the
+            # versions: the next position, the inheritance function and
+            # state, and the name of the object list before the step
+            steps = []
+            for pos, version in enumerate(versions):
+                steps.append((pos + 1, version._inherit_obj, states[pos],
+                              obj_list_name))
+                obj_list_name = version._inherit_obj_list_name(obj_list_name)
+            new_objs = []
+            for obj in objs:
+                for next_pos, inherit, state, step_obj_list_name in steps:
+                    obj, added_objs = inherit(state, step_obj_list_name, obj)
+                    for added_obj_list_name, added_obj in added_objs:
+                        add_obj(_inherit_obj_through(
+                            versions, states, next_pos,
+                            added_obj_list_name, added_obj, add_obj
+                        ))
+                new_objs.append(obj)
+            return obj_list_name, new_objs
+
+        names = _get_inherited_names(list(data), versions)
+        obj_lists = {}
+        for obj_list_name in versions[0].previous.graph:
+            if obj_list_name and obj_list_name in data:
+                obj_list_name, objs = \
+                    inherit_obj_list(obj_list_name, data.pop(obj_list_name))
+                obj_lists[obj_list_name] = objs
+        # Added objects go into existing lists, or new lists at the end
+        for obj_list_name, objs in added_obj_lists.items():
+            obj_lists.setdefault(obj_list_name, []).extend(objs)
+        values = dict(data)
+        data.clear()
+        for name in names:
+            data[name] = obj_lists.pop(name) if name in obj_lists \
+                else values[name]
+        data.update(obj_lists)
+        return data
+
+    @classmethod
+    def upgrade_object(cls, from_version, obj_list_name, obj, state=None):
+        """
+        Upgrade an object from a top-level list of data to this version from
+        a previous (or the same) schema version, without the data around it.
+
+        Args:
+            from_version:   The schema version the object adheres to.
+            obj_list_name:  The name of the list the object belongs to, in
+                            the version it adheres to.
+            obj:            The object to upgrade. Will not be modified, nor
+                            validated.
+            state:          A dictionary to keep the state of inheritance
+                            in, shared by the objects of the same data, so
+                            e.g. the objects added for them are added only
+                            once. None to use a new one for this object
+                            only.
+
+        Returns:
+            A tuple of three items: the name of the object's list in this
+            version, the upgraded object (either the original object, if it
+            needed no changes, or its modified copy, sharing the unmodified
+            values with it), and a list of tuples for the objects to add to
+            the data as the result: the name of the object list in this
+            version, and the object.
+
+        Raises:
+            InheritanceImpossible - the previous schema's object is ambiguous
+                                    and cannot be inherited. Read the message,
+                                    disambiguate/cleanup, and retry.
+        """
+        # No it's not, pylint: disable=protected-access
+        assert isinstance(from_version, type) and from_version <= cls
+        assert obj_list_name and obj_list_name in from_version.graph, \
+            f"Unknown object list name {obj_list_name!r}"
+        assert LIGHT_ASSERTS or \
+            from_version.is_valid_object(obj_list_name, obj)
+        # The major versions to inherit the object through
+        versions = [
+            version for version in cls.history[len(from_version.history):]
+            if "_inherit" in version.__dict__
+        ]
+        assert all("_inherit_obj" in version.__dict__ for version in versions)
+        if state is None:
+            state = {}
+        # The state of inheritance for each version
+        states = [state.setdefault(version, {}) for version in versions]
+        added_objs = []
+        obj_list_name, obj = _inherit_obj_through(
+            versions, states, 0, obj_list_name, obj, added_objs.append
+        )
+        assert LIGHT_ASSERTS or cls.is_valid_object(obj_list_name, obj)
+        return obj_list_name, obj, added_objs
+
+    @classmethod
+    def upgrade(cls, data, copy=True):
+        """
+        Upgrade the data to this version from any of the previous schema
+        versions. Has no effect if the data already adheres to this schema
+        version.
+
+        Args:
+            data:   The data to upgrade. Must adhere to this version,
+                    or any of the previous versions. Will not be validated.
+            copy:   True, if the data should be copied before handling.
+                    False, if the data should be upgraded in-place, or
+                    returned as is, if it already adheres to this version.
+                    COPY_ON_WRITE, if only the parts of the data being
+                    modified should be copied.
+                    Optional, default is True.
+
+        Returns:
+            The upgraded (and/or copied) data, valid for this schema version.
+
+        Raises:
+            jsonschema.exceptions.ValidationError: Data didn't adhere to this,
+                                                   or any of the previous
+                                                   schema versions.
+        """
+        # Find the compatible version (if any)
+        version = cls.get_exactly_compatible(data)
+        if version is None:
+            # No compatible version found, fail validation with this version
+            cls.validate_exactly(data)
+            # We shouldn't get here
+            assert False, "Data validated unexpectedly"
+            return None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        data = cls._upgrade(version, data, copy)
+        assert LIGHT_ASSERTS or cls.is_valid_exactly(data)
+        return data
+
+    @classmethod
+    def _upgrade(cls, version, data, copy):
+        """
+        Upgrade the data to this version from a previous (or the same)
+        schema version, without checking it.
+
+        Args:
+            version:    The schema version the data adheres to, exactly.
+            data:       The data to upgrade.
+            copy:       True, if the data should be copied before handling.
+                        False, if the data should be upgraded in-place, or
+                        returned as is, if it already adheres to this
+                        version. COPY_ON_WRITE, if only the parts of the data
+                        being modified should be copied.
+
+        Returns:
+            The upgraded (and/or copied) data, valid for this schema version.
+        """
+        # Copy the data, if requested
+        if copy and copy != COPY_ON_WRITE:
+            data = deepcopy(data)
+
+        # Remember all newer versions in history order
+        newer_versions = cls.history[len(version.history):]
+
+        # Collect the major versions to inherit the data through
+        major_versions = [
+            newer_version for newer_version in newer_versions
+            if "_inherit" in newer_version.__dict__
+        ]
+
+        # Nothing to do if the data already adheres to this version
+        if not newer_versions:
+            return data
+
+        # If all of them can inherit object-by-object
+        if all("_inherit_obj" in major_version.__dict__
+               for major_version in major_versions):
+            # Copy the top level, if requested, the rest is replaced
+            if copy == COPY_ON_WRITE:
+                data = dict(data)
+            # Inherit data through all of them in a single pass
+            if major_versions:
+                # No it's not, pylint: disable=protected-access
+                data = cls._inherit_objs(data, major_versions)
+            cls._set_version(data)
+            return data
+
+        # Copy the data, if requested, as it will be modified in place
+        if copy == COPY_ON_WRITE:
+            data = deepcopy(data)
+
+        # Inherit data through all newer versions up to this one
+        for newer_version in newer_versions:
+            # No it's not, pylint: disable=protected-access
+            if "_inherit" in newer_version.__dict__:
+                data = newer_version._inherit(data)
+            newer_version._set_version(data)
+
+        return data
+
+    @classmethod
+    def align(cls, first, second, copy_first=True, copy_second=True):
+        """
+        Align schema versions of two datasets: upgrade the dataset with older
+        schema version to the version of the other, if different.
+
+        Args:
+            first:          The first dataset to align.
+            second:         The second dataset to align.
+            copy_first:     If true, the first dataset should be copied before
+                            upgrading. If COPY_ON_WRITE, only the parts
+                            being upgraded should be copied.
+            copy_second:    If true, the second dataset should be copied
+                            before upgrading. If COPY_ON_WRITE, only the
+                            parts being upgraded should be copied.
+
+        Returns:
+            The schema version both datasets are adhering to, the first
+            dataset, and the second dataset, where one of them is possibly
+            upgraded.
+        """
+        v_first = cls.get_exactly_compatible(first)
+        v_second = cls.get_exactly_compatible(second)
+        assert v_first is not None
+        assert v_second is not None
+        v = max(v_first, v_second)
+        return v, v.upgrade(first, copy=copy_first), \
+            v.upgrade(second, copy=copy_second)
+
+    @classmethod
+    def merge(cls, target, sources, copy_target=True, copy_sources=True,
+              dedup=False, pick_second=None):
+        # It's the interface, pylint: disable=too-many-arguments
+        # pylint: disable=too-many-positional-arguments
+        """
+        Merge multiple datasets into a destination dataset, optionally
+        deduplicating the objects along the way, same as dedup() would.
+
+        Args:
+            target:         The dataset to merge into.
+            sources:        An iterable containing datasets to merge from.
+            copy_target:    True if "target" contents should be copied before
+                            upgrading and modifying. False if not.
+                            COPY_ON_WRITE if only the parts being modified
+                            should be copied. Default is True.
+            copy_sources:   True if "source" contents should be copied before
+                            upgrading and referencing. False if not.
+                            COPY_ON_WRITE if only the parts being upgraded
+                            should be copied, and the rest referenced.
+                            Default is True.
+            dedup:          True if objects with the same type and ID should
+                            be merged as they arrive, keeping only one of
+                            them, in the position of the first one, same as
+                            dedup() does. False if all objects should be
+                            kept. Default is False.
+            pick_second:    A function picking values of duplicate objects'
+                            attributes, see dedup(). Only used with "dedup".
+
+        Returns:
+            The merged dataset, adhering to the newest schema version of the
+            target and the sources.
+        """
+        versioned_datas = []
+        for data in chain((target,), sources):
+            version = cls.get_exactly_compatible(data)
+            assert version is not None
+            assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+            versioned_datas.append((version, data))
+        # Merge at the newest version
+        version = max(version for version, data in versioned_datas)
+        # No it's not, pylint: disable=protected-access
+        target = version._merge(versioned_datas, copy_target, copy_sources,
+                                dedup, pick_second)
+        assert LIGHT_ASSERTS or version.is_valid_exactly(target)
+        return target
+
+    @classmethod
+    def _merge(cls, versioned_datas, copy_target, copy_sources,
+               dedup, pick_second):
+        # It's the interface, pylint: disable=too-many-arguments
+        # pylint: disable=too-many-positional-arguments
+        """
+        Merge multiple datasets of this or previous schema versions into the
+        first one, without checking them, optionally deduplicating the
+        objects along the way.
+
+        Args:
+            versioned_datas:    A list of tuples, each containing the schema
+                                version a dataset adheres to exactly, and the
+                                dataset. The first dataset is the target to
+                                merge the rest into.
+            copy_target:        Same as for merge().
+            copy_sources:       Same as for merge().
+            dedup:              Same as for merge().
+            pick_second:        Same as for merge().
+
+        Returns:
+            The merged dataset, adhering to this schema version.
+        """
+        # No it's not, pylint: disable=protected-access
+        version = cls
+        # Upgrade the target and each source straight to it, once
+        target = version._upgrade(*versioned_datas[0], copy_target)
+        if copy_target == COPY_ON_WRITE:
+            # Copy the top level we modify
+            target = dict(target)
+        datas = chain(
+            (target,),
+            (version._upgrade(source_version, source, copy_sources)
+             for source_version, source in versioned_datas[1:])
+        )
+        obj_lists = {}
+        # If deduplicating
+        if dedup:
+            if pick_second is None:
+                pick_second = _pick_second_randomly
+            assert callable(pick_second)
+            # Fold duplicates into dictionaries of objects, keyed by IDs,
+            # only merging into copies if anything is shared
+            copies = set() if COPY_ON_WRITE in (copy_target, copy_sources) \
+                else None
+            for data in datas:
+                for obj_list_name in version.graph:
+                    if obj_list_name in data:
+                        _dedup_objs(obj_lists.setdefault(obj_list_name, {}),
+                                    version.id_fields[obj_list_name],
+                                    data[obj_list_name], pick_second,
+                                    copies)
+            target.update((obj_list_name, list(obj_dict.values()))
+                          for obj_list_name, obj_dict in obj_lists.items())
+        else:
+            # Collect the objects of each list, preserving the order
+            for data in datas:
+                for obj_list_name in version.graph:
+                    if obj_list_name in data:
+                        obj_lists.setdefault(obj_list_name, []). \
+                            extend(data[obj_list_name])
+            target.update(obj_lists)
+        assert version.is_compatible_exactly(target)
+        return target
+
+    @classmethod
+    def dedup(cls, data, copy=True, pick_second=None):
+        """
+        Deduplicate objects in a dataset of this or earlier schema version.
+
+        Objects with the same type and ID are merged pairwise and removed
+        until only one remains, which takes the list position of the first
+        one. Each top-level attribute's value is picked with the help of
+        pick_second() function parameter from either of the two objects, if
+        it's present in both. Otherwise it's taken from whichever object has
+        it.
+
+        Args:
+            data:           The dataset to deduplicate.
+            copy:           True if the data should be copied before handling.
+                            False if it should be modified in place.
+                            COPY_ON_WRITE if only the objects being merged
+                            into should be copied.
+            pick_second:    A function called for each deduplicated attribute
+                            pair, without arguments. If it returns false, the
+                            first attribute's value (in object order) is
+                            picked. The second attribute's value is picked
+                            otherwise. If None, random.getrandbits(1) is used,
+                            resulting in the same deduplication logic
+                            databases are expected to employ.
+
+        Returns:
+            The deduplicated dataset.
+        """
+        version = cls.get_exactly_compatible(data)
+        assert version is not None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        # No it's not, pylint: disable=protected-access
+        return version._dedup(data, copy, pick_second)
+
+    @classmethod
+    def _dedup(cls, data, copy, pick_second):
+        """
+        Deduplicate objects in a dataset adhering to this schema version
+        exactly, without checking it.
+
+        Args:
+            data:           The dataset to deduplicate.
+            copy:           Same as for dedup().
+            pick_second:    Same as for dedup().
+
+        Returns:
+            The deduplicated dataset.
+        """
+        version = cls
+        if pick_second is None:
+            pick_second = _pick_second_randomly
+        assert callable(pick_second)
+        # Only merge into copies if the objects are shared
+        copies = None
+        if copy == COPY_ON_WRITE:
+            data = dict(data)
+            copies = set()
+        elif copy:
+            data = deepcopy(data)
+
+        for obj_list_name in version.graph:
+            if obj_list_name in data:
+                obj_dict = {}
+                _dedup_objs(obj_dict, version.id_fields[obj_list_name],
+                            data[obj_list_name], pick_second, copies)
+                data[obj_list_name] = list(obj_dict.values())
+        return data
+
+    @classmethod
+    def dedup_stream(cls, stream, pick_second=None,
+                     partitions=DEDUP_PARTITIONS):
+        """
+        Deduplicate objects in a dataset of this or earlier schema version,
+        read from a stream, the same way dedup() does, without keeping the
+        whole dataset in memory. The objects are spilled to temporary files,
+        partitioned by the hashes of their IDs, and only one partition is
+        deduplicated in memory at a time.
+
+        Args:
+            stream:         The file-like object to read the dataset's JSON
+                            text (or its UTF-8 encoding) from.
+            pick_second:    A function called for each deduplicated attribute
+                            pair, see dedup().
+            partitions:     The number of partitions (temporary files) to
+                            split the objects into. The more partitions, the
+                            less memory is used.
+
+        Returns:
+            A generator of tuples describing the deduplicated dataset in the
+            format generated by kcidb_io.stream.parse(), and accepted by
+            kcidb_io.stream.dump().
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data's version is
+            not this or a previous one.
+            `json.JSONDecodeError` if the stream did not contain a JSON
+            object.
+        """
+        if pick_second is None:
+            pick_second = _pick_second_randomly
+        assert callable(pick_second)
+        assert isinstance(partitions, int) and partitions > 0
 
-        def node_strip_metadata(node):
-            """Strip metadata from a node in a dataset"""
-            if isinstance(node, dict):
-                for k, v in list(node.items()):
-                    if k.startswith("_"):
-                        del node[k]
-                    elif k != "misc":
-                        node_strip_metadata(v)
-            elif isinstance(node, list):
-                for v in node:
-                    node_strip_metadata(v)
-
-        node_strip_metadata(data)
-        return data
+        with ExitStack() as stack:
+            def open_file():
+                """Open a temporary file to spill JSON lines to"""
+                return stack.enter_context(
+                    TemporaryFile("w+", encoding="utf-8")
+                )
+            files = [open_file() for _ in range(partitions)]
+            # No it's not, pylint: disable=protected-access
+            version, skeleton, obj_list_names = \
+                cls._spill_objs(stream, open_file(), files)
+            obj_id_fields = [version.id_fields[name]
+                             for name in obj_list_names]
+
+            # Deduplicate each partition into a new file, in the order of
+            # object lists and first object positions
+            for pos, file in enumerate(files):
+                items = _dedup_spilled_objs(file, obj_id_fields, pick_second)
+                file.close()
+                files[pos] = file = open_file()
+                for item in items:
+                    file.write(json.dumps(item) + "\n")
+                file.seek(0)
+                del items
+
+            # Merge the partitions, and output the deduplicated dataset
+            yield from _join_spilled_objs(skeleton, obj_list_names, files)
 
-    @staticmethod
-    @abstractmethod
-    def _inherit(data):
+    @classmethod
+    def _spill_objs(cls, stream, pending, files):
         """
-        Inherit data, i.e. convert data adhering to the previous major version
-        of the schema to satisfy this version of the schema. Doesn't update
-        the data's version numbers.
+        Read a dataset of this or earlier schema version from a stream, and
+        spill its objects into files, partitioned by the hashes of their
+        IDs, as JSON lines containing an object's list position (in the
+        order of appearance), its index in the list, and the object itself.
 
         Args:
-            data:   The data to inherit. Will be modified in place.
+            stream:     The file-like object to read the dataset's JSON text
+                        (or its UTF-8 encoding) from.
+            pending:    A text file to spill the objects read before the
+                        dataset's version to.
+            files:      A list of text files to spill the objects to.
 
         Returns:
-            The inherited data.
+            The dataset's schema version, the dataset with object lists
+            empty, and a list of the names of object lists with objects, in
+            the order of appearance.
 
         Raises:
-            InheritanceImpossible - the previous schema's data is ambiguous
-                                    and cannot be inherited. Read the message,
-                                    disambiguate/cleanup, and retry.
+            `jsonschema.exceptions.ValidationError` if the data's version is
+            not this or a previous one.
+            `json.JSONDecodeError` if the stream did not contain a JSON
+            object.
         """
+        version = None
+        # Top-level properties, with object lists empty
+        skeleton = {}
+        # Positions of object lists in the order of appearance, by name
+        obj_list_positions = {}
+
+        def add_item(name, index, value):
+            """Spill an object, or add a non-object item to skeleton"""
+            if name not in version.graph:
+                skeleton[name].append(value)
+                return
+            obj_list_pos = obj_list_positions.setdefault(
+                name, len(obj_list_positions)
+            )
+            obj_id = tuple(map(value.get, version.id_fields[name]))
+            files[hash(obj_id) % len(files)].write(
+                json.dumps([obj_list_pos, index, value]) + "\n"
+            )
+
+        for name, index, value in parse(stream):
+            if index is None:
+                skeleton[name] = value
+                if name == "version" and version is None:
+                    version = cls.get_exactly_compatible(skeleton)
+                    if version is None:
+                        # Produce this version's failures
+                        cls.validate_exactly(skeleton)
+                        assert False, "Data validated unexpectedly"
+                    pending.seek(0)
+                    for line in pending:
+                        add_item(*json.loads(line))
+            elif version is None:
+                pending.write(json.dumps([name, index, value]) + "\n")
+            else:
+                add_item(name, index, value)
+        if version is None:
+            # Produce this version's failures
+            cls.validate_exactly(skeleton)
+            assert False, "Data validated unexpectedly"
+        assert LIGHT_ASSERTS or version.is_valid_exactly(skeleton)
+        return version, skeleton, list(obj_list_positions)
 
     @classmethod
-    def upgrade(cls, data, copy=True):
+    def _read_objs(cls, stream):
         """
-        Upgrade the data to this version from any of the previous schema
-        versions. Has no effect if the data already adheres to this schema
-        version.
+        Start reading a dataset of this or earlier schema version from a
+        stream, up to its version, keeping the objects read before it in
+        memory.
 
         Args:
-            data:   The data to upgrade. Must adhere to this version,
-                    or any of the previous versions. Will not be validated.
-            copy:   True, if the data should be copied before handling.
-                    False, if the data should be upgraded in-place, or
-                    returned as is, if it already adheres to this version.
-                    Optional, default is True.
+            stream: The file-like object to read the dataset's JSON text
+                    (or its UTF-8 encoding) from.
 
         Returns:
-            The upgraded (and/or copied) data, valid for this schema version.
+            The dataset's schema version, its top-level properties other
+            than object lists (i.e. the version), and a generator reading
+            and validating the rest of the dataset, returning a tuple for
+            each object: its list name, its index in the list, and the
+            object itself.
 
         Raises:
-            jsonschema.exceptions.ValidationError: Data didn't adhere to this,
-                                                   or any of the previous
-                                                   schema versions.
+            `jsonschema.exceptions.ValidationError` if the data did not
+            adhere to this or a previous version of the schema (also from
+            the generator).
+            `json.JSONDecodeError` if the stream did not contain a JSON
+            object (also from the generator).
         """
-        # Copy the data, if requested
-        if copy:
-            data = deepcopy(data)
-
-        # Find the first compatible version (if any), and remember all newer
-        # versions in history order
-        newer_versions = []
-        for version in cls.lineage:
-            if version.is_compatible_exactly(data):
-                assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        items = parse(stream)
+        # Top-level properties, other than object lists
+        skeleton = {}
+        # Items read before the version was known
+        pending = []
+        for name, index, value in items:
+            if index is None and name == "version":
+                skeleton[name] = value
+                # Produce this version's failures if not compatible
+                version = cls.get_exactly_compatible(skeleton) or cls
+                version.validate_exactly(skeleton)
                 break
-            newer_versions.insert(0, version)
+            pending.append((name, index, value))
         else:
-            # No compatible version found, fail validation with this version
-            cls.validate_exactly(data)
-            # We shouldn't get here
+            # Produce this version's failures
+            cls.validate_exactly(skeleton)
             assert False, "Data validated unexpectedly"
-            return None
-
-        # Inherit data through all newer versions up to this one
-        for version in newer_versions:
-            # No it's not, pylint: disable=protected-access
-            if "_inherit" in version.__dict__:
-                data = version._inherit(data)
-            version._set_version(data)
-            assert LIGHT_ASSERTS or version.is_valid_exactly(data)
 
-        return data
+        def get_objs():
+            """Validate and generate objects"""
+            for name, index, value in chain(pending, items):
+                if index is not None and name in version.graph:
+                    # No it's not, pylint: disable=protected-access
+                    version._validate_obj_exactly(name, index, value)
+                    yield name, index, value
+                elif index is not None or name not in version.graph or \
+                        value != [] or not isinstance(value, list):
+                    # Produce failures for unexpected properties
+                    version.validate_exactly({
+                        **skeleton,
+                        name: value if index is None else [value]
+                    })
+
+        return version, skeleton, get_objs()
 
     @classmethod
-    def align(cls, first, second, copy_first=True, copy_second=True):
+    def split(cls, data, max_bytes=None, max_objects=None):
         """
-        Align schema versions of two datasets: upgrade the dataset with older
-        schema version to the version of the other, if different.
+        Split a dataset into smaller datasets of the same version, within
+        size limits. Keep each object together with its descendants (e.g.
+        a checkout with its builds, their tests and incidents) in one
+        dataset, where they fit. The sizes are calculated incrementally,
+        from each object's size, serialized once.
 
         Args:
-            first:          The first dataset to align.
-            second:         The second dataset to align.
-            copy_first:     If true, the first dataset should be copied before
-                            upgrading.
-            copy_second:    If true, the second dataset should be copied
-                            before upgrading.
+            data:           The dataset to split. Will not be changed.
+            max_bytes:      The maximum size of each produced dataset in
+                            bytes, when serialized with json.dumps() (with
+                            default separators), or None for no limit.
+            max_objects:    The maximum number of objects in each produced
+                            dataset, or None for no limit.
 
         Returns:
-            The schema version both datasets are adhering to, the first
-            dataset, and the second dataset, where one of them is possibly
-            upgraded.
+            A generator of datasets with objects, sharing the objects with
+            the original dataset. A dataset exceeds the limits only if it
+            has a single object.
         """
-        assert cls.is_compatible(first)
-        assert cls.is_compatible(second)
-        v_first = cls.get_exactly_compatible(first)
-        v_second = cls.get_exactly_compatible(second)
-        if copy_first:
-            first = deepcopy(first)
-        if copy_second:
-            second = deepcopy(second)
-        v = max(v_first, v_second)
-        return v, v.upgrade(first, copy=False), v.upgrade(second, copy=False)
+        version = cls.get_exactly_compatible(data)
+        assert version is not None
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        # No it's not, pylint: disable=protected-access
+        return version._split(data, max_bytes, max_objects)
 
     @classmethod
-    def merge(cls, target, sources, copy_target=True, copy_sources=True):
+    def _split(cls, data, max_bytes, max_objects):
         """
-        Merge multiple datasets into a destination dataset.
+        Split a dataset adhering to this schema version exactly into
+        smaller datasets within size limits, without checking it.
 
         Args:
-            target:         The dataset to merge into.
-            sources:        An iterable containing datasets to merge from.
-            copy_target:    True if "target" contents should be copied before
-                            upgrading and modifying. False if not.
-                            Default is True.
-            copy_sources:   True if "source" contents should be copied before
-                            upgrading and referencing. False if not.
-                            Default is True.
+            data:           The dataset to split. Will not be changed.
+            max_bytes:      Same as for split().
+            max_objects:    Same as for split().
 
         Returns:
-            The merged dataset, adhering to this schema version.
+            A generator of datasets with objects, as split() returns.
         """
-        assert cls.is_compatible(target)
-        assert LIGHT_ASSERTS or cls.is_valid(target)
-        if copy_target:
-            target = deepcopy(target)
-        version = cls.get_exactly_compatible(target)
-        for source in sources:
-            assert cls.is_compatible(source)
-            assert LIGHT_ASSERTS or cls.is_valid(source)
-            # Upgrade both target and source to the same version
-            version, target, source = cls.align(target, source,
-                                                copy_first=False,
-                                                copy_second=copy_sources)
-            # Merge the source into the target
-            for obj_list_name in version.graph:
-                if obj_list_name in source:
-                    target[obj_list_name] = \
-                        target.get(obj_list_name, []) + source[obj_list_name]
-        assert version.is_compatible_exactly(target)
-        assert LIGHT_ASSERTS or version.is_valid_exactly(target)
-        return target
+        assert max_bytes is None or \
+            isinstance(max_bytes, int) and max_bytes > 0
+        assert max_objects is None or \
+            isinstance(max_objects, int) and max_objects > 0
+        skeleton = {name: value for name, value in data.items()
+                    if name not in cls.graph}
+        return _pack_objs(
+            _Packer(cls, skeleton, max_bytes, max_objects),
+            _group_objs(cls, data)
+        )
 
     @classmethod
-    def dedup(cls, data, copy=True, pick_second=None):
+    def split_stream(cls, stream, max_bytes=None, max_objects=None):
         """
-        Deduplicate objects in a dataset of this or earlier schema version.
+        Split a dataset of this or earlier schema version, read from a
+        stream, into smaller datasets of the same version, within size
+        limits, without keeping the whole dataset in memory. Validate the
+        objects as they're read, and keep them in the order they're read.
 
-        Objects with the same type and ID are merged pairwise and removed
-        until only one remains, which takes the list position of the first
-        one. Each top-level attribute's value is picked with the help of
-        pick_second() function parameter from either of the two objects, if
-        it's present in both. Otherwise it's taken from whichever object has
-        it.
+        Args:
+            stream:         The file-like object to read the dataset's JSON
+                            text (or its UTF-8 encoding) from.
+            max_bytes:      The maximum size of each produced dataset in
+                            bytes, when serialized with json.dumps() (with
+                            default separators), or None for no limit.
+            max_objects:    The maximum number of objects in each produced
+                            dataset, or None for no limit.
+
+        Returns:
+            A generator of datasets with objects, as split() returns.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not
+            adhere to this or a previous version of the schema.
+            `json.JSONDecodeError` if the stream did not contain a JSON
+            object.
+        """
+        assert max_bytes is None or \
+            isinstance(max_bytes, int) and max_bytes > 0
+        assert max_objects is None or \
+            isinstance(max_objects, int) and max_objects > 0
+        version, skeleton, objs = cls._read_objs(stream)
+
+        def get_groups():
+            """Generate batches of objects"""
+            group = []
+            for name, _, obj in objs:
+                group.append((name, obj))
+                if len(group) >= SPLIT_BATCH_SIZE:
+                    yield group
+                    group = []
+            if group:
+                yield group
+
+        return _pack_objs(
+            _Packer(version, skeleton, max_bytes, max_objects),
+            get_groups(), keep_groups=False
+        )
+
+    @classmethod
+    def shard(cls, data, key=None, shards=None):
+        """
+        Partition a dataset into datasets of the same version in a single
+        pass, by a key of each object, e.g. its origin, or by the key's
+        hash. The objects are shared with the original dataset, not copied.
 
         Args:
-            data:           The dataset to deduplicate.
-            copy:           True if the data should be copied before handling.
-                            False if it should be modified in place.
-            pick_second:    A function called for each deduplicated attribute
-                            pair, without arguments. If it returns false, the
-                            first attribute's value (in object order) is
-                            picked. The second attribute's value is picked
-                            otherwise. If None, random.getrandbits(1) is used,
-                            resulting in the same deduplication logic
-                            databases are expected to employ.
+            data:   The dataset to partition. Will not be changed.
+            key:    A function accepting an object's list name and the
+                    object, and returning its (hashable, JSON-serializable)
+                    sharding key. None (the default) to use the object's
+                    origin.
+            shards: The number of shards to distribute the keys over, by
+                    their hashes (stable across processes), or None (the
+                    default) to make a shard for each distinct key.
 
         Returns:
-            The deduplicated dataset.
+            A dictionary of shards (keys, or shard numbers), and their
+            datasets, in the order of their first objects. Shards without
+            objects are not included.
         """
         version = cls.get_exactly_compatible(data)
         assert version is not None
         assert LIGHT_ASSERTS or version.is_valid_exactly(data)
-        if pick_second is None:
-            def pick_second():
-                return random.getrandbits(1)
-        assert callable(pick_second)
-        if copy:
-            data = deepcopy(data)
+        # No it's not, pylint: disable=protected-access
+        return version._shard(data, key, shards)
+
+    @classmethod
+    def _shard(cls, data, key, shards):
+        """
+        Partition a dataset adhering to this schema version exactly by a
+        key of each object, without checking it.
 
-        def merge_objs(first, second):
-            """Merge the second object into the first, unless the same."""
-            if first is not second:
-                for attr in first:
-                    if attr in second and pick_second():
-                        first[attr] = second[attr]
-                for attr in second:
-                    if attr not in first:
-                        first[attr] = second[attr]
-            return first
+        Args:
+            data:   The dataset to partition. Will not be changed.
+            key:    Same as for shard().
+            shards: Same as for shard().
 
+        Returns:
+            A dictionary of shards and their datasets, as shard() returns.
+        """
+        version = cls
+        get_shard = _get_shard_getter(key, shards)
+        skeleton = {name: value for name, value in data.items()
+                    if name not in version.graph}
+        shard_datas = {}
         for obj_list_name in version.graph:
-            if obj_list_name in data:
-                obj_dict = {}
-                for obj in data[obj_list_name]:
-                    obj_id = tuple(map(
-                        obj.get, version.id_fields[obj_list_name]
-                    ))
-                    merge_objs(obj_dict.setdefault(obj_id, obj), obj)
-                data[obj_list_name] = list(obj_dict.values())
-        return data
+            if not data.get(obj_list_name):
+                continue
+            # Shards and their lists of objects of this type
+            shard_objs = {}
+            for obj in data[obj_list_name]:
+                obj_shard = get_shard(obj_list_name, obj)
+                objs = shard_objs.get(obj_shard)
+                if objs is None:
+                    objs = shard_objs[obj_shard] = []
+                    shard_datas.setdefault(obj_shard, dict(skeleton))[
+                        obj_list_name
+                    ] = objs
+                objs.append(obj)
+        assert LIGHT_ASSERTS or all(
+            version.is_valid_exactly(shard_data)
+            for shard_data in shard_datas.values()
+        )
+        return shard_datas
+
+    @classmethod
+    def shard_stream(cls, stream, open_shard, key=None, shards=None):
+        """
+        Partition a dataset of this or earlier schema version, read from a
+        stream, into datasets of the same version written to separate
+        files, the same way shard() does, without keeping the whole dataset
+        in memory. Validate the objects as they're read.
+
+        Args:
+            stream:     The file-like object to read the dataset's JSON
+                        text (or its UTF-8 encoding) from.
+            open_shard: A function accepting a shard (a key, or a shard
+                        number) and returning the text file-like object to
+                        write the shard's dataset to. Called when the
+                        shard's first object is read. The caller is
+                        responsible for closing the file.
+            key:        A function returning an object's sharding key, see
+                        shard().
+            shards:     The number of shards to distribute the keys over,
+                        or None, see shard().
+
+        Returns:
+            A dictionary of shards, and the numbers of objects written to
+            them, in the order of their first objects.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not
+            adhere to this or a previous version of the schema. Only the
+            data read before the failure is written to the files, and they
+            won't contain valid JSON.
+            `json.JSONDecodeError` if the stream did not contain a JSON
+            object.
+        """
+        assert callable(open_shard)
+        get_shard = _get_shard_getter(key, shards)
+        _, skeleton, objs = cls._read_objs(stream)
+        # Shards, and their writers, with the name of the object list being
+        # written, the number of objects written to it, and in total
+        shard_states = {}
+        for obj_list_name, _, obj in objs:
+            obj_shard = get_shard(obj_list_name, obj)
+            state = shard_states.get(obj_shard)
+            if state is None:
+                writer = Writer(open_shard(obj_shard))
+                for item in skeleton.items():
+                    writer.write(item[0], None, item[1])
+                state = shard_states[obj_shard] = [writer, None, 0, 0]
+            if state[1] != obj_list_name:
+                state[0].write(obj_list_name, None, [])
+                state[1:3] = obj_list_name, 0
+            state[0].write(obj_list_name, state[2], obj)
+            state[2] += 1
+            state[3] += 1
+        for state in shard_states.values():
+            state[0].close()
+        return {obj_shard: state[3]
+                for obj_shard, state in shard_states.items()}
 
     @classmethod
     def cmp_directly_compatible(cls, first, second):
@@ -710,3 +3041,333 @@ class Version(ABC, metaclass=MetaVersion):
                                            copy_first=copy_first,
                                            copy_second=copy_second)
         return version.cmp_directly_compatible(first, second)
+
+
+class ValidData:
+    """
+    A handle of data known to be valid according to a particular schema
+    version, produced by Version.validated(), and by its own operations.
+    Operations on it skip checking the data's version and validity.
+    """
+
+    # No it's not, pylint: disable=protected-access
+
+    def __init__(self, version, data):
+        """
+        Initialize the handle. Use Version.validated() instead, unless the
+        data is known to be valid.
+
+        Args:
+            version:    The schema version (a Version subclass) the data
+                        adheres to exactly.
+            data:       The data valid according to the version. Must not be
+                        changed, while the handle is in use.
+        """
+        assert isinstance(version, type) and issubclass(version, Version)
+        assert LIGHT_ASSERTS or version.is_valid_exactly(data)
+        # The schema version the data adheres to, exactly
+        self.version = version
+        # The valid data
+        self.data = data
+
+    def count(self):
+        """
+        Calculate number of objects of any type in the data.
+
+        Returns:
+            The number of objects in the data.
+        """
+        return self.version._count(self.data)
+
+    def get_ids(self, intern=False):
+        """
+        Get the IDs of objects in the data.
+
+        Args:
+            intern: True if the strings in the IDs should be interned (see
+                    sys.intern()). False to return them as is.
+
+        Returns:
+            A dictionary of object list names (types), and lists of IDs of
+            objects in the data, as Version.get_ids() returns.
+        """
+        return self.version._get_ids(self.data, intern)
+
+    def get_id_keys(self):
+        """
+        Get compact surrogate keys of objects' IDs in the data.
+
+        Returns:
+            A dictionary of object list names (types), and tuples of key
+            arrays and ID lists, as Version.get_id_keys() returns.
+        """
+        return self.version._get_id_keys(self.data)
+
+    def index(self):
+        """
+        Build an index of objects in the data by their IDs, and of the
+        parent/child links between them.
+
+        Returns:
+            The Index of the data.
+        """
+        return Index(self.version, self.data)
+
+    def check_references(self, known_ids=None, workers=None):
+        """
+        Find references from objects in the data to their parents, which
+        don't resolve to objects in the data, or to the externally-known
+        IDs, if specified.
+
+        Args:
+            known_ids:  A dictionary of object list names, and containers
+                        of IDs of objects known to exist outside the data,
+                        or None to only resolve references within the data.
+            workers:    The number of worker processes to check objects
+                        with, in parallel. None or 1 to check in the
+                        calling process only.
+
+        Returns:
+            A list of DanglingReference named tuples, as
+            Version.check_references() returns.
+        """
+        return self.version._check_references(self.data, known_ids, workers)
+
+    def has_metadata(self):
+        """
+        Check if the data has metadata.
+
+        Returns:
+            True if the data has metadata fields.
+        """
+        return self.version._has_metadata(self.data)
+
+    def strip_metadata(self, copy=True):
+        """
+        Remove metadata from the data, if any.
+
+        Args:
+            copy:   True, if the data should be copied before handling.
+                    False, if the metadata should be removed in-place,
+                    making this handle unusable. COPY_ON_WRITE, if only the
+                    containers with metadata removed should be copied.
+
+        Returns:
+            The handle of the (copy of the) data with metadata removed.
+        """
+        return ValidData(self.version,
+                         self.version._strip_metadata(self.data, copy))
+
+    def upgrade(self, version, copy=True):
+        """
+        Upgrade the data to a newer (or the same) schema version.
+
+        Args:
+            version:    The schema version to upgrade the data to.
+            copy:       True, if the data should be copied before handling.
+                        False, if the data should be upgraded in-place,
+                        making this handle unusable. COPY_ON_WRITE, if only
+                        the parts of the data being modified should be
+                        copied.
+
+        Returns:
+            The handle of the upgraded (and/or copied) data.
+        """
+        assert isinstance(version, type) and version >= self.version
+        return ValidData(version,
+                         version._upgrade(self.version, self.data, copy))
+
+    def dedup(self, copy=True, pick_second=None):
+        """
+        Deduplicate objects in the data, same as Version.dedup() does.
+
+        Args:
+            copy:           True if the data should be copied before
+                            handling. False if it should be modified in
+                            place, making this handle unusable.
+                            COPY_ON_WRITE if only the objects being merged
+                            into should be copied.
+            pick_second:    A function picking values of duplicate objects'
+                            attributes, see Version.dedup().
+
+        Returns:
+            The handle of the deduplicated data.
+        """
+        return ValidData(self.version,
+                         self.version._dedup(self.data, copy, pick_second))
+
+    def split(self, max_bytes=None, max_objects=None):
+        """
+        Split the data into smaller datasets within size limits, same as
+        Version.split() does.
+
+        Args:
+            max_bytes:      The maximum size of each produced dataset in
+                            bytes, or None for no limit.
+            max_objects:    The maximum number of objects in each produced
+                            dataset, or None for no limit.
+
+        Returns:
+            A generator of handles of the produced datasets.
+        """
+        for data in self.version._split(self.data, max_bytes, max_objects):
+            yield ValidData(self.version, data)
+
+    def shard(self, key=None, shards=None):
+        """
+        Partition the data by a key of each object, same as
+        Version.shard() does.
+
+        Args:
+            key:    A function returning an object's sharding key, or None
+                    to use the object's origin.
+            shards: The number of shards to distribute the keys over, or
+                    None to make a shard for each distinct key.
+
+        Returns:
+            A dictionary of shards, and handles of their datasets.
+        """
+        return {
+            obj_shard: ValidData(self.version, data)
+            for obj_shard, data in
+            self.version._shard(self.data, key, shards).items()
+        }
+
+    def merge(self, sources, copy_target=True, copy_sources=True,
+              dedup=False, pick_second=None):
+        # It's the interface, pylint: disable=too-many-arguments
+        # pylint: disable=too-many-positional-arguments
+        """
+        Merge the data of other handles into this handle's data, same as
+        Version.merge() does.
+
+        Args:
+            sources:        An iterable of handles to merge the data from.
+            copy_target:    True if this handle's data should be copied
+                            before upgrading and modifying. False if not,
+                            making this handle unusable. COPY_ON_WRITE if
+                            only the parts being modified should be copied.
+            copy_sources:   True if the sources' data should be copied
+                            before upgrading and referencing. False if not,
+                            making the source handles unusable.
+                            COPY_ON_WRITE if only the parts being upgraded
+                            should be copied, and the rest referenced.
+            dedup:          True if objects with the same type and ID should
+                            be merged as they arrive, see Version.merge().
+            pick_second:    A function picking values of duplicate objects'
+                            attributes, see Version.dedup().
+
+        Returns:
+            The handle of the merged data, adhering to the newest schema
+            version of this handle's and the sources' data.
+        """
+        versioned_datas = [(self.version, self.data)]
+        for source in sources:
+            assert isinstance(source, ValidData)
+            versioned_datas.append((source.version, source.data))
+        version = max(version for version, data in versioned_datas)
+        return ValidData(version,
+                         version._merge(versioned_datas, copy_target,
+                                        copy_sources, dedup, pick_second))
+
+
+class Builder:
+    """
+    An incremental builder of valid data, validating only the objects being
+    added to it, so the data never needs to be validated as a whole.
+    """
+
+    def __init__(self, version, data=None):
+        """
+        Initialize the builder.
+
+        Args:
+            version:    The schema version (a Version subclass) to build
+                        data for.
+            data:       The data to start with, adhering to the version, or
+                        a previous one. Validated and taken over by the
+                        builder. None to start with empty data of the
+                        version.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the data did not
+            adhere to the version or a previous one.
+        """
+        assert isinstance(version, type) and issubclass(version, Version)
+        if data is None:
+            data = version.new()
+        else:
+            version.validate(data)
+            version = version.get_exactly_compatible(data)
+        # The schema version the data adheres to, exactly
+        self.version = version
+        # The valid data being built, not to be modified directly
+        self.data = data
+
+    def add(self, obj_list_name, obj):
+        """
+        Validate an object and add it to a top-level list of the data.
+
+        Args:
+            obj_list_name:  The name of the list to add the object to.
+            obj:            The object to add. Must not be modified
+                            afterwards.
+
+        Returns:
+            The added object.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if the object did not
+            adhere to the schema version, with the path relative to the
+            data. The object is not added then.
+        """
+        self.extend(obj_list_name, (obj,))
+        return obj
+
+    def extend(self, obj_list_name, objs):
+        """
+        Validate objects and add them to a top-level list of the data, all
+        or none.
+
+        Args:
+            obj_list_name:  The name of the list to add the objects to.
+            objs:           An iterable of objects to add. The objects must
+                            not be modified afterwards.
+
+        Raises:
+            `jsonschema.exceptions.ValidationError` if any of the objects did
+            not adhere to the schema version, with the path relative to the
+            data. None of the objects are added then.
+        """
+        assert obj_list_name and obj_list_name in self.version.graph, \
+            f"Unknown object list name {obj_list_name!r}"
+        objs = list(objs)
+        start = len(self.data.get(obj_list_name, ()))
+        for index, obj in enumerate(objs, start):
+            # No it's not, pylint: disable=protected-access
+            self.version._validate_obj_exactly(obj_list_name, index, obj)
+        if objs:
+            self.data.setdefault(obj_list_name, []).extend(objs)
+        assert LIGHT_ASSERTS or self.version.is_valid_exactly(self.data)
+
+    def validate(self):
+        """
+        Get the built data, which is always valid, without validating it.
+
+        Returns:
+            The built data, adhering to the builder's schema version.
+        """
+        assert LIGHT_ASSERTS or self.version.is_valid_exactly(self.data)
+        return self.data
+
+    def flush(self):
+        """
+        Take the built data out of the builder, and start with empty data
+        of the same schema version.
+
+        Returns:
+            The built data, adhering to the builder's schema version.
+        """
+        data = self.validate()
+        self.data = self.version.new()
+        return data
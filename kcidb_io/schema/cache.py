@@ -0,0 +1,104 @@
+"""
+Kernel CI reporting I/O schema - on-disk cache of compiled validation code
+
+The cache is enabled by setting the KCIDB_IO_CACHE_DIR environment variable
+to its directory. Run as "python3 -m kcidb_io.schema.cache" with it set, to
+fill the cache for all the schema versions in advance, e.g. when installing
+the package.
+"""
+
+import os
+import sys
+import hashlib
+import marshal
+import tempfile
+from types import CodeType
+from kcidb_io.misc import CACHE_DIR
+
+
+def get_path(source, name):
+    """
+    Get the path to the cache file for the code compiled from source.
+
+    Args:
+        source: The Python source code.
+        name:   The name of the source, e.g. its schema version.
+
+    Returns:
+        The path to the cache file, or None if caching is disabled.
+    """
+    if CACHE_DIR is None:
+        return None
+    # Key by the source (and so the schema and the compiler's version),
+    # and by the Python implementation, as marshal format differs
+    digest = hashlib.sha256(source.encode("utf-8", "surrogatepass"))
+    return os.path.join(
+        CACHE_DIR,
+        f"{name}-{digest.hexdigest()[:32]}."
+        f"{sys.implementation.cache_tag}.marshal"
+    )
+
+
+def compile_code(source, name):
+    """
+    Compile Python source code into a code object, loading it from the
+    on-disk cache, if there, and storing it there otherwise. Any failures
+    to access the cache are ignored.
+
+    Args:
+        source: The Python source code to compile.
+        name:   The name of the source, e.g. its schema version. Used in
+                the cache file name, and the code's file name.
+
+    Returns:
+        The compiled code object.
+    """
+    path = get_path(source, name)
+    if path is not None:
+        try:
+            with open(path, "rb") as file:
+                code = marshal.load(file)
+            if isinstance(code, CodeType):
+                return code
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    code = compile(source, f"<{name}>", "exec")
+
+    if path is not None:
+        tmp_path = None
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Write atomically, so concurrent readers see complete files
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                marshal.dump(code, file)
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except OSError:
+            pass
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+    return code
+
+
+def main():
+    """Fill the cache for all the schema versions"""
+    # Avoid the circular import, pylint: disable=import-outside-toplevel
+    from kcidb_io.schema import LATEST
+    if CACHE_DIR is None:
+        print("Caching is disabled, set KCIDB_IO_CACHE_DIR to enable",
+              file=sys.stderr)
+        return 1
+    LATEST.prewarm()
+    print(f"Cached validation code for {len(LATEST.history)} schema "
+          f"versions in {CACHE_DIR}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,562 @@
+"""
+Kernel CI reporting I/O schema - JSON schema compiler
+
+Translates (a subset of) JSON Schema Draft 7 into specialized Python
+validation functions, which only check whether an instance is valid, and
+do so much faster than a generic validator interpreting the schema.
+"""
+
+import re
+import math
+import numbers
+from collections.abc import Mapping, Sequence
+from urllib.parse import unquote
+from kcidb_io.schema.cache import compile_code
+
+
+class UnsupportedSchema(Exception):
+    """The schema uses features not supported by the compiler"""
+
+
+# Draft 7 keywords affecting validation, which the compiler doesn't support.
+# Unknown keywords are ignored, same as annotations.
+UNSUPPORTED_KEYWORDS = {
+    "$id", "additionalItems", "contains", "dependencies", "if",
+    "multipleOf", "patternProperties", "propertyNames", "uniqueItems",
+}
+
+# A map of JSON schema type names and templates of Python expressions
+# checking if a value named "{}" has that type
+TYPE_CHECKS = {
+    "string": "isinstance({}, str)",
+    "object": "isinstance({}, dict)",
+    "array": "isinstance({}, list)",
+    "boolean": "isinstance({}, bool)",
+    "null": "{} is None",
+    "integer": "_is_integer({})",
+    "number": "_is_number({})",
+}
+
+# A map of JSON schema type names and the keywords applying to them only
+TYPE_KEYWORDS = {
+    "string": ("pattern", "minLength", "maxLength"),
+    "number": ("minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum"),
+    "object": ("properties", "additionalProperties", "required",
+               "minProperties", "maxProperties"),
+    "array": ("items", "minItems", "maxItems"),
+}
+
+
+def _is_integer(value):
+    """Check if a value is a JSON Schema Draft 7 integer"""
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or \
+        (isinstance(value, float) and value.is_integer())
+
+
+def _is_number(value):
+    """Check if a value is a JSON Schema number"""
+    return not isinstance(value, bool) and isinstance(value, numbers.Number)
+
+
+def _unbool(value, true=object(), false=object()):
+    """Make True/False distinct from 1/0 for comparison"""
+    if value is True:
+        return true
+    if value is False:
+        return false
+    return value
+
+
+def _equal(first, second):
+    """Check if two JSON values are equal, the way JSON Schema does it"""
+    if first is second:
+        return True
+    if isinstance(first, str) or isinstance(second, str):
+        return first == second
+    if isinstance(first, Sequence) and isinstance(second, Sequence):
+        return len(first) == len(second) and \
+            all(_equal(f, s) for f, s in zip(first, second))
+    if isinstance(first, Mapping) and isinstance(second, Mapping):
+        return first.keys() == second.keys() and \
+            all(_equal(v, second[k]) for k, v in first.items())
+    return _unbool(first) == _unbool(second)
+
+
+def _get_conforms(format_checker):
+    """
+    Get a function checking if an instance conforms to a format, using a
+    jsonschema.FormatChecker, calling the checkers not raising exceptions
+    directly, for speed.
+
+    Args:
+        format_checker: The jsonschema.FormatChecker to check formats with,
+                        or None to accept any instance.
+
+    Returns:
+        A function accepting an instance and a format name, and returning
+        True if the instance conforms to the format, False otherwise.
+    """
+    if format_checker is None:
+        return lambda instance, format: True
+    checkers = {
+        name: func
+        for name, (func, raises) in format_checker.checkers.items()
+        if not raises
+    }
+    conforms = format_checker.conforms
+
+    def checker_conforms(instance, format_name):
+        """Check if an instance conforms to a format"""
+        checker = checkers.get(format_name)
+        if checker is None:
+            return conforms(instance, format_name)
+        return checker(instance)
+
+    return checker_conforms
+
+
+def _escape(token):
+    """Escape a JSON pointer reference token"""
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _is_literal(value):
+    """Check if a JSON value can be represented with a Python literal"""
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, (list, tuple)):
+        return all(map(_is_literal, value))
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _is_literal(v)
+                   for k, v in value.items())
+    return value is None or isinstance(value, (bool, int, str))
+
+
+class Generator:
+    """Python source generator for JSON schema validation functions"""
+
+    def __init__(self, schema):
+        """
+        Initialize the generator.
+
+        Args:
+            schema: The root JSON schema to generate validation functions
+                    for.
+        """
+        self.schema = schema
+        # A map of JSON pointers and names of their validation functions
+        self.functions = {}
+        # JSON pointers of functions waiting to be generated
+        self.queue = []
+        # Lines of constant definitions
+        self.constants = []
+        # Lines of function definitions
+        self.definitions = []
+        # A map of constant expressions and their names
+        self.constant_names = {}
+        # The counter used for generating unique names
+        self.counter = 0
+
+    def name(self, prefix):
+        """Generate a unique name with the specified prefix"""
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def constant(self, value):
+        """Define a constant with a Python expression, return its name"""
+        if value not in self.constant_names:
+            name = self.name("_c")
+            self.constants.append(f"{name} = {value}")
+            self.constant_names[value] = name
+        return self.constant_names[value]
+
+    def resolve(self, pointer):
+        """
+        Resolve a JSON pointer into the root schema.
+
+        Args:
+            pointer:    The JSON pointer (as a URI fragment) to resolve.
+
+        Returns:
+            The schema the pointer refers to.
+
+        Raises:
+            UnsupportedSchema - the pointer is not local, or doesn't resolve.
+        """
+        if not pointer.startswith("#"):
+            raise UnsupportedSchema(f"Non-local reference {pointer!r}")
+        node = self.schema
+        for token in unquote(pointer[1:]).split("/")[1:]:
+            token = token.replace("~1", "/").replace("~0", "~")
+            try:
+                node = node[int(token) if isinstance(node, list) else token]
+            except (KeyError, IndexError, TypeError, ValueError) as exc:
+                raise UnsupportedSchema(
+                    f"Reference {pointer!r} doesn't resolve"
+                ) from exc
+        return node
+
+    def function(self, pointer):
+        """
+        Get the name of the validation function for a schema, scheduling
+        its generation, if not done yet.
+
+        Args:
+            pointer:    The JSON pointer to the schema.
+
+        Returns:
+            The name of the function.
+        """
+        if pointer not in self.functions:
+            self.functions[pointer] = self.name("_v")
+            self.queue.append(pointer)
+        return self.functions[pointer]
+
+    def generate(self):
+        """
+        Generate the source of all the scheduled functions and their
+        dependencies.
+
+        Returns:
+            The Python source code of a module defining the functions, and a
+            FUNCTIONS dictionary mapping JSON pointers to them.
+        """
+        while self.queue:
+            pointer = self.queue.pop(0)
+            lines = [f"def {self.functions[pointer]}(x):"]
+            self.emit(lines, "    ", pointer, self.resolve(pointer), "x")
+            lines.append("    return True")
+            self.definitions.extend(lines + [""])
+        return "\n".join(
+            self.constants + [""] + self.definitions +
+            ["FUNCTIONS = {"] +
+            [f"    {p!r}: {n}," for p, n in self.functions.items()] +
+            ["}", ""]
+        )
+
+    # It's a dispatcher, pylint: disable=too-many-arguments,too-many-branches
+    # pylint: disable=too-many-positional-arguments
+    def emit(self, lines, indent, pointer, schema, var):
+        """
+        Generate statements returning False, if a variable doesn't match a
+        schema.
+
+        Args:
+            lines:      The list of lines to append the statements to.
+            indent:     The indentation of the statements.
+            pointer:    The JSON pointer to the schema.
+            schema:     The schema to generate the statements for.
+            var:        The name of the variable to check.
+        """
+        if schema is True:
+            return
+        if schema is False:
+            lines.append(f"{indent}return False")
+            return
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(f"Invalid schema at {pointer!r}")
+        # Draft 7 ignores everything next to a reference
+        if "$ref" in schema:
+            name = self.function(schema["$ref"])
+            lines.append(f"{indent}if not {name}({var}):")
+            lines.append(f"{indent}    return False")
+            return
+        unsupported = UNSUPPORTED_KEYWORDS & set(schema)
+        if unsupported:
+            raise UnsupportedSchema(
+                f"Unsupported keywords {sorted(unsupported)!r} "
+                f"at {pointer!r}"
+            )
+
+        # Check the type, if specified, and remember the possible types
+        types = None
+        if "type" in schema:
+            types = schema["type"]
+            types = [types] if isinstance(types, str) else list(types)
+            if not types or not all(t in TYPE_CHECKS for t in types):
+                raise UnsupportedSchema(f"Invalid type at {pointer!r}")
+            lines.append(
+                f"{indent}if not (" +
+                " or ".join(TYPE_CHECKS[t].format(var) for t in types) +
+                "):"
+            )
+            lines.append(f"{indent}    return False")
+
+        self.emit_generic(lines, indent, pointer, schema, var)
+
+        # Check type-specific keywords
+        for type_name, keywords in TYPE_KEYWORDS.items():
+            if not set(keywords) & set(schema):
+                continue
+            # If the value can't have this type
+            if types is not None and type_name not in types and \
+               not (type_name == "number" and "integer" in types):
+                continue
+            emitter = getattr(self, "emit_" + type_name)
+            # If the value can only have this type
+            if types is not None and \
+               (types == [type_name] or
+                    type_name == "number" and set(types) <= {"integer"}):
+                emitter(lines, indent, pointer, schema, var)
+            else:
+                lines.append(
+                    f"{indent}if {TYPE_CHECKS[type_name].format(var)}:"
+                )
+                emitter(lines, indent + "    ", pointer, schema, var)
+
+    # Same as emit(), pylint: disable=too-many-arguments
+    def emit_block(self, lines, indent, header, pointer, schema, var):
+        """
+        Generate statements returning False, if a variable doesn't match a
+        schema, nested under header statements. Generate nothing, if the
+        schema accepts anything.
+
+        Args:
+            lines:      The list of lines to append the statements to.
+            indent:     The indentation of the header statements.
+            header:     A list of header statements. Each statement ending
+                        with a colon nests the following ones.
+            pointer:    The JSON pointer to the schema.
+            schema:     The schema to generate the statements for.
+            var:        The name of the variable to check.
+        """
+        header_lines = []
+        for statement in header:
+            header_lines.append(indent + statement)
+            if statement.endswith(":"):
+                indent += "    "
+        body = []
+        self.emit(body, indent, pointer, schema, var)
+        if body:
+            lines.extend(header_lines + body)
+
+    # Same as emit(), pylint: disable=too-many-arguments
+    def emit_generic(self, lines, indent, pointer, schema, var):
+        """Generate checks of keywords applying to any type"""
+        def check(condition):
+            lines.append(f"{indent}if {condition}:")
+            lines.append(f"{indent}    return False")
+
+        if "enum" in schema:
+            enum = schema["enum"]
+            if not isinstance(enum, list) or not _is_literal(enum):
+                raise UnsupportedSchema(f"Unsupported enum at {pointer!r}")
+            if all(isinstance(e, str) for e in enum):
+                name = self.constant(f"frozenset({enum!r})")
+                check(f"not (isinstance({var}, str) and {var} in {name})")
+            else:
+                name = self.constant(repr(tuple(enum)))
+                check(f"not any(_equal({var}, e) for e in {name})")
+        if "const" in schema:
+            const = schema["const"]
+            if not _is_literal(const):
+                raise UnsupportedSchema(f"Unsupported const at {pointer!r}")
+            if isinstance(const, str):
+                check(f"{var} != {const!r}")
+            else:
+                check(f"not _equal({var}, {const!r})")
+        if "format" in schema:
+            check(f"not _conforms({var}, {schema['format']!r})")
+        for keyword in ("allOf", "anyOf", "oneOf"):
+            if keyword not in schema:
+                continue
+            if not isinstance(schema[keyword], list) or \
+               not schema[keyword]:
+                raise UnsupportedSchema(
+                    f"Invalid {keyword} at {pointer!r}"
+                )
+            calls = [
+                f"{self.function(f'{pointer}/{keyword}/{i}')}({var})"
+                for i in range(len(schema[keyword]))
+            ]
+            if keyword == "allOf":
+                check("not (" + " and ".join(calls) + ")")
+            elif keyword == "anyOf":
+                check("not (" + " or ".join(calls) + ")")
+            else:
+                check("(" + " + ".join(calls) + ") != 1")
+        if "not" in schema:
+            check(f"{self.function(pointer + '/not')}({var})")
+
+    # Same as emit(), pylint: disable=too-many-arguments
+    def emit_string(self, lines, indent, pointer, schema, var):
+        """Generate checks of string keywords"""
+        if "pattern" in schema:
+            try:
+                re.compile(schema["pattern"])
+            except (re.error, TypeError) as exc:
+                raise UnsupportedSchema(
+                    f"Invalid pattern at {pointer!r}"
+                ) from exc
+            name = self.constant(
+                f"re.compile({schema['pattern']!r}).search"
+            )
+            lines.append(f"{indent}if not {name}({var}):")
+            lines.append(f"{indent}    return False")
+        for keyword, operator in (("minLength", "<"), ("maxLength", ">")):
+            if keyword in schema:
+                lines.append(
+                    f"{indent}if len({var}) {operator} {schema[keyword]!r}:"
+                )
+                lines.append(f"{indent}    return False")
+
+    # Same as emit(), pylint: disable=too-many-arguments
+    def emit_number(self, lines, indent, pointer, schema, var):
+        """Generate checks of numeric keywords"""
+        for keyword, operator in (("minimum", "<"),
+                                  ("maximum", ">"),
+                                  ("exclusiveMinimum", "<="),
+                                  ("exclusiveMaximum", ">=")):
+            if keyword in schema:
+                if not _is_number(schema[keyword]):
+                    raise UnsupportedSchema(
+                        f"Invalid {keyword} at {pointer!r}"
+                    )
+                lines.append(
+                    f"{indent}if {var} {operator} {schema[keyword]!r}:"
+                )
+                lines.append(f"{indent}    return False")
+
+    # Same as emit(), pylint: disable=too-many-arguments
+    def emit_object(self, lines, indent, pointer, schema, var):
+        """Generate checks of object keywords"""
+        properties = schema.get("properties", {})
+        additional = schema.get("additionalProperties", True)
+        if not isinstance(properties, dict):
+            raise UnsupportedSchema(f"Invalid properties at {pointer!r}")
+        for keyword, operator in (("minProperties", "<"),
+                                  ("maxProperties", ">")):
+            if keyword in schema:
+                lines.append(
+                    f"{indent}if len({var}) {operator} {schema[keyword]!r}:"
+                )
+                lines.append(f"{indent}    return False")
+        if schema.get("required"):
+            lines.append(
+                f"{indent}if " +
+                " or ".join(f"{name!r} not in {var}"
+                            for name in schema["required"]) +
+                ":"
+            )
+            lines.append(f"{indent}    return False")
+        if additional is not True:
+            names = self.constant(f"frozenset({list(properties)!r})")
+            if additional is False:
+                lines.append(f"{indent}if not {names}.issuperset({var}):")
+                lines.append(f"{indent}    return False")
+            else:
+                key, value = self.name("k"), self.name("x")
+                self.emit_block(
+                    lines, indent,
+                    [f"for {key}, {value} in {var}.items():",
+                     f"if {key} not in {names}:"],
+                    pointer + "/additionalProperties", additional, value
+                )
+        for name, subschema in properties.items():
+            value = self.name("x")
+            self.emit_block(
+                lines, indent,
+                [f"{value} = {var}.get({name!r}, _missing)",
+                 f"if {value} is not _missing:"],
+                f"{pointer}/properties/{_escape(name)}", subschema, value
+            )
+
+    # Same as emit(), pylint: disable=too-many-arguments
+    def emit_array(self, lines, indent, pointer, schema, var):
+        """Generate checks of array keywords"""
+        for keyword, operator in (("minItems", "<"), ("maxItems", ">")):
+            if keyword in schema:
+                lines.append(
+                    f"{indent}if len({var}) {operator} {schema[keyword]!r}:"
+                )
+                lines.append(f"{indent}    return False")
+        if "items" in schema:
+            if isinstance(schema["items"], list):
+                raise UnsupportedSchema(
+                    f"Unsupported tuple items at {pointer!r}"
+                )
+            item = self.name("x")
+            self.emit_block(lines, indent, [f"for {item} in {var}:"],
+                            pointer + "/items", schema["items"], item)
+
+
+def generate(schema, pointers=("#",)):
+    """
+    Generate Python source code of validation functions for a JSON schema.
+
+    Args:
+        schema:     The JSON schema (Draft 7) to generate the code for.
+        pointers:   An iterable of JSON pointers (URI fragments) to the
+                    (sub)schemas the code should provide functions for.
+
+    Returns:
+        The Python source code of a module defining a FUNCTIONS dictionary,
+        mapping the JSON pointers to the functions. Each function accepts a
+        single instance argument and returns True if it's valid, and False
+        otherwise. The code expects to be executed with load().
+
+    Raises:
+        UnsupportedSchema - the schema uses features not supported by the
+                            compiler.
+    """
+    generator = Generator(schema)
+    for pointer in pointers:
+        generator.function(pointer)
+    return generator.generate()
+
+
+def load(code, format_checker=None):
+    """
+    Load validation functions from the code produced by generate().
+
+    Args:
+        code:           The generated source code, or its compiled code
+                        object.
+        format_checker: The jsonschema.FormatChecker to check the "format"
+                        keyword with, or None to ignore it.
+
+    Returns:
+        A dictionary of JSON pointers and validation functions.
+    """
+    namespace = dict(
+        re=re,
+        _missing=object(),
+        _is_integer=_is_integer,
+        _is_number=_is_number,
+        _equal=_equal,
+        _conforms=_get_conforms(format_checker),
+    )
+    # That's the point, pylint: disable=exec-used
+    exec(code, namespace)
+    return namespace["FUNCTIONS"]
+
+
+def compile_schema(schema, pointers=("#",), format_checker=None,
+                   cache_name=None):
+    """
+    Compile a JSON schema into Python validation functions.
+
+    Args:
+        schema:         The JSON schema (Draft 7) to compile.
+        pointers:       An iterable of JSON pointers (URI fragments) to the
+                        (sub)schemas to provide functions for.
+        format_checker: The jsonschema.FormatChecker to check the "format"
+                        keyword with, or None to ignore it.
+        cache_name:     The name to cache the compiled code on disk under
+                        (see kcidb_io.schema.cache), or None to not cache it.
+
+    Returns:
+        A dictionary of JSON pointers and validation functions. Each function
+        accepts a single instance argument and returns True if it's valid,
+        and False otherwise.
+
+    Raises:
+        UnsupportedSchema - the schema uses features not supported by the
+                            compiler.
+    """
+    source = generate(schema, pointers)
+    return load(source if cache_name is None
+                else compile_code(source, cache_name),
+                format_checker)
@@ -0,0 +1,150 @@
+"""
+Kernel CI reporting I/O schema - format checking
+
+Checkers for the string formats used by the schemas ("uri", "email", and
+"date-time"), accepting exactly the same strings as the ones jsonschema
+uses (from the "rfc3987" and "rfc3339-validator" packages), but faster,
+and remembering the recently-checked values.
+"""
+
+import re
+import calendar
+from functools import lru_cache
+import jsonschema
+
+# The maximum number of recently-checked values to remember, per format
+MEMO_SIZE = 65536
+
+# Character classes and patterns from RFC 3986 Appendix A
+_UNRESERVED = r"a-zA-Z0-9_.~\-"
+_SUB_DELIMS = r"!$&'()*+,;="
+_H16 = r"[0-9A-Fa-f]{1,4}"
+_DEC_OCTET = r"(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)"
+_IPV4ADDRESS = rf"(?:{_DEC_OCTET}\.){{3}}{_DEC_OCTET}"
+_LS32 = rf"(?:{_H16}:{_H16}|{_IPV4ADDRESS})"
+_IPV6ADDRESS = (
+    rf"(?:(?:{_H16}:){{6}}{_LS32}"
+    rf"|::(?:{_H16}:){{5}}{_LS32}"
+    rf"|(?:{_H16})?::(?:{_H16}:){{4}}{_LS32}"
+    rf"|(?:(?:{_H16}:)?{_H16})?::(?:{_H16}:){{3}}{_LS32}"
+    rf"|(?:(?:{_H16}:){{,2}}{_H16})?::(?:{_H16}:){{2}}{_LS32}"
+    rf"|(?:(?:{_H16}:){{,3}}{_H16})?::{_H16}:{_LS32}"
+    rf"|(?:(?:{_H16}:){{,4}}{_H16})?::{_LS32}"
+    rf"|(?:(?:{_H16}:){{,5}}{_H16})?::{_H16}"
+    rf"|(?:(?:{_H16}:){{,6}}{_H16})?::)"
+)
+_IPVFUTURE = rf"v[0-9A-Fa-f]+\.[{_UNRESERVED}{_SUB_DELIMS}:]+"
+# Percent signs are accepted wherever percent-encoding is, and checked to
+# be followed by two hex digits separately, which is faster
+_REG_NAME = rf"[{_UNRESERVED}{_SUB_DELIMS}%]*"
+_USERINFO = rf"[{_UNRESERVED}{_SUB_DELIMS}:%]*"
+# The IPv4 addresses are a subset of registered names
+_AUTHORITY = (
+    rf"(?:{_USERINFO}@)?"
+    rf"(?:\[(?:{_IPV6ADDRESS}|{_IPVFUTURE})\]|{_REG_NAME})"
+    rf"(?::[0-9]*)?"
+)
+# Paths are sequences of "pchar"s and slashes, and queries and fragments
+# are sequences of "pchar"s, slashes, and question marks
+_PATH = rf"[{_UNRESERVED}{_SUB_DELIMS}:@/%]*"
+_QUERY = rf"[{_UNRESERVED}{_SUB_DELIMS}:@/?%]*"
+
+# The regular expression matching an RFC 3986 URI, provided all its percent
+# signs are followed by two hex digits. The hierarchical part is either an
+# authority followed by an empty or absolute path, or a path not starting
+# with two slashes. Like the "rfc3987" package, accepts a trailing newline.
+URI_RE = re.compile(
+    rf"[a-zA-Z][a-zA-Z0-9+.\-]*:"
+    rf"(?://{_AUTHORITY}(?:/{_PATH})?|(?!//){_PATH})"
+    rf"(?:\?{_QUERY})?(?:#{_QUERY})?$"
+)
+
+# The regular expression matching an invalid percent-encoding
+INVALID_PCT_ENCODED_RE = re.compile(r"%(?![0-9A-Fa-f]{2})")
+
+# The regular expression matching an RFC 3339 date-time (in upper case),
+# capturing the year, the month, and the day. Like the "rfc3339-validator"
+# package, accepts a trailing newline.
+DATE_TIME_RE = re.compile(
+    r"([0-9]{4})-(0[1-9]|1[0-2])-([0-9]{2})"
+    r"T(?:[01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9](?:\.[0-9]+)?"
+    r"(?:Z|[+-](?:[01][0-9]|2[0-3]):[0-5][0-9])$"
+)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _is_uri(instance):
+    """Check if a string is a valid URI"""
+    return URI_RE.match(instance) is not None and (
+        "%" not in instance or
+        INVALID_PCT_ENCODED_RE.search(instance) is None
+    )
+
+
+def is_uri(instance):
+    """
+    Check if an instance is a valid URI, if it's a string.
+
+    Args:
+        instance:   The instance to check.
+
+    Returns:
+        True if the instance is not a string, or is a valid URI,
+        False otherwise.
+    """
+    return not isinstance(instance, str) or _is_uri(instance)
+
+
+def is_email(instance):
+    """
+    Check if an instance is a valid e-mail address, if it's a string.
+    Only checks that the string contains an "@", as jsonschema does.
+
+    Args:
+        instance:   The instance to check.
+
+    Returns:
+        True if the instance is not a string, or is a valid e-mail address,
+        False otherwise.
+    """
+    return not isinstance(instance, str) or "@" in instance
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _is_date_time(instance):
+    """Check if a string is a valid date-time"""
+    match = DATE_TIME_RE.match(instance.upper())
+    if match is None:
+        return False
+    year, month, day = map(int, match.groups())
+    # Year zero is not valid, and leap seconds are not supported
+    return year != 0 and 1 <= day and \
+        (day <= 28 or day <= calendar.monthrange(year, month)[1])
+
+
+def is_date_time(instance):
+    """
+    Check if an instance is a valid RFC 3339 date-time, if it's a string.
+
+    Args:
+        instance:   The instance to check.
+
+    Returns:
+        True if the instance is not a string, or is a valid date-time,
+        False otherwise.
+    """
+    return not isinstance(instance, str) or _is_date_time(instance)
+
+
+# The checkers of the formats used by the schemas
+CHECKERS = {
+    "uri": is_uri,
+    "email": is_email,
+    "date-time": is_date_time,
+}
+
+# The format checker for the formats used by the schemas, to be used
+# instead of jsonschema's default one
+FORMAT_CHECKER = jsonschema.FormatChecker(formats=())
+for _name, _checker in CHECKERS.items():
+    FORMAT_CHECKER.checks(_name)(_checker)
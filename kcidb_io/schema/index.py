@@ -0,0 +1,375 @@
+"""Kernel CI reporting I/O schema - object graph index"""
+
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+from kcidb_io.misc import LIGHT_ASSERTS
+
+# A reference from an object to another object, which is not in the data:
+# the name of the list containing the referencing object, its ID, the name
+# of the list the referenced object would be in, and its ID. The IDs are
+# either single values, or tuples of values, as Version.get_ids() returns.
+DanglingReference = namedtuple(
+    "DanglingReference",
+    "obj_list_name obj_id target_obj_list_name target_id"
+)
+
+
+def get_link_fields(version, obj_list_name, parent_obj_list_name):
+    """
+    Get the names of an object's fields linking it to its parent, i.e.
+    containing the parent's ID: the singular name of the parent's type,
+    followed by an underscore, and the name of the parent's ID field, for
+    each of those.
+
+    Args:
+        version:                The schema version (a Version subclass).
+        obj_list_name:          The name of the object's list.
+        parent_obj_list_name:   The name of the parent's list. Must be the
+                                parent of the object's list in the version's
+                                graph.
+
+    Returns:
+        A tuple of the names of the fields.
+    """
+    assert obj_list_name in version.graph.get(parent_obj_list_name, ())
+    prefix = parent_obj_list_name.removesuffix("s")
+    return tuple(f"{prefix}_{field}"
+                 for field in version.id_fields[parent_obj_list_name])
+
+
+def _get_link(fields, obj):
+    """
+    Get the ID of an object's parent from its link fields.
+
+    Args:
+        fields: A tuple of the names of the link fields.
+        obj:    The object to get the parent's ID from.
+
+    Returns:
+        The parent's ID, as Version.get_ids() returns it, or None if the
+        object has no link to the parent.
+    """
+    if len(fields) == 1:
+        return obj.get(fields[0])
+    values = tuple(map(obj.get, fields))
+    return None if None in values else values
+
+
+def find_dangling_references(version, obj_list_name, objs, *id_maps):
+    """
+    Find references from objects to parents, which are not known.
+
+    Args:
+        version:        The schema version (a Version subclass) the objects
+                        adhere to.
+        obj_list_name:  The name of the objects' list.
+        objs:           A list of the (valid) objects to check.
+        id_maps:        Dictionaries of object list names, and containers
+                        of known IDs of objects in them (e.g. sets), as
+                        Version.get_ids() would return them. A reference is
+                        resolved if it's found in any of them.
+
+    Returns:
+        A list of DanglingReference named tuples, one for each unresolved
+        reference, grouped by the parents' lists in the graph order, and
+        then in the order of objects.
+    """
+    get_id = itemgetter(*version.id_fields[obj_list_name])
+    dangling_references = []
+    for parent_obj_list_name, fields in get_links(version)[obj_list_name]:
+        parent_id_sets = [id_map[parent_obj_list_name] for id_map in id_maps
+                          if parent_obj_list_name in id_map]
+        for obj in objs:
+            parent_id = _get_link(fields, obj)
+            if parent_id is None:
+                continue
+            for ids in parent_id_sets:
+                if parent_id in ids:
+                    break
+            else:
+                dangling_references.append(DanglingReference(
+                    obj_list_name, get_id(obj),
+                    parent_obj_list_name, parent_id
+                ))
+    return dangling_references
+
+
+# The ID maps to resolve references against, in a worker process,
+# set by init_worker()
+_WORKER_ID_MAPS = ()
+
+
+def init_worker(*id_maps):
+    """
+    Initialize a worker process for find_dangling_references_in_worker(),
+    so the (potentially large) ID maps are only transferred once.
+
+    Args:
+        id_maps:    The dictionaries of object list names and containers of
+                    known IDs, to resolve references against.
+    """
+    # It's per-process state, pylint: disable=global-statement
+    global _WORKER_ID_MAPS
+    _WORKER_ID_MAPS = id_maps
+
+
+def find_dangling_references_in_worker(version, obj_list_name, objs):
+    """
+    Find references from objects to parents, which are not known, using
+    the ID maps the worker process was initialized with.
+
+    Args:
+        version:        The schema version (a Version subclass) the objects
+                        adhere to.
+        obj_list_name:  The name of the objects' list.
+        objs:           A list of the (valid) objects to check.
+
+    Returns:
+        A list of DanglingReference named tuples, as
+        find_dangling_references() returns.
+    """
+    return find_dangling_references(version, obj_list_name, objs,
+                                    *_WORKER_ID_MAPS)
+
+
+@lru_cache(maxsize=None)
+def get_links(version):
+    """
+    Get the descriptions of links between objects of a schema version.
+    Cached per-version.
+
+    Args:
+        version:    The schema version (a Version subclass).
+
+    Returns:
+        A dictionary of object list names, and tuples of tuples, one per
+        parent object list: its name, and the tuple of the link fields.
+    """
+    links = {name: [] for name in version.graph if name}
+    for parent_obj_list_name, obj_list_names in version.graph.items():
+        if not parent_obj_list_name:
+            continue
+        for obj_list_name in obj_list_names:
+            links[obj_list_name].append((
+                parent_obj_list_name,
+                get_link_fields(version, obj_list_name, parent_obj_list_name)
+            ))
+    return {name: tuple(obj_links) for name, obj_links in links.items()}
+
+
+@lru_cache(maxsize=None)
+def get_order(version):
+    """
+    Get the names of object lists of a schema version, ordered so that
+    parents go before their children. Cached per-version.
+
+    Args:
+        version:    The schema version (a Version subclass).
+
+    Returns:
+        A tuple of object list names.
+    """
+    links = get_links(version)
+    order = {}
+
+    def add(obj_list_name):
+        """Add an object list name after the names of its parents"""
+        if obj_list_name not in order:
+            for parent_obj_list_name, _ in links[obj_list_name]:
+                add(parent_obj_list_name)
+            order[obj_list_name] = None
+
+    for obj_list_name in links:
+        add(obj_list_name)
+    return tuple(order)
+
+
+class Index:
+    """
+    An index of objects in a dataset by their IDs, and of the links between
+    them, along the schema version's graph, built in a single pass.
+    Objects with duplicate IDs are indexed by the first one, but the
+    children of all of them are indexed.
+    """
+
+    def __init__(self, version, data):
+        """
+        Build the index of a dataset.
+
+        Args:
+            version:    The schema version (a Version subclass) the data
+                        adheres to, exactly.
+            data:       The valid data to index. Must not be changed while
+                        the index is in use.
+        """
+        # The schema version the data adheres to
+        self.version = version
+        # The indexed data
+        self.data = data
+        # Object list names, and dictionaries of IDs and objects
+        self.objs = {}
+        # Object list names, and dictionaries of IDs and positions of
+        # objects in their lists
+        self.positions = {}
+        # Object list names, and dictionaries of IDs of objects referenced
+        # as parents, and dictionaries of child object list names, and
+        # lists of IDs of the children
+        self.children = {}
+        for obj_list_name, id_fields in version.id_fields.items():
+            objs = self.objs[obj_list_name] = {}
+            positions = self.positions[obj_list_name] = {}
+            self.children.setdefault(obj_list_name, {})
+            obj_links = [
+                (self.children.setdefault(parent_obj_list_name, {}), fields)
+                for parent_obj_list_name, fields
+                in get_links(version)[obj_list_name]
+            ]
+            get_id = itemgetter(*id_fields)
+            for position, obj in enumerate(data.get(obj_list_name, ())):
+                obj_id = get_id(obj)
+                if obj_id not in objs:
+                    objs[obj_id] = obj
+                    positions[obj_id] = position
+                for parent_children, fields in obj_links:
+                    parent_id = _get_link(fields, obj)
+                    if parent_id is not None:
+                        parent_children.setdefault(parent_id, {}). \
+                            setdefault(obj_list_name, []).append(obj_id)
+
+    def get_obj(self, obj_list_name, obj_id):
+        """
+        Get an object by its ID.
+
+        Args:
+            obj_list_name:  The name of the object's list.
+            obj_id:         The object's ID, as Version.get_ids() returns.
+
+        Returns:
+            The (first) object with the ID, or None if not found.
+        """
+        return self.objs[obj_list_name].get(obj_id)
+
+    def get_children(self, obj_list_name, obj_id):
+        """
+        Get the IDs of an object's children.
+
+        Args:
+            obj_list_name:  The name of the object's list.
+            obj_id:         The object's ID, as Version.get_ids() returns.
+                            The object doesn't have to be in the data.
+
+        Returns:
+            A dictionary of the names of the children's lists, and lists of
+            the children's IDs, in the data order. Must not be modified.
+        """
+        return self.children[obj_list_name].get(obj_id, {})
+
+    def get_parents(self, obj_list_name, obj_id):
+        """
+        Get the IDs of an object's parents.
+
+        Args:
+            obj_list_name:  The name of the object's list.
+            obj_id:         The object's ID, as Version.get_ids() returns.
+
+        Returns:
+            A dictionary of the names of the parents' lists, and the
+            parents' IDs, for every parent the object links to, whether it
+            is in the data, or not. None if the object is not in the data.
+        """
+        obj = self.get_obj(obj_list_name, obj_id)
+        if obj is None:
+            return None
+        parents = {}
+        for parent_obj_list_name, fields in \
+                get_links(self.version)[obj_list_name]:
+            parent_id = _get_link(fields, obj)
+            if parent_id is not None:
+                parents[parent_obj_list_name] = parent_id
+        return parents
+
+    def get_orphans(self):
+        """
+        Find the objects linking to parents which are not in the data.
+
+        Returns:
+            A list of DanglingReference named tuples, one for each link to a
+            missing parent, grouped by the parent's list, in the graph
+            order, and then by the parent, in the order of the first link to
+            it.
+        """
+        return [
+            DanglingReference(obj_list_name, obj_id,
+                              parent_obj_list_name, parent_id)
+            for parent_obj_list_name, parent_children in self.children.items()
+            for parent_id, children in parent_children.items()
+            if parent_id not in self.objs[parent_obj_list_name]
+            for obj_list_name, obj_ids in children.items()
+            for obj_id in obj_ids
+        ]
+
+    def extract(self, roots):
+        """
+        Extract a subgraph from the indexed data: the objects with the
+        specified IDs, all their descendants, and all the ancestors of
+        those (e.g. the issues and the tests their incidents link to), so
+        the links within the subgraph resolve as they do in the data.
+        Only takes time proportional to the size of the subgraph, so
+        repeated extractions from the same index are cheap.
+
+        Args:
+            roots:  A dictionary of object list names, and iterables of
+                    IDs of the objects to start with, as
+                    Version.get_ids() returns them. The objects don't have
+                    to be in the data, but their descendants are
+                    extracted, if they are.
+
+        Returns:
+            A dataset of the indexed data's version, containing the
+            subgraph's objects in the data order, and without objects with
+            duplicate IDs. The objects are shared with the indexed data,
+            not copied.
+        """
+        # Object list names, and sets of reached IDs, including the ones
+        # missing from the data, in the order parents go before children
+        reached = {name: set() for name in get_order(self.version)}
+        for obj_list_name, obj_ids in roots.items():
+            reached[obj_list_name].update(obj_ids)
+        # Reach the descendants, list by list, after all their parents
+        for obj_list_name, obj_ids in reached.items():
+            children = self.children[obj_list_name]
+            for obj_id in obj_ids:
+                for child_obj_list_name, child_obj_ids in \
+                        children.get(obj_id, {}).items():
+                    reached[child_obj_list_name].update(child_obj_ids)
+        # Select the reached objects which are in the data
+        selected = {
+            obj_list_name: obj_ids & self.objs[obj_list_name].keys()
+            for obj_list_name, obj_ids in reached.items()
+        }
+        # Select the ancestors, list by list, after all their children
+        for obj_list_name in reversed(selected):
+            objs = [self.objs[obj_list_name][obj_id]
+                    for obj_id in selected[obj_list_name]]
+            for parent_obj_list_name, fields in \
+                    get_links(self.version)[obj_list_name]:
+                if len(fields) == 1:
+                    parent_ids = {obj.get(fields[0]) for obj in objs}
+                else:
+                    parent_ids = {_get_link(fields, obj) for obj in objs}
+                # The missing (None) IDs are dropped here
+                selected[parent_obj_list_name] |= \
+                    parent_ids & self.objs[parent_obj_list_name].keys()
+
+        data = self.version.new()
+        for obj_list_name in self.version.id_fields:
+            obj_ids = selected[obj_list_name]
+            if obj_ids:
+                data[obj_list_name] = list(map(
+                    self.objs[obj_list_name].__getitem__,
+                    sorted(obj_ids,
+                           key=self.positions[obj_list_name].__getitem__)
+                ))
+        assert LIGHT_ASSERTS or self.version.is_valid_exactly(data)
+        return data
@@ -1,8 +1,16 @@
 """Abstract module tests"""
 
+import io
+import json
 import unittest
+from copy import deepcopy
+import jsonschema
+from kcidb_io import schema, stream
+from kcidb_io.schema import LATEST, abstract
 from kcidb_io.schema.abstract import Version
 
+# It's OK, pylint: disable=too-many-lines
+
 
 class VersionTestCase(unittest.TestCase):
     """Version class test case"""
@@ -368,3 +376,882 @@ class VersionTestCase(unittest.TestCase):
             builds=[dict(id="b", comment="Beta")],
             issues=[dict(id="f", version=0xf, comment="Feta")],
         )
+
+    def test_validate_parallel(self):
+        """Check parallel validation works correctly"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"origin:{i}", origin="origin")
+                       for i in range(1000)],
+            tests=[dict(id=f"origin:{i}", origin="origin",
+                        build_id="origin:1", path="a.b")
+                   for i in range(1000)],
+        )
+        assert LATEST.validate(data, workers=2) is data
+        assert LATEST.validate_exactly(data, workers=2) is data
+
+        data["tests"][700]["path"] = "a..b"
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as \
+                parallel:
+            LATEST.validate(data, workers=2)
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as \
+                serial:
+            LATEST.validate(data)
+        self.assertEqual(parallel.exception.message, serial.exception.message)
+        self.assertEqual(list(parallel.exception.path),
+                         ["tests", 700, "path"])
+        self.assertEqual(list(parallel.exception.path),
+                         list(serial.exception.path))
+
+        # Check errors outside objects are found too
+        data = LATEST.new() | dict(checkouts={})
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            LATEST.validate(data, workers=2)
+
+    def test_validate_stream(self):
+        """Check stream validation works correctly"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"origin:{i}", origin="origin")
+                       for i in range(100)],
+            tests=[dict(id=f"origin:{i}", origin="origin",
+                        build_id="origin:1", path="a.b")
+                   for i in range(100)],
+        )
+        text = json.dumps(data)
+        self.assertIs(LATEST.validate_stream(io.StringIO(text)), LATEST)
+        self.assertIs(LATEST.validate_stream(io.BytesIO(text.encode())),
+                      LATEST)
+        # Check objects preceding the version are validated
+        text = json.dumps(dict(tests=data["tests"],
+                               version=dict(major=4, minor=1)))
+        self.assertIs(LATEST.validate_stream(io.StringIO(text)),
+                      LATEST.get_exactly_compatible(json.loads(text)))
+
+        data["tests"][50]["path"] = "a..b"
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as \
+                streamed:
+            LATEST.validate_stream(io.StringIO(json.dumps(data)))
+        self.assertEqual(list(streamed.exception.path),
+                         ["tests", 50, "path"])
+        for text in (json.dumps(dict(version=dict(major=1000))),
+                     json.dumps(dict(checkouts=[]))):
+            with self.assertRaises(jsonschema.exceptions.ValidationError):
+                LATEST.validate_stream(io.StringIO(text))
+
+    def test_lookup(self):
+        """Check versions are looked up correctly"""
+        for version in LATEST.history:
+            self.assertIs(LATEST.lookup(version.major, version.minor),
+                          version)
+            self.assertIs(schema.get(version.major, version.minor), version)
+            data = version.new()
+            self.assertIs(LATEST.get_exactly_compatible(data), version)
+            self.assertIs(LATEST.get_directly_compatible(data),
+                          max(v for v in LATEST.lineage
+                              if v.major == version.major))
+            self.assertTrue(LATEST.is_compatible(data))
+            # Check newer versions are not found from older ones
+            if version.previous:
+                self.assertIsNone(
+                    version.previous.get_exactly_compatible(data)
+                )
+                self.assertIsNone(version.previous.lookup(version.major,
+                                                          version.minor))
+        self.assertIsNone(schema.get(1000, 0))
+        self.assertIsNone(schema.get(1, 1000))
+        for data in (None, [], {}, dict(version=None),
+                     dict(version=dict(major=[], minor={})),
+                     dict(version=dict(major=1000, minor=0))):
+            self.assertIsNone(LATEST.get_exactly_compatible(data))
+            self.assertIsNone(LATEST.get_directly_compatible(data))
+        # Check the string version of v1 is still recognized
+        self.assertIs(LATEST.get_exactly_compatible(dict(version="1.1")),
+                      schema.V1_1)
+        self.assertIs(LATEST.get_directly_compatible(dict(version="1")),
+                      schema.V1_1)
+
+    def test_upgrade_fused(self):
+        """Check single-pass upgrade matches step-by-step inheritance"""
+        v2 = LATEST.lookup(2, 0)
+        data = v2.new() | dict(
+            revisions=[
+                dict(id="origin:5e29d1443c46b6ca70a4c940a67e8c09f05dcb7e",
+                     description="Revision",
+                     publishing_time="2020-08-14T23:08:06.967000+00:00"),
+            ],
+            builds=[
+                dict(id="origin:1", valid=True,
+                     revision_id="origin:"
+                     "5e29d1443c46b6ca70a4c940a67e8c09f05dcb7e"),
+            ],
+            tests=[
+                dict(id=f"origin:{i}", build_id="origin:1", path="a.b",
+                     waived=bool(i % 2), environment=dict(description="x"))
+                for i in range(4)
+            ],
+        )
+        # The output of the original, step-by-step, per-version inheritance
+        checkout_id = "_:origin:5e29d1443c46b6ca70a4c940a67e8c09f05dcb7e"
+        expected = dict(
+            version=dict(major=5, minor=3),
+            builds=[
+                dict(id="origin:1", origin="origin",
+                     checkout_id=checkout_id, status="PASS"),
+            ],
+            tests=[
+                dict(id=f"origin:{i}", build_id="origin:1", path="a.b",
+                     environment=dict(comment="x"), origin="origin")
+                for i in range(4)
+            ],
+            checkouts=[
+                dict(id=checkout_id, origin="origin", patchset_hash="",
+                     comment="Revision"),
+            ],
+            issues=[
+                dict(id="_:waived", origin="_", version=1,
+                     comment="Test waived as unreliable"),
+            ],
+            incidents=[
+                dict(id=f"_:waived:1:origin:{i}", origin="_",
+                     issue_id="_:waived", issue_version=1,
+                     test_id=f"origin:{i}", present=True)
+                for i in (1, 3)
+            ],
+        )
+        upgraded = schema.V5_3.upgrade(data)
+        self.assertEqual(upgraded, expected)
+        self.assertEqual(json.dumps(upgraded), json.dumps(expected))
+        self.assertEqual(len(upgraded["issues"]), 1)
+        self.assertEqual(len(upgraded["incidents"]), 2)
+        # Check empty lists are renamed too
+        self.assertEqual(LATEST.upgrade(v2.new() | dict(revisions=[])),
+                         LATEST.new() | dict(checkouts=[]))
+
+    def test_copy_on_write(self):
+        """Check copy-on-write doesn't modify, and shares unmodified data"""
+        v4 = LATEST.lookup(4, 5)
+        data = v4.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin",
+                            contacts=["a@b.c"])],
+            builds=[dict(id="origin:1", origin="origin",
+                         checkout_id="origin:1", valid=True)],
+            tests=[dict(id="origin:1", origin="origin", build_id="origin:1",
+                        waived=True, misc=dict(a=1)),
+                   dict(id="origin:2", origin="origin", build_id="origin:1",
+                        environment=dict(comment="x"))],
+        )
+        original = deepcopy(data)
+        upgraded = LATEST.upgrade(data, copy=schema.COPY_ON_WRITE)
+        self.assertEqual(data, original)
+        self.assertEqual(upgraded, LATEST.upgrade(data))
+        self.assertIs(upgraded["tests"][0]["misc"], data["tests"][0]["misc"])
+        self.assertIs(upgraded["tests"][1], data["tests"][1])
+        self.assertIs(LATEST.upgrade(upgraded, copy=schema.COPY_ON_WRITE),
+                      upgraded)
+
+        # Check stripping metadata
+        data = LATEST.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin",
+                            _timestamp="2023-11-06T11:58:15.163000+00:00"),
+                       dict(id="origin:2", origin="origin")],
+        )
+        original = deepcopy(data)
+        stripped = LATEST.strip_metadata(data, copy=schema.COPY_ON_WRITE)
+        self.assertEqual(data, original)
+        self.assertEqual(stripped, LATEST.strip_metadata(data))
+        self.assertIs(stripped["checkouts"][1], data["checkouts"][1])
+        self.assertIs(LATEST.strip_metadata(stripped,
+                                            copy=schema.COPY_ON_WRITE),
+                      stripped)
+
+        # Check merging and deduplicating
+        target = LATEST.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin")],
+        )
+        sources = [data, v4.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin", comment="a")],
+        )]
+        originals = deepcopy([target, sources])
+        merged = LATEST.merge(target, sources,
+                              copy_target=schema.COPY_ON_WRITE,
+                              copy_sources=schema.COPY_ON_WRITE)
+        self.assertEqual([target, sources], originals)
+        self.assertEqual(merged, LATEST.merge(target, sources))
+        self.assertIs(merged["checkouts"][0], target["checkouts"][0])
+        deduped = LATEST.dedup(merged, copy=schema.COPY_ON_WRITE,
+                               pick_second=lambda: True)
+        self.assertEqual(merged, LATEST.merge(target, sources))
+        self.assertEqual(deduped, LATEST.dedup(merged,
+                                               pick_second=lambda: True))
+        self.assertIs(deduped["checkouts"][1], data["checkouts"][1])
+
+    def test_merge(self):
+        """Check merging sources of various versions works correctly"""
+        v3 = LATEST.lookup(3, 0)
+        v4 = LATEST.lookup(4, 5)
+        target = v4.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin")],
+        )
+        sources = [
+            v3.new() | dict(builds=[dict(
+                id="origin:1", origin="origin",
+                revision_id="5e29d1443c46b6ca70a4c940a67e8c09f05dcb7e",
+            )]),
+            LATEST.new() | dict(checkouts=[dict(id="origin:2",
+                                                origin="origin")]),
+            v4.new(),
+            v4.new() | dict(checkouts=[dict(id="origin:3",
+                                            origin="origin")]),
+        ]
+        merged = LATEST.merge(target, iter(sources))
+        self.assertEqual(merged, LATEST.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin"),
+                       dict(id="origin:2", origin="origin"),
+                       dict(id="origin:3", origin="origin")],
+            builds=[dict(id="origin:1", origin="origin",
+                         checkout_id="_:origin:"
+                         "5e29d1443c46b6ca70a4c940a67e8c09f05dcb7e")],
+        ))
+        # Check the result has the newest version of the inputs
+        self.assertEqual(LATEST.merge(target, sources[:1]),
+                         v4.upgrade(v4.merge(target, sources[:1])))
+        self.assertIs(LATEST.get_exactly_compatible(
+            LATEST.merge(target, [sources[0], sources[2]])
+        ), v4)
+        self.assertEqual(LATEST.merge(target, []), target)
+
+    def test_merge_dedup(self):
+        """Check merging with deduplication works like dedup() afterwards"""
+        v4 = LATEST.lookup(4, 5)
+        target = LATEST.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin", comment="a"),
+                       dict(id="origin:1", origin="origin", valid=True)],
+            issues=[dict(id="origin:1", origin="origin", version=1)],
+        )
+        sources = [
+            v4.new() | dict(
+                checkouts=[dict(id="origin:2", origin="origin"),
+                           dict(id="origin:1", origin="origin",
+                                comment="b")],
+                tests=[dict(id="origin:1", origin="origin",
+                            build_id="origin:1", waived=True)],
+            ),
+            LATEST.new() | dict(
+                issues=[dict(id="origin:1", origin="origin", version=2),
+                        dict(id="origin:1", origin="origin", version=1,
+                             comment="c")],
+                tests=[dict(id="origin:1", origin="origin",
+                            build_id="origin:1", comment="d")],
+            ),
+        ]
+        originals = deepcopy([target, sources])
+        for pick_second in (lambda: True, lambda: False):
+            expected = LATEST.dedup(LATEST.merge(target, sources),
+                                    pick_second=pick_second)
+            for copy in (True, schema.COPY_ON_WRITE):
+                merged = LATEST.merge(target, sources,
+                                      copy_target=copy, copy_sources=copy,
+                                      dedup=True, pick_second=pick_second)
+                self.assertEqual(merged, expected)
+                self.assertEqual([target, sources], originals)
+        self.assertEqual(len(merged["checkouts"]), 2)
+        self.assertEqual(len(merged["issues"]), 3)
+        self.assertEqual(len(merged["tests"]), 1)
+
+    def test_dedup_stream(self):
+        """Check out-of-memory deduplication works like dedup()"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"origin:{i % 7}", origin="origin",
+                            comment=str(i))
+                       for i in range(30)],
+            issues=[dict(id=f"origin:{i % 5}", origin="origin",
+                         version=i % 3, comment=str(i))
+                    for i in range(40)],
+            builds=[],
+        )
+        for pick_second in (lambda: True, lambda: False):
+            expected = LATEST.dedup(data, pick_second=pick_second)
+            for partitions in (1, 3, 64):
+                output = io.StringIO()
+                stream.dump(
+                    LATEST.dedup_stream(io.StringIO(json.dumps(data)),
+                                        pick_second=pick_second,
+                                        partitions=partitions),
+                    output
+                )
+                self.assertEqual(json.loads(output.getvalue()), expected)
+        # Check objects preceding the version are handled
+        text = json.dumps(dict(checkouts=data["checkouts"],
+                               version=data["version"]))
+        self.assertEqual(
+            dict((name, value) for name, index, value in
+                 LATEST.dedup_stream(io.StringIO(text),
+                                     pick_second=lambda: True)
+                 if index is None),
+            dict(checkouts=[], version=data["version"])
+        )
+        self.assertEqual(
+            [value for name, index, value in
+             LATEST.dedup_stream(io.StringIO(text),
+                                 pick_second=lambda: True)
+             if index is not None],
+            LATEST.dedup(data, pick_second=lambda: True)["checkouts"]
+        )
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            list(LATEST.dedup_stream(io.StringIO('{"checkouts": []}')))
+
+    def test_get_failures(self):
+        """Check validation errors are located correctly"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"origin:{i}", origin="origin")
+                       for i in range(100)],
+            issues=[dict(id="origin:1", version=1, origin="origin")],
+        )
+        self.assertEqual(LATEST.get_failures(data), [])
+        data["checkouts"][50]["git_commit_hash"] = 1
+        data["checkouts"][70]["origin"] = "-"
+        data["issues"][0]["report_url"] = "not a uri"
+        data["checkouts"].append(1)
+        failures = LATEST.get_failures(data)
+        self.assertEqual(
+            [failure[:3] for failure in failures],
+            [("checkouts", "origin:50", "/checkouts/50/git_commit_hash"),
+             ("checkouts", "origin:70", "/checkouts/70/origin"),
+             ("checkouts", None, "/checkouts/100"),
+             ("issues", ("origin:1", 1), "/issues/0/report_url")]
+        )
+        self.assertIsInstance(failures[0], schema.ValidationFailure)
+        self.assertEqual(failures[0].message,
+                         "1 is not of type 'string'")
+        self.assertEqual(LATEST.get_failures(data, limit=2), failures[:2])
+        self.assertEqual(LATEST.get_failures(data, limit=0), [])
+
+        # Check errors outside objects, and in earlier versions
+        data = dict(version=dict(major=4, minor=0), checkouts={},
+                    builds=[dict(id="origin:1", origin="origin")])
+        self.assertEqual(
+            [failure[:3] for failure in LATEST.get_failures(data)],
+            [("", None, "/checkouts"),
+             ("builds", "origin:1", "/builds/0")]
+        )
+        self.assertEqual(
+            [failure[:3] for failure in
+             LATEST.get_failures(dict(version=dict(major=1000)))],
+            [("", None, "/version/major")]
+        )
+
+    def test_partition_valid(self):
+        """Check data is partitioned into valid and invalid objects"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"origin:{i}", origin="origin")
+                       for i in range(10)],
+            tests=[dict(id="origin:1", origin="origin", path="a..b"), 1],
+        )
+        data["checkouts"][3]["git_commit_hash"] = 1
+        data["checkouts"][5]["origin"] = "-"
+        original = deepcopy(data)
+        valid_data, failures = LATEST.partition_valid(data)
+        self.assertEqual(data, original)
+        self.assertTrue(LATEST.is_valid(valid_data))
+        self.assertEqual(
+            valid_data,
+            LATEST.new() | dict(
+                checkouts=[checkout
+                           for index, checkout in enumerate(data["checkouts"])
+                           if index not in (3, 5)],
+                tests=[],
+            )
+        )
+        self.assertIs(valid_data["checkouts"][0], data["checkouts"][0])
+        self.assertEqual(
+            [failure[:3] for failure in failures],
+            [("checkouts", "origin:3", "/checkouts/3/git_commit_hash"),
+             ("checkouts", "origin:5", "/checkouts/5/origin"),
+             ("tests", "origin:1", "/tests/0/path"),
+             ("tests", "origin:1", "/tests/0"),
+             ("tests", None, "/tests/1")]
+        )
+        self.assertEqual(failures,
+                         LATEST.get_failures(data))
+
+        # Check valid data is kept, and errors outside objects are raised
+        self.assertEqual(LATEST.partition_valid(valid_data),
+                         (valid_data, []))
+        for data in (dict(version=dict(major=1000), checkouts=[1]),
+                     LATEST.new() | dict(checkouts={}, tests=[1]),
+                     []):
+            with self.assertRaises(jsonschema.exceptions.ValidationError):
+                LATEST.partition_valid(data)
+
+    def test_object_api(self):
+        """Check objects are validated and upgraded on their own"""
+        test = dict(id="origin:1", origin="origin", build_id="origin:1",
+                    path="a.b")
+        self.assertIs(LATEST.validate_object("tests", test), test)
+        self.assertTrue(LATEST.is_valid_object("tests", test))
+        invalid_test = dict(test, path="a..b")
+        self.assertFalse(LATEST.is_valid_object("tests", invalid_test))
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as \
+                invalid:
+            LATEST.validate_object("tests", invalid_test)
+        self.assertEqual(list(invalid.exception.path), ["path"])
+
+        # Check objects are upgraded the same way as data
+        data = dict(
+            version=dict(major=3, minor=0),
+            revisions=[dict(id="a" * 40, origin="origin",
+                            git_repository_url="https://a.org/b.git")],
+            tests=[dict(id=f"origin:{i}", origin="origin",
+                        build_id="origin:1", waived=True)
+                   for i in range(3)],
+        )
+        original = deepcopy(data)
+        state = {}
+        upgraded_data = LATEST.new()
+        for obj_list_name in ("revisions", "tests"):
+            for obj in data[obj_list_name]:
+                obj_list_name, obj, added_objs = LATEST.upgrade_object(
+                    schema.V3_0, obj_list_name, obj, state
+                )
+                for name, added_obj in added_objs:
+                    upgraded_data.setdefault(name, []).append(added_obj)
+                upgraded_data.setdefault(obj_list_name, []).append(obj)
+        self.assertEqual(data, original)
+        self.assertEqual(LATEST.cmp(upgraded_data, LATEST.upgrade(data)), 0)
+        self.assertEqual(len(upgraded_data["issues"]), 1)
+        self.assertEqual(len(upgraded_data["incidents"]), 3)
+        # Check the state isn't shared by default, and no-op upgrades
+        self.assertEqual(
+            [name for name, obj in
+             LATEST.upgrade_object(schema.V3_0, "tests",
+                                   data["tests"][0])[2]],
+            ["issues", "incidents"]
+        )
+        self.assertEqual(LATEST.upgrade_object(LATEST, "tests", test),
+                         ("tests", test, []))
+
+    def test_get_ids(self):
+        """Check object IDs are extracted correctly"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"origin:{i % 3}", origin="origin")
+                       for i in range(5)],
+            builds=[],
+            issues=[dict(id="origin:1", version=1, origin="origin"),
+                    dict(id="origin:1", version=2, origin="origin")],
+        )
+        ids = LATEST.get_ids(data)
+        self.assertEqual(ids, dict(
+            checkouts=["origin:0", "origin:1", "origin:2",
+                       "origin:0", "origin:1"],
+            issues=[("origin:1", 1), ("origin:1", 2)],
+        ))
+        interned_ids = LATEST.get_ids(data, intern=True)
+        self.assertEqual(interned_ids, ids)
+        self.assertIs(interned_ids["issues"][0][0],
+                      interned_ids["issues"][1][0])
+        self.assertEqual(list(LATEST.iter_ids("checkouts",
+                                              iter(data["checkouts"]))),
+                         ids["checkouts"])
+        self.assertEqual(LATEST.get_ids(dict(version=dict(major=4, minor=0),
+                                             checkouts=[])),
+                         {})
+
+        id_keys = LATEST.get_id_keys(data)
+        self.assertEqual(set(id_keys), {"checkouts", "issues"})
+        keys, key_ids = id_keys["checkouts"]
+        self.assertEqual(keys.typecode, "B")
+        self.assertEqual(list(keys), [0, 1, 2, 0, 1])
+        self.assertEqual(key_ids, ["origin:0", "origin:1", "origin:2"])
+        self.assertEqual([key_ids[key] for key in keys], ids["checkouts"])
+        keys, key_ids = id_keys["issues"]
+        self.assertEqual(list(keys), [0, 1])
+        self.assertEqual(key_ids, ids["issues"])
+
+    def test_metadata_map(self):
+        """Check metadata locations are mapped from schemas correctly"""
+        # Accessing internals, pylint: disable=protected-access
+        self.assertEqual(
+            abstract._get_metadata_map(LATEST),
+            {name: {None: {"_timestamp": True}}
+             for name in ("checkouts", "builds", "tests", "issues",
+                          "incidents")}
+        )
+        self.assertIsNone(abstract._get_metadata_map(schema.V4_0))
+        anywhere = abstract.METADATA_ANYWHERE
+        root = {
+            "$defs": {
+                "node": {"type": "object",
+                         "properties": {"_a": {}, "b": {"$ref": "#"},
+                                        "misc": {}},
+                         "additionalProperties": False},
+                "free": {"type": "object"},
+            },
+            "type": "array",
+            "items": [{"$ref": "#/$defs/node"}, {"type": "string"}],
+        }
+        # Check recursion is cut short conservatively
+        self.assertEqual(
+            abstract._map_metadata(root, root),
+            {None: {"_a": True, "b": {None: anywhere}}}
+        )
+        for subschema, metadata_map in (
+            ({}, anywhere),
+            ({"description": "Anything"}, anywhere),
+            ({"type": "string"}, None),
+            ({"type": ["string", "integer"]}, None),
+            ({"enum": [1, "a"]}, None),
+            ({"const": {"_a": 1}}, anywhere),
+            ({"$ref": "#/$defs/free"}, anywhere),
+            ({"anyOf": [{"type": "string"}, {"$ref": "#/$defs/node"}]},
+             {"_a": True, "b": {None: anywhere}}),
+            ({"type": "object",
+              "properties": {"a": {"type": "object",
+                                   "properties": {"_b": {}},
+                                   "additionalProperties": False},
+                             "c": {"type": "integer"}},
+              "additionalProperties": False},
+             {"a": {"_b": True}}),
+            ({"oneOf": [{"type": "object", "properties": {"_a": {}},
+                         "additionalProperties": False},
+                        {"type": "object", "properties": {"a": {}},
+                         "additionalProperties": False}]},
+             {"_a": True, "a": anywhere}),
+        ):
+            self.assertEqual(abstract._map_metadata(root, subschema),
+                             metadata_map, subschema)
+
+        # Check mapped metadata handling matches the generic one
+        data = LATEST.new() | dict(
+            checkouts=[dict(id="origin:1", origin="origin",
+                            misc=dict(_a=1),
+                            _timestamp="2023-11-06T11:58:15Z"),
+                       dict(id="origin:2", origin="origin")],
+            tests=[dict(id="origin:1", origin="origin",
+                        build_id="origin:1",
+                        environment=dict(misc=dict(_b=1)))],
+        )
+        for metadata_map in (abstract._get_metadata_map(LATEST), anywhere):
+            self.assertTrue(abstract._has_mapped_metadata(data,
+                                                          metadata_map))
+            stripped = abstract._strip_mapped_metadata_on_write(
+                data, metadata_map
+            )
+            self.assertFalse(abstract._has_mapped_metadata(stripped,
+                                                           metadata_map))
+            self.assertEqual(stripped, LATEST.strip_metadata(data))
+            self.assertIs(stripped["checkouts"][1], data["checkouts"][1])
+            self.assertIs(stripped["tests"], data["tests"])
+            self.assertIs(
+                abstract._strip_mapped_metadata_on_write(stripped,
+                                                         metadata_map),
+                stripped
+            )
+            copied = deepcopy(data)
+            abstract._strip_mapped_metadata(copied, metadata_map)
+            self.assertEqual(copied, stripped)
+
+    def test_split(self):
+        """Check datasets are split within limits, keeping graph locality"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"origin:{c}", origin="origin")
+                       for c in range(3)],
+            builds=[dict(id=f"origin:{c}.{b}", origin="origin",
+                         checkout_id=f"origin:{c}")
+                    for b in range(2) for c in range(3)],
+            tests=[dict(id=f"origin:{c}.{b}.{t}", origin="origin",
+                        build_id=f"origin:{c}.{b}")
+                   for t in range(2) for b in range(2) for c in range(3)],
+            issues=[dict(id="origin:1", version=1, origin="origin")],
+            incidents=[dict(id="origin:i1", origin="origin",
+                            issue_id="origin:1", issue_version=1,
+                            test_id="origin:1.0.0"),
+                       dict(id="origin:i2", origin="origin",
+                            issue_id="origin:1", issue_version=1)],
+        )
+        size = len(json.dumps(data))
+
+        def get_ids(datas):
+            """Get the sets of IDs of objects in each dataset"""
+            return [{obj_id
+                     for obj_ids in LATEST.get_ids(data).values()
+                     for obj_id in obj_ids}
+                    for data in datas]
+
+        def check(datas, max_bytes=None, max_objects=None):
+            """Check split datasets are complete, and within the limits"""
+            for split_data in datas:
+                self.assertTrue(LATEST.is_valid_exactly(split_data))
+                self.assertLessEqual(len(json.dumps(split_data)),
+                                     max_bytes or size)
+                self.assertLessEqual(LATEST.count(split_data),
+                                     max_objects or size)
+            self.assertEqual(
+                sorted(json.dumps(obj, sort_keys=True)
+                       for split_data in datas
+                       for name in LATEST.id_fields
+                       for obj in split_data.get(name, [])),
+                sorted(json.dumps(obj, sort_keys=True)
+                       for name in LATEST.id_fields
+                       for obj in data[name])
+            )
+
+        self.assertEqual(list(LATEST.split(LATEST.new(), max_objects=1)),
+                         [])
+        # Check sizes are calculated exactly
+        datas = list(LATEST.split(data, max_bytes=size))
+        self.assertEqual(len(datas), 1)
+        self.assertEqual(len(json.dumps(datas[0])), size)
+        check(datas)
+        self.assertIs(datas[0]["checkouts"][0], data["checkouts"][0])
+        datas = list(LATEST.split(data, max_bytes=size - 1))
+        self.assertEqual(len(datas), 2)
+        check(datas, max_bytes=size - 1)
+
+        # Check each checkout is kept with its builds, tests and incidents
+        datas = list(LATEST.split(data, max_objects=8))
+        check(datas, max_objects=8)
+        self.assertEqual(get_ids(datas), [
+            {"origin:0", "origin:0.0", "origin:0.1", "origin:0.0.0",
+             "origin:0.0.1", "origin:0.1.0", "origin:0.1.1"},
+            {"origin:1", "origin:1.0", "origin:1.1", "origin:1.0.0",
+             "origin:1.0.1", "origin:1.1.0", "origin:1.1.1", "origin:i1"},
+            {"origin:2", "origin:2.0", "origin:2.1", "origin:2.0.0",
+             "origin:2.0.1", "origin:2.1.0", "origin:2.1.1"},
+            {("origin:1", 1), "origin:i2"},
+        ])
+        datas = list(LATEST.split(data, max_objects=16))
+        check(datas, max_objects=16)
+        self.assertEqual(len(datas), 2)
+        self.assertEqual(
+            [valid_data.data for valid_data in
+             LATEST.validated(data).split(max_objects=16)],
+            datas
+        )
+        # Check groups are split, if they don't fit
+        for max_objects in (1, 3, 5):
+            datas = list(LATEST.split(data, max_objects=max_objects))
+            check(datas, max_objects=max_objects)
+            self.assertEqual(len(datas), -(-LATEST.count(data) //
+                                           max_objects))
+        for max_bytes in (1, 100, 200, 400, 800):
+            datas = list(LATEST.split(data, max_bytes=max_bytes))
+            check(datas, max_bytes=max(
+                max_bytes,
+                max(len(json.dumps(LATEST.new() | {name: [obj]}))
+                    for name in LATEST.id_fields for obj in data[name])
+            ))
+
+        # Check streams are split in the order read
+        datas = list(LATEST.split_stream(io.StringIO(json.dumps(data)),
+                                         max_objects=7))
+        check(datas, max_objects=7)
+        self.assertEqual(len(datas), 4)
+        self.assertEqual(datas[0]["checkouts"], data["checkouts"])
+        self.assertEqual(datas[0]["builds"], data["builds"][:4])
+        text = json.dumps(dict(checkouts=data["checkouts"],
+                               version=schema.V4_0.new()["version"]))
+        datas = list(LATEST.split_stream(io.StringIO(text), max_objects=2))
+        self.assertEqual(datas, [
+            schema.V4_0.new() | dict(checkouts=data["checkouts"][:2]),
+            schema.V4_0.new() | dict(checkouts=data["checkouts"][2:]),
+        ])
+        for text in (
+            json.dumps(dict(version=dict(major=3, minor=0), checkouts=[])),
+            json.dumps(LATEST.new() | dict(checkouts=[dict(id="origin:1")])),
+            json.dumps(LATEST.new() | dict(foo=[1])),
+            json.dumps(LATEST.new() | dict(foo=1)),
+        ):
+            with self.assertRaises(jsonschema.exceptions.ValidationError):
+                list(LATEST.split_stream(io.StringIO(text)))
+
+    def test_shard(self):
+        """Check datasets are sharded by origin, or key hashes"""
+        data = LATEST.new() | dict(
+            checkouts=[dict(id=f"{origin}:1", origin=origin)
+                       for origin in ("a", "b", "c")],
+            tests=[dict(id=f"{origin}:{t}", origin=origin,
+                        build_id="x:1")
+                   for t in range(3) for origin in ("c", "a")],
+        )
+        checkouts = data["checkouts"]
+        tests = data["tests"]
+        shard_datas = LATEST.shard(data)
+        self.assertEqual(list(shard_datas), ["a", "b", "c"])
+        self.assertEqual(shard_datas, dict(
+            a=LATEST.new() | dict(checkouts=checkouts[:1],
+                                  tests=tests[1::2]),
+            b=LATEST.new() | dict(checkouts=checkouts[1:2]),
+            c=LATEST.new() | dict(checkouts=checkouts[2:],
+                                  tests=tests[::2]),
+        ))
+        self.assertIs(shard_datas["a"]["checkouts"][0], checkouts[0])
+        self.assertEqual(LATEST.shard(LATEST.new()), {})
+        self.assertEqual(
+            LATEST.shard(data, key=lambda name, obj: name),
+            dict(checkouts=LATEST.new() | dict(checkouts=checkouts),
+                 tests=LATEST.new() | dict(tests=tests))
+        )
+        self.assertEqual(
+            {obj_shard: shard_data.data for obj_shard, shard_data in
+             LATEST.validated(data).shard().items()},
+            shard_datas
+        )
+
+        # Check hashed shards are stable, and cover all objects
+        shard_datas = LATEST.shard(data, shards=2)
+        self.assertLessEqual(set(shard_datas), {0, 1})
+        self.assertEqual(
+            sum(map(LATEST.count, shard_datas.values())),
+            LATEST.count(data)
+        )
+        origin_shards = {}
+        for obj_shard, shard_data in shard_datas.items():
+            for name in LATEST.id_fields:
+                for obj in shard_data.get(name, []):
+                    origin_shards.setdefault(obj["origin"], set()).add(
+                        obj_shard
+                    )
+        self.assertEqual(list(map(len, origin_shards.values())), [1] * 3)
+        self.assertEqual(
+            LATEST.shard(data, shards=1),
+            {0: LATEST.new() | dict(checkouts=checkouts, tests=tests)}
+        )
+        self.assertEqual(abstract.zlib.crc32(b'"a"') % 7,
+                         next(iter(LATEST.shard(
+                             LATEST.new() | dict(checkouts=checkouts[:1]),
+                             shards=7
+                         ))))
+
+        # Check streams are sharded into files
+        outputs = {}
+
+        def open_shard(obj_shard):
+            """Create an output for a shard"""
+            self.assertNotIn(obj_shard, outputs)
+            outputs[obj_shard] = io.StringIO()
+            return outputs[obj_shard]
+
+        text = json.dumps(dict(checkouts=checkouts, version=data["version"],
+                               tests=tests))
+        self.assertEqual(
+            LATEST.shard_stream(io.StringIO(text), open_shard),
+            dict(a=4, b=1, c=4)
+        )
+        self.assertEqual(
+            {obj_shard: json.loads(output.getvalue())
+             for obj_shard, output in outputs.items()},
+            LATEST.shard(data)
+        )
+        outputs = {}
+        self.assertEqual(
+            LATEST.shard_stream(io.StringIO(json.dumps(data)), open_shard,
+                                shards=1),
+            {0: 9}
+        )
+        self.assertEqual(json.loads(outputs[0].getvalue()), data)
+        outputs = {}
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            LATEST.shard_stream(
+                io.StringIO(json.dumps(LATEST.new() |
+                                       dict(tests=[dict(id="a:1")]))),
+                open_shard
+            )
+        self.assertEqual(outputs, {})
+
+
+class ValidDataTestCase(unittest.TestCase):
+    """ValidData class test case"""
+
+    def test_operations(self):
+        """Check operations on valid data handles match the Version ones"""
+        data = dict(
+            version=dict(major=4, minor=3),
+            checkouts=[dict(id="origin:1", origin="origin",
+                            _timestamp="2023-11-06T11:58:15Z")] * 2,
+            tests=[dict(id="origin:1", origin="origin",
+                        build_id="origin:1", waived=True)],
+        )
+        original = deepcopy(data)
+        handle = LATEST.validated(data)
+        self.assertIsInstance(handle, schema.ValidData)
+        self.assertIs(handle.version, schema.V4_3)
+        self.assertIs(handle.data, data)
+        self.assertEqual(handle.count(), LATEST.count(data))
+        self.assertEqual(handle.get_ids(), LATEST.get_ids(data))
+        self.assertTrue(handle.has_metadata())
+
+        stripped = handle.strip_metadata(copy=schema.COPY_ON_WRITE)
+        self.assertIs(stripped.version, schema.V4_3)
+        self.assertFalse(stripped.has_metadata())
+        self.assertEqual(stripped.data, schema.V4_3.strip_metadata(data))
+
+        upgraded = handle.upgrade(LATEST)
+        self.assertIs(upgraded.version, LATEST)
+        self.assertEqual(upgraded.data, LATEST.upgrade(data))
+
+        deduped = handle.dedup(pick_second=lambda: True)
+        self.assertEqual(deduped.data,
+                         LATEST.dedup(data, pick_second=lambda: True))
+
+        merged = stripped.merge([upgraded, handle], dedup=True,
+                                pick_second=lambda: True)
+        self.assertIs(merged.version, LATEST)
+        self.assertEqual(
+            merged.data,
+            LATEST.merge(stripped.data, [upgraded.data, data], dedup=True,
+                         pick_second=lambda: True)
+        )
+        self.assertEqual(data, original)
+
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            LATEST.validated(dict(checkouts=[]))
+
+
+class BuilderTestCase(unittest.TestCase):
+    """Builder class test case"""
+
+    def test_build(self):
+        """Check data is built and validated incrementally"""
+        builder = schema.Builder(LATEST)
+        self.assertIs(builder.version, LATEST)
+        self.assertEqual(builder.validate(), LATEST.new())
+        checkout = dict(id="origin:1", origin="origin")
+        self.assertIs(builder.add("checkouts", checkout), checkout)
+        builder.extend("tests", [dict(id=f"origin:{i}", origin="origin",
+                                      build_id="origin:1", path="a.b")
+                                 for i in range(10)])
+        builder.extend("builds", [])
+        data = builder.validate()
+        self.assertTrue(LATEST.is_valid(data))
+        self.assertEqual(data["checkouts"], [checkout])
+        self.assertEqual(len(data["tests"]), 10)
+        self.assertNotIn("builds", data)
+
+        # Check invalid objects are rejected, with paths into the data
+        with self.assertRaises(jsonschema.exceptions.ValidationError) as \
+                invalid:
+            builder.extend("tests", [dict(id="origin:10", origin="origin",
+                                          build_id="origin:1"),
+                                     dict(id="origin:11", origin="origin",
+                                          build_id="origin:1", path="a..b")])
+        self.assertEqual(list(invalid.exception.path), ["tests", 11, "path"])
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            builder.add("checkouts", dict(id="origin:2"))
+        self.assertEqual(builder.validate(), data)
+        self.assertEqual(len(data["tests"]), 10)
+        self.assertEqual(len(data["checkouts"]), 1)
+
+        # Check flushing starts over
+        self.assertIs(builder.flush(), data)
+        self.assertEqual(builder.validate(), LATEST.new())
+
+    def test_seed(self):
+        """Check builders can start with existing data"""
+        data = dict(version=dict(major=4, minor=0),
+                    checkouts=[dict(id="origin:1", origin="origin")])
+        builder = schema.Builder(LATEST, data)
+        self.assertIs(builder.version, schema.V4_0)
+        builder.add("checkouts", dict(id="origin:2", origin="origin"))
+        self.assertIs(builder.validate(), data)
+        self.assertEqual(len(data["checkouts"]), 2)
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            schema.Builder(LATEST, dict(checkouts=[]))
@@ -0,0 +1,183 @@
+"""Schema compiler module tests"""
+
+import marshal
+from types import CodeType
+import jsonschema
+import pytest
+from kcidb_io.schema import LATEST, cache, compiler
+from kcidb_io.schema.compiler import UnsupportedSchema, compile_schema
+
+FORMAT_CHECKER = jsonschema.Draft7Validator.FORMAT_CHECKER
+
+# A list of values of various types to check schemas against
+VALUES = [
+    None, True, False, 0, 1, -1, 1.0, 1.5, "", "a", "abc", "\0",
+    "a:b", "https://example.com", "not a uri",
+    "2023-11-06T11:58:15.163000+00:00", "2023-13-06T11:58:15Z",
+    [], [1], [1, "a"], ["a", "b"], {}, dict(a=1), dict(a="a", b=1),
+    dict(a=True), dict(b=None), dict(c=[1, 2]),
+]
+
+
+@pytest.mark.parametrize("schema", [
+    True,
+    False,
+    {},
+    dict(type="string"),
+    dict(type="integer"),
+    dict(type="number"),
+    dict(type="boolean"),
+    dict(type="null"),
+    dict(type="array"),
+    dict(type="object"),
+    dict(type=["string", "null"]),
+    dict(type=["integer", "array"], minimum=1, minItems=1),
+    dict(enum=["a", "abc"]),
+    dict(enum=[1, None, [1]]),
+    dict(const=1),
+    dict(const="a"),
+    dict(const=dict(a=1)),
+    dict(format="uri"),
+    dict(format="date-time"),
+    dict(format="email"),
+    dict(pattern="^a"),
+    dict(pattern="b"),
+    dict(type="string", minLength=1, maxLength=2),
+    dict(minimum=0, maximum=1),
+    dict(exclusiveMinimum=0, exclusiveMaximum=1.5),
+    dict(type="integer", maximum=0),
+    dict(required=["a"]),
+    dict(properties=dict(a=dict(type="integer"))),
+    dict(properties=dict(a=dict(type="integer")),
+         additionalProperties=False),
+    dict(properties=dict(a=dict(type="integer")),
+         additionalProperties=dict(type="null")),
+    dict(minProperties=1, maxProperties=1),
+    dict(items=dict(type="integer")),
+    dict(items=False),
+    dict(minItems=1, maxItems=1),
+    dict(allOf=[dict(type="object"), dict(required=["a"])]),
+    dict(anyOf=[dict(type="string"), dict(type="array")]),
+    dict(oneOf=[dict(type="integer"), dict(minimum=1)]),
+    dict(oneOf=[dict(type="string", pattern=":"),
+                dict(type="object", required=["a"])]),
+    {"not": dict(type="object")},
+    {"$ref": "#/$defs/a", "type": "integer", "$defs": {"a": {}}},
+    {"$defs": {"a": dict(type="string")},
+     "type": "array", "items": {"$ref": "#/$defs/a"}},
+    {"$defs": {"a/b": dict(type="array", items={"$ref": "#"})},
+     "anyOf": [{"$ref": "#/$defs/a~1b"}, dict(type="integer")]},
+    dict(title="Anything", description="Really", examples=[1]),
+])
+def test_keywords(schema):
+    """Check compiled schemas agree with the generic validator"""
+    validator = jsonschema.Draft7Validator(schema,
+                                           format_checker=FORMAT_CHECKER)
+    is_valid = compile_schema(schema, format_checker=FORMAT_CHECKER)["#"]
+    for value in VALUES:
+        assert is_valid(value) == validator.is_valid(value), \
+            f"Disagreement on {value!r}"
+
+
+@pytest.mark.parametrize("schema", [
+    dict(uniqueItems=True),
+    dict(patternProperties={"^a": {}}),
+    dict(items=[dict(type="integer")]),
+    {"$ref": "https://example.com/schema"},
+    {"$ref": "#/$defs/missing"},
+    dict(properties=dict(a=dict(dependencies=dict(b=["c"])))),
+])
+def test_unsupported(schema):
+    """Check unsupported schemas are detected"""
+    with pytest.raises(UnsupportedSchema):
+        compile_schema(schema)
+
+
+def test_format_checker():
+    """Check formats are only checked with a format checker"""
+    schema = dict(format="date-time")
+    assert compile_schema(schema)["#"]("yesterday")
+    assert not compile_schema(schema,
+                              format_checker=FORMAT_CHECKER)["#"]("yesterday")
+
+
+def test_versions():
+    """Check schemas of all versions compile and agree with generic ones"""
+    for version in LATEST.history:
+        validator = jsonschema.Draft7Validator(version.json,
+                                               format_checker=FORMAT_CHECKER)
+        is_valid = compile_schema(version.json,
+                                  format_checker=FORMAT_CHECKER)["#"]
+        data = version.new()
+        assert is_valid(data)
+        for value in VALUES:
+            for name in version.graph:
+                data = dict(version.new(), **{name or "version": value})
+                assert is_valid(data) == validator.is_valid(data)
+                if name:
+                    data = dict(version.new(), **{name: [value]})
+                    assert is_valid(data) == validator.is_valid(data)
+
+
+def test_cache(tmp_path, monkeypatch):
+    """Check compiled code is cached on disk, and loaded from there"""
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path / "cache"))
+    schema = dict(type="object", required=["a"])
+    functions = compile_schema(schema, cache_name="test")
+    assert functions["#"](dict(a=1)) and not functions["#"]({})
+    paths = list((tmp_path / "cache").iterdir())
+    assert len(paths) == 1
+    assert paths[0].name.startswith("test-")
+    # Check the cached code is loaded
+    mtime = paths[0].stat().st_mtime_ns
+    functions = compile_schema(schema, cache_name="test")
+    assert functions["#"](dict(a=1)) and not functions["#"]({})
+    assert list((tmp_path / "cache").iterdir()) == paths
+    assert paths[0].stat().st_mtime_ns == mtime
+    # Check changed schemas don't get stale code
+    functions = compile_schema(dict(type="array"), cache_name="test")
+    assert functions["#"]([]) and not functions["#"]({})
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+
+def test_cache_corrupt(tmp_path, monkeypatch):
+    """Check corrupt cache files are ignored and replaced"""
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    schema = dict(type="string")
+    path = cache.get_path(compiler.generate(schema, ("#",)), "test")
+    for content in (b"", b"garbage", marshal.dumps("not code")):
+        with open(path, "wb") as file:
+            file.write(content)
+        functions = compile_schema(schema, cache_name="test")
+        assert functions["#"]("a") and not functions["#"](1)
+    with open(path, "rb") as file:
+        assert isinstance(marshal.load(file), CodeType)
+
+
+def test_cache_disabled(tmp_path, monkeypatch):
+    """Check the cache can be disabled, and unwritable dirs are ignored"""
+    monkeypatch.setattr(cache, "CACHE_DIR", None)
+    assert cache.get_path("", "test") is None
+    functions = compile_schema(dict(type="null"), cache_name="test")
+    assert functions["#"](None) and not functions["#"](1)
+    file_path = tmp_path / "file"
+    file_path.write_text("")
+    monkeypatch.setattr(cache, "CACHE_DIR", str(file_path / "cache"))
+    functions = compile_schema(dict(type="null"), cache_name="test")
+    assert functions["#"](None) and not functions["#"](1)
+    assert list(tmp_path.iterdir()) == [file_path]
+
+
+def test_prewarm(tmp_path, monkeypatch):
+    """Check prewarming caches code for every compiled schema version"""
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    # pylint: disable=import-outside-toplevel,protected-access
+    from kcidb_io.schema.abstract import _build_compiled_validators_for
+    _build_compiled_validators_for.cache_clear()
+    try:
+        LATEST.prewarm()
+    finally:
+        _build_compiled_validators_for.cache_clear()
+    names = {path.name.split("-")[0] for path in tmp_path.iterdir()}
+    assert f"v{LATEST.major}.{LATEST.minor}" in names
+    assert len(names) > 1
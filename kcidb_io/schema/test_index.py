@@ -0,0 +1,185 @@
+"""Object graph index module tests"""
+
+from kcidb_io.schema import LATEST, V1_1, index
+
+# Data with all types of objects and links, including dangling ones
+DATA = dict(
+    version=dict(major=LATEST.major, minor=LATEST.minor),
+    checkouts=[
+        dict(id="o:c1", origin="o"),
+        dict(id="o:c2", origin="o"),
+    ],
+    builds=[
+        dict(id="o:b1", origin="o", checkout_id="o:c1"),
+        dict(id="o:b2", origin="o", checkout_id="o:c1"),
+        dict(id="o:b3", origin="o", checkout_id="o:c3"),
+    ],
+    tests=[
+        dict(id="o:t1", origin="o", build_id="o:b1"),
+        dict(id="o:t2", origin="o", build_id="o:b1"),
+        dict(id="o:t3", origin="o", build_id="o:b4"),
+    ],
+    issues=[
+        dict(id="o:i1", version=1, origin="o"),
+    ],
+    incidents=[
+        dict(id="o:n1", origin="o", issue_id="o:i1", issue_version=1,
+             test_id="o:t1"),
+        dict(id="o:n2", origin="o", issue_id="o:i1", issue_version=2,
+             build_id="o:b2"),
+    ],
+)
+
+
+def test_links():
+    """Check link fields are derived from the graph and ID fields"""
+    assert index.get_links(LATEST) == dict(
+        checkouts=(),
+        builds=(("checkouts", ("checkout_id",)),),
+        tests=(("builds", ("build_id",)),),
+        issues=(),
+        incidents=(
+            ("builds", ("build_id",)),
+            ("tests", ("test_id",)),
+            ("issues", ("issue_id", "issue_version")),
+        ),
+    )
+    assert index.get_links(V1_1)["tests"] == \
+        (("builds", ("build_origin", "build_origin_id")),)
+
+
+def test_lookups():
+    """Check objects, children and parents are looked up"""
+    idx = LATEST.index(DATA)
+    assert idx.version is LATEST
+    assert idx.data is DATA
+    assert idx.get_obj("builds", "o:b1") is DATA["builds"][0]
+    assert idx.get_obj("builds", "o:b4") is None
+    assert idx.get_obj("issues", ("o:i1", 1)) is DATA["issues"][0]
+    assert idx.get_children("checkouts", "o:c1") == \
+        dict(builds=["o:b1", "o:b2"])
+    assert idx.get_children("checkouts", "o:c2") == {}
+    assert idx.get_children("builds", "o:b1") == dict(tests=["o:t1", "o:t2"])
+    assert idx.get_children("builds", "o:b4") == dict(tests=["o:t3"])
+    assert idx.get_children("issues", ("o:i1", 1)) == \
+        dict(incidents=["o:n1"])
+    assert idx.get_children("incidents", "o:n1") == {}
+    assert idx.get_parents("checkouts", "o:c1") == {}
+    assert idx.get_parents("builds", "o:b3") == dict(checkouts="o:c3")
+    assert idx.get_parents("incidents", "o:n1") == \
+        dict(tests="o:t1", issues=("o:i1", 1))
+    assert idx.get_parents("tests", "o:t4") is None
+
+
+def test_orphans():
+    """Check objects linking to missing parents are reported"""
+    assert LATEST.index(DATA).get_orphans() == [
+        index.DanglingReference("builds", "o:b3", "checkouts", "o:c3"),
+        index.DanglingReference("tests", "o:t3", "builds", "o:b4"),
+        index.DanglingReference("incidents", "o:n2",
+                                "issues", ("o:i1", 2)),
+    ]
+    assert LATEST.index(LATEST.new()).get_orphans() == []
+    data = dict(
+        version=dict(major=1, minor=1),
+        revisions=[dict(origin="o", origin_id="r1")],
+        builds=[dict(origin="o", origin_id="b1",
+                     revision_origin="o", revision_origin_id="r1"),
+                dict(origin="o", origin_id="b2",
+                     revision_origin="o", revision_origin_id="r2")],
+    )
+    idx = LATEST.validated(data).index()
+    assert idx.version is V1_1
+    assert idx.get_children("revisions", ("o", "r1")) == \
+        dict(builds=[("o", "b1")])
+    assert idx.get_orphans() == [
+        index.DanglingReference("builds", ("o", "b2"),
+                                "revisions", ("o", "r2")),
+    ]
+
+
+def test_check_references():
+    """Check unresolved references are found"""
+    dangling_references = [
+        index.DanglingReference("builds", "o:b3", "checkouts", "o:c3"),
+        index.DanglingReference("tests", "o:t3", "builds", "o:b4"),
+        index.DanglingReference("incidents", "o:n2",
+                                "issues", ("o:i1", 2)),
+    ]
+    assert LATEST.check_references(DATA) == dangling_references
+    assert LATEST.check_references(DATA, workers=2) == dangling_references
+    assert LATEST.check_references(LATEST.new()) == []
+    known_ids = dict(checkouts={"o:c3"}, issues={("o:i1", 2)})
+    assert LATEST.check_references(DATA, known_ids=known_ids) == \
+        dangling_references[1:2]
+    assert LATEST.check_references(DATA, known_ids=known_ids,
+                                   workers=2) == dangling_references[1:2]
+
+    # Check chunks are split and reassembled in order
+    data = dict(
+        version=DATA["version"],
+        tests=[dict(id=f"o:t{i}", origin="o", build_id=f"o:b{i % 3}")
+               for i in range(3000)],
+        builds=[dict(id="o:b1", origin="o", checkout_id="o:c1")],
+    )
+    dangling_references = [
+        index.DanglingReference("builds", "o:b1", "checkouts", "o:c1"),
+    ] + [
+        index.DanglingReference("tests", f"o:t{i}", "builds", f"o:b{i % 3}")
+        for i in range(3000) if i % 3 != 1
+    ]
+    assert LATEST.check_references(data) == dangling_references
+    assert LATEST.check_references(data, workers=3) == dangling_references
+    assert LATEST.validated(data).check_references(
+        known_ids=dict(builds={"o:b0", "o:b2"})
+    ) == dangling_references[:1]
+
+
+def test_extract():
+    """Check subgraphs are extracted"""
+    idx = LATEST.index(DATA)
+    checkouts, builds, tests, issues, incidents = (
+        DATA[name]
+        for name in ("checkouts", "builds", "tests", "issues", "incidents")
+    )
+    assert idx.extract({}) == LATEST.new()
+    assert idx.extract(dict(checkouts=["o:c2", "o:c4"])) == \
+        dict(version=DATA["version"], checkouts=checkouts[1:2])
+    # Descendants, and their ancestors, but not ancestors' descendants
+    data = idx.extract(dict(checkouts=["o:c1"]))
+    assert data == dict(
+        version=DATA["version"],
+        checkouts=checkouts[:1],
+        builds=builds[:2],
+        tests=tests[:2],
+        issues=issues,
+        incidents=incidents,
+    )
+    assert data["checkouts"][0] is checkouts[0]
+    assert idx.extract(dict(tests=["o:t1"])) == dict(
+        version=DATA["version"],
+        checkouts=checkouts[:1],
+        builds=builds[:1],
+        tests=tests[:1],
+        issues=issues,
+        incidents=incidents[:1],
+    )
+    assert idx.extract(dict(issues=[("o:i1", 2)])) == dict(
+        version=DATA["version"],
+        checkouts=checkouts[:1],
+        builds=builds[1:2],
+        incidents=incidents[1:],
+    )
+    # Descendants of missing roots
+    assert idx.extract(dict(builds=["o:b4", "o:b3"])) == dict(
+        version=DATA["version"],
+        builds=builds[2:],
+        tests=tests[2:],
+    )
+
+
+def test_order():
+    """Check object lists are ordered parents first"""
+    assert index.get_order(LATEST) == \
+        ("checkouts", "builds", "tests", "issues", "incidents")
+    assert index.get_order(V1_1) == ("revisions", "builds", "tests")
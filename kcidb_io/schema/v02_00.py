@@ -588,30 +588,53 @@ class Version(PreviousVersion):
         Returns:
             The inherited data.
         """
+        # No it's not, pylint: disable=protected-access
+        return Version._inherit_objs(data, [Version])
+
+    @staticmethod
+    def _inherit_obj(state, obj_list_name, obj):
+        """
+        Inherit an object, i.e. convert an object adhering to the previous
+        major version of the schema to satisfy this version of the schema.
+
+        Args:
+            state:          A dictionary shared by all the objects of the
+                            data being inherited. Not used.
+            obj_list_name:  The name of the object list the object belongs
+                            to, in the previous major version.
+            obj:            The object to inherit. Will not be modified.
+
+        Returns:
+            The inherited copy of the object, and an empty tuple of objects
+            to add.
+        """
+        obj = obj.copy()
+
         # Merge *origin and *origin_id properties into *id properties
         # pylint: disable=redefined-builtin,invalid-name
-        for collection, id_pair_map in \
-            dict(revisions=dict(id=('origin', 'origin_id')),
-                 builds=dict(id=('origin', 'origin_id'),
-                             revision_id=('revision_origin',
-                                          'revision_origin_id')),
-                 tests=dict(id=('origin', 'origin_id'),
-                            build_id=('build_origin',
-                                      'build_origin_id'))).items():
-            for id, pair in id_pair_map.items():
-                for obj in data.get(collection, []):
-                    obj[id] = obj[pair[0]] + ':' + obj[pair[1]]
-                    del obj[pair[0]]
-                    del obj[pair[1]]
+        for id, pair in dict(
+            revisions=dict(id=('origin', 'origin_id')),
+            builds=dict(id=('origin', 'origin_id'),
+                        revision_id=('revision_origin',
+                                     'revision_origin_id')),
+            tests=dict(id=('origin', 'origin_id'),
+                       build_id=('build_origin',
+                                 'build_origin_id')),
+        ).get(obj_list_name, {}).items():
+            obj[id] = obj[pair[0]] + ':' + obj[pair[1]]
+            del obj[pair[0]]
+            del obj[pair[1]]
 
         # Replace slashes with underscores in resource names
-        for collection, prop_list in \
-            dict(revisions=["patch_mboxes"],
-                 builds=["input_files", "output_files"],
-                 tests=["output_files"]).items():
-            for obj in data.get(collection, []):
-                for prop in prop_list:
-                    for resource in obj.get(prop, []):
-                        resource["name"] = resource["name"].replace("/", "_")
+        for prop in dict(
+            revisions=["patch_mboxes"],
+            builds=["input_files", "output_files"],
+            tests=["output_files"],
+        ).get(obj_list_name, []):
+            if prop in obj:
+                obj[prop] = [
+                    dict(resource, name=resource["name"].replace("/", "_"))
+                    for resource in obj[prop]
+                ]
 
-        return data
+        return obj, ()
@@ -38,6 +38,10 @@ class Version(PreviousVersion):
     # A regular expression pattern matching strings containing an object ID
     origin_id_pattern = f"{origin_pattern}:.*"
 
+    # A regular expression extracting the origin from a previous version's
+    # object ID
+    origin_id_re = re.compile(f"^({origin_pattern}):.*")
+
     # JSON schema for I/O data
     json = {
         "title": "kcidb",
@@ -643,29 +647,45 @@ class Version(PreviousVersion):
         Returns:
             The inherited data.
         """
-        # Extract origins into separate fields
-        origin_regex = re.compile(f"^({Version.origin_pattern}):.*")
-        for obj_list_name in PreviousVersion.graph:
-            if obj_list_name:
-                for obj in data.get(obj_list_name, []):
-                    obj["origin"] = origin_regex.search(obj["id"]).group(1)
+        # No it's not, pylint: disable=protected-access
+        return Version._inherit_objs(data, [Version])
+
+    @staticmethod
+    def _inherit_obj(state, obj_list_name, obj):
+        """
+        Inherit an object, i.e. convert an object adhering to the previous
+        major version of the schema to satisfy this version of the schema.
+
+        Args:
+            state:          A dictionary shared by all the objects of the
+                            data being inherited. Not used.
+            obj_list_name:  The name of the object list the object belongs
+                            to, in the previous major version.
+            obj:            The object to inherit. Will not be modified.
+
+        Returns:
+            The inherited copy of the object, and an empty tuple of objects
+            to add.
+        """
+        obj = obj.copy()
+
+        # Extract origin into a separate field
+        obj["origin"] = Version.origin_id_re.search(obj["id"]).group(1)
 
         # Remove origins from revision IDs
         # Calm down pylint: disable=redefined-builtin,invalid-name
         def remove_origin(id):
             return id[id.index(':') + 1:]
-        for revision in data.get("revisions", []):
-            revision["id"] = remove_origin(revision["id"])
-        for build in data.get("builds", []):
-            build["revision_id"] = remove_origin(build["revision_id"])
-
-        # Rename git_repository_commit* to git_commit* in revisions
-        for revision in data.get("revisions", []):
+        if obj_list_name == "revisions":
+            obj["id"] = remove_origin(obj["id"])
+            # Rename git_repository_commit* to git_commit*
             for old, new in (
                 ("git_repository_commit_hash", "git_commit_hash"),
                 ("git_repository_commit_name", "git_commit_name")
             ):
-                if old in revision:
-                    revision[new] = revision.pop(old)
+                if old in obj:
+                    obj[new] = obj.pop(old)
+        elif obj_list_name == "builds":
+            obj["revision_id"] = remove_origin(obj["revision_id"])
 
-        return data
+        return obj, ()
@@ -709,57 +709,92 @@ class Version(PreviousVersion):
         Returns:
             The inherited data.
         """
+        # No it's not, pylint: disable=protected-access
+        return Version._inherit_objs(data, [Version])
+
+    @staticmethod
+    def _inherit_obj_list_name(obj_list_name):
+        """
+        Get the name an object list of the previous major version of the
+        schema has in this version.
+
+        Args:
+            obj_list_name:  The name of the object list in the previous major
+                            version.
+
+        Returns:
+            The name of the object list in this version.
+        """
+        # Rename "revisions" to "checkouts"
+        return "checkouts" if obj_list_name == "revisions" else obj_list_name
+
+    @staticmethod
+    def _inherit_obj(state, obj_list_name, obj):
+        """
+        Inherit an object, i.e. convert an object adhering to the previous
+        major version of the schema to satisfy this version of the schema.
+
+        Args:
+            state:          A dictionary shared by all the objects of the
+                            data being inherited. Not used.
+            obj_list_name:  The name of the object list the object belongs
+                            to, in the previous major version.
+            obj:            The object to inherit. Will not be modified.
+
+        Returns:
+            The inherited object, or its inherited copy, and an empty tuple
+            of objects to add.
+        """
         # Inherit revisions
-        if 'revisions' in data:
-            for revision in data['revisions']:
-                # Generate checkout ID from the origin and revision ID.
-                # Assume everyone sending older schema versions only uses their
-                # own revisions, and prevent losing most data to deduplication.
-                # Use placeholder origin to avoid clashes with actual
-                # checkouts.
-                revision['id'] = \
-                    '_:' + revision['origin'] + ':' + revision['id']
-                # Rename "patch_mboxes" to "patchset_files"
-                if 'patch_mboxes' in revision:
-                    revision['patchset_files'] = revision.pop('patch_mboxes')
-                # Extract patchset hash, if any
-                try:
-                    revision['patchset_hash'] = revision['id'].split("+")[1]
-                except IndexError:
-                    revision['patchset_hash'] = ""
-                # Rename "discovery_time" to "start_time"
-                if 'discovery_time' in revision:
-                    revision['start_time'] = revision.pop('discovery_time')
-                # Rename 'description' to 'comment'
-                if 'description' in revision:
-                    revision['comment'] = revision.pop('description')
-                # Remove "publishing_time"
-                revision.pop('publishing_time', None)
-            # Rename "revisions" to "checkouts"
-            data['checkouts'] = data.pop('revisions')
+        if obj_list_name == 'revisions':
+            obj = obj.copy()
+            # Generate checkout ID from the origin and revision ID.
+            # Assume everyone sending older schema versions only uses their
+            # own revisions, and prevent losing most data to deduplication.
+            # Use placeholder origin to avoid clashes with actual
+            # checkouts.
+            obj['id'] = '_:' + obj['origin'] + ':' + obj['id']
+            # Rename "patch_mboxes" to "patchset_files"
+            if 'patch_mboxes' in obj:
+                obj['patchset_files'] = obj.pop('patch_mboxes')
+            # Extract patchset hash, if any
+            try:
+                obj['patchset_hash'] = obj['id'].split("+")[1]
+            except IndexError:
+                obj['patchset_hash'] = ""
+            # Rename "discovery_time" to "start_time"
+            if 'discovery_time' in obj:
+                obj['start_time'] = obj.pop('discovery_time')
+            # Rename 'description' to 'comment'
+            if 'description' in obj:
+                obj['comment'] = obj.pop('description')
+            # Remove "publishing_time"
+            obj.pop('publishing_time', None)
 
         # Inherit builds
-        for build in data.get('builds', []):
+        elif obj_list_name == 'builds':
+            obj = obj.copy()
             # Generate checkout ID from the origin and revision ID.
             # Assume everyone sending older schema versions only uses their
             # own revisions, and prevent losing most data to deduplication.
             # Use placeholder origin to avoid clashes with actual checkouts.
-            build['checkout_id'] = '_:' + build['origin'] + ':' + \
-                build.pop('revision_id')
+            obj['checkout_id'] = '_:' + obj['origin'] + ':' + \
+                obj.pop('revision_id')
             # Rename 'description' to 'comment'
-            if 'description' in build:
-                build['comment'] = build.pop('description')
+            if 'description' in obj:
+                obj['comment'] = obj.pop('description')
 
         # Inherit tests
-        for test in data.get('tests', []):
+        elif obj_list_name == 'tests':
             # Rename 'description' to 'comment'
-            if 'description' in test:
-                test['comment'] = test.pop('description')
+            if 'description' in obj:
+                obj = obj.copy()
+                obj['comment'] = obj.pop('description')
             # Inherit environment
-            if 'environment' in test:
-                environment = test['environment']
+            if 'description' in obj.get('environment', {}):
+                obj = obj.copy()
+                environment = obj['environment'] = obj['environment'].copy()
                 # Rename 'description' to 'comment'
-                if 'description' in environment:
-                    environment['comment'] = environment.pop('description')
+                environment['comment'] = environment.pop('description')
 
-        return data
+        return obj, ()
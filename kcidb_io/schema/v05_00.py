@@ -7,6 +7,33 @@ from kcidb_io.schema.abstract import InheritanceImpossible
 # It's OK, pylint: disable=too-many-lines
 
 
+def _prohibit_null(data):
+    """
+    Check there are no NUL characters in strings in data, outside "misc"
+    properties.
+
+    Args:
+        data:   The data to check.
+
+    Raises:
+        InheritanceImpossible - a string containing NUL characters was
+                                found.
+    """
+    if isinstance(data, str):
+        if '\0' in data:
+            raise InheritanceImpossible(
+                f"Cannot inherit a string containing '\0' characters: "
+                f"{data!r}"
+            )
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            if key != 'misc':
+                _prohibit_null(value)
+    elif isinstance(data, list):
+        for value in data:
+            _prohibit_null(value)
+
+
 # Of course, we need that, pylint: disable=too-many-ancestors
 class Version(PreviousVersion):
     """Version"""
@@ -1140,10 +1167,36 @@ class Version(PreviousVersion):
         Returns:
             The inherited data.
         """
+        # No it's not, pylint: disable=protected-access
+        return Version._inherit_objs(data, [Version])
+
+    @staticmethod
+    def _inherit_obj(state, obj_list_name, obj):
+        """
+        Inherit an object, i.e. convert an object adhering to the previous
+        major version of the schema to satisfy this version of the schema.
+
+        Args:
+            state:          A dictionary shared by all the objects of the
+                            data being inherited, to keep the state of the
+                            inheritance in, initially empty.
+            obj_list_name:  The name of the object list the object belongs
+                            to, in the previous major version.
+            obj:            The object to inherit. Will not be modified.
+
+        Returns:
+            The inherited object, or its inherited copy, and a list of tuples
+            for the objects to add to the data: the name of the object list
+            and the object.
+        """
+        added_objs = []
+
         # Inherit checkouts
-        for checkout in data.get("checkouts", []):
-            checkout.pop("contacts", None)
-            repo_url = checkout.get('git_repository_url', None)
+        if obj_list_name == "checkouts":
+            if "contacts" in obj:
+                obj = obj.copy()
+                del obj["contacts"]
+            repo_url = obj.get('git_repository_url', None)
             if not (repo_url is None or
                     Version.git_repository_url_re.match(repo_url)):
                 raise InheritanceImpossible(
@@ -1153,67 +1206,58 @@ class Version(PreviousVersion):
                 )
 
         # Inherit builds
-        for build in data.get('builds', []):
-            if 'valid' in build:
-                build['status'] = ('FAIL', 'PASS')[build.pop('valid')]
+        elif obj_list_name == 'builds':
+            if 'valid' in obj:
+                obj = obj.copy()
+                obj['status'] = ('FAIL', 'PASS')[obj.pop('valid')]
 
         # Inherit tests
-        waived_issue_id = None
-        waived_issue_version = 1
-        for test in data.get('tests', []):
+        elif obj_list_name == 'tests':
             # If the path is invalid in the new schema
-            test_path = test.get('path', None)
+            test_path = obj.get('path', None)
             if not (test_path is None or
                     Version.test_path_re.match(test_path)):
                 raise InheritanceImpossible(
                     f"Test path {test_path!r} is invalid, ambiguous, "
                     f"and cannot be inherited as is. Correct and retry."
                 )
+            if 'waived' in obj:
+                obj = obj.copy()
             # Only add incidents for waived tests
-            if not test.pop('waived', None):
-                continue
-            # Add the waived issue, if not added yet
-            if waived_issue_id is None:
+            if obj.pop('waived', None):
                 waived_issue_id = "_:waived"
-                data.setdefault('issues', []).append(dict(
-                    id=waived_issue_id,
+                waived_issue_version = 1
+                # Add the waived issue, if not added yet
+                if "waived_issue_added" not in state:
+                    state["waived_issue_added"] = True
+                    added_objs.append(('issues', dict(
+                        id=waived_issue_id,
+                        origin="_",
+                        version=waived_issue_version,
+                        comment="Test waived as unreliable",
+                    )))
+                # Add the incident
+                test_id = obj['id']
+                added_objs.append(('incidents', dict(
+                    # Raise TypeError if any of these vars are None
+                    id=waived_issue_id + ':' +
+                    str(waived_issue_version) + ':' +
+                    test_id,
                     origin="_",
-                    version=waived_issue_version,
-                    comment="Test waived as unreliable",
-                ))
-            # Add the incident
-            test_id = test['id']
-            data.setdefault('incidents', []).append(dict(
-                # Raise TypeError if any of these vars are None
-                id=waived_issue_id + ':' +
-                str(waived_issue_version) + ':' +
-                test_id,
-                origin="_",
-                issue_id=waived_issue_id,
-                issue_version=waived_issue_version,
-                test_id=test_id,
-                present=True,
-            ))
+                    issue_id=waived_issue_id,
+                    issue_version=waived_issue_version,
+                    test_id=test_id,
+                    present=True,
+                )))
 
         # Inherit issues
-        for issue in data.get("issues", []):
-            issue.pop("build_valid", None)
-            issue.pop("test_status", None)
+        elif obj_list_name == "issues":
+            if "build_valid" in obj or "test_status" in obj:
+                obj = obj.copy()
+                obj.pop("build_valid", None)
+                obj.pop("test_status", None)
 
         # Prohibit '\0' characters
-        def prohibit_null(data):
-            if isinstance(data, list):
-                for value in data:
-                    prohibit_null(value)
-            elif isinstance(data, dict):
-                for key, value in data.items():
-                    if key != 'misc':
-                        prohibit_null(value)
-            elif isinstance(data, str) and '\0' in data:
-                raise InheritanceImpossible(
-                    f"Cannot inherit a string containing '\0' characters: "
-                    f"{data!r}"
-                )
-        prohibit_null(data)
+        _prohibit_null(obj)
 
-        return data
+        return obj, added_objs
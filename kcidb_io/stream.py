@@ -0,0 +1,277 @@
+"""Kernel CI reporting I/O data - streaming definitions"""
+
+import re
+import json
+import codecs
+
+# The number of characters to read from a stream at once, initially
+READ_SIZE = 65536
+
+# Characters considered whitespace by JSON
+WHITESPACE = " \t\n\r"
+
+# The regular expression matching the characters, which could continue a
+# number, up to the end of text
+NUMBER_TAIL_RE = re.compile(r"[0-9.eE+-]*\Z")
+
+
+class _Parser:
+    """An incremental parser of a JSON object's top level"""
+
+    def __init__(self, stream):
+        """
+        Initialize the parser.
+
+        Args:
+            stream: The file-like object to read the JSON text or its UTF-8
+                    encoding from.
+        """
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.byte_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        # The buffered text, and the position in it
+        self.buf = ""
+        self.pos = 0
+        # True if the stream was read to the end
+        self.eof = False
+
+    def read(self, size):
+        """
+        Read more text into the buffer, dropping the parsed part.
+
+        Args:
+            size:   The (minimum) number of characters to read.
+
+        Returns:
+            True if more text was read, False if the stream has ended.
+        """
+        chunk = ""
+        # Short reads could end inside a multi-byte character
+        while not chunk:
+            if self.eof:
+                return False
+            raw_chunk = self.stream.read(size)
+            self.eof = not raw_chunk
+            chunk = raw_chunk if isinstance(raw_chunk, str) else \
+                self.byte_decoder.decode(raw_chunk, final=self.eof)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def error(self, msg):
+        """Create a JSON decoding error at the current position"""
+        return json.JSONDecodeError(msg, self.buf, self.pos)
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character, without consuming it.
+
+        Returns:
+            The next character, or an empty string at the end of stream.
+        """
+        while True:
+            while self.pos < len(self.buf) and \
+                    self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.read(READ_SIZE):
+                return ""
+
+    def expect(self, chars):
+        """
+        Skip whitespace and consume the next character, which must be one of
+        the specified ones.
+
+        Args:
+            chars:  A string of the acceptable characters.
+
+        Returns:
+            The consumed character.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise self.error(
+                "Expecting " + " or ".join(repr(c) for c in chars)
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Skip whitespace and parse the next complete JSON value.
+
+        Returns:
+            The parsed value.
+        """
+        self.peek()
+        size = READ_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number followed only by the characters which could
+                # continue it, at the end of the buffer, could be cut off
+                if self.eof or not isinstance(value, (int, float)) or \
+                        NUMBER_TAIL_RE.match(self.buf, end) is None:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Read more, growing reads to avoid quadratic re-parsing
+            self.read(size)
+            size *= 2
+
+    def items(self, name):
+        """
+        Parse an array, yielding its items.
+
+        Args:
+            name:   The name of the property the array belongs to.
+
+        Yields:
+            A tuple for each item: the property name, the item index, and
+            the item value.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield name, index, self.value()
+            index += 1
+            if self.expect(",]") == "]":
+                break
+
+    def __iter__(self):
+        """
+        Parse the top-level object.
+
+        Yields:
+            A tuple for each top-level property, and each item of a
+            top-level array property: the property name, the item index, and
+            the value. The index is None for whole property values, which
+            are empty lists for arrays, followed by their items.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+        else:
+            while True:
+                if self.peek() != '"':
+                    raise self.error("Expecting property name")
+                name = self.value()
+                self.expect(":")
+                if self.peek() == "[":
+                    yield name, None, []
+                    yield from self.items(name)
+                else:
+                    yield name, None, self.value()
+                if self.expect(",}") == "}":
+                    break
+        if self.peek():
+            raise self.error("Extra data")
+
+
+def parse(stream):
+    """
+    Parse a JSON object from a stream incrementally, yielding its top-level
+    properties, and the items of top-level arrays one by one, so that only
+    one of them needs to be kept in memory at a time.
+
+    Args:
+        stream: The file-like object to read the JSON text (or its UTF-8
+                encoding) from.
+
+    Returns:
+        A generator of tuples, one for each top-level property, and each item
+        of a top-level array: the property name, the item index, and the
+        value. The index is None for whole property values, which are empty
+        lists for arrays, followed by the tuples for their items.
+
+    Raises:
+        json.JSONDecodeError - the stream doesn't contain a valid JSON
+                               object. The error position is relative to the
+                               buffered part of the stream.
+    """
+    return iter(_Parser(stream))
+
+
+class Writer:
+    """
+    An incremental writer of a JSON object, accepting its top-level
+    properties, and the items of top-level arrays, one by one.
+    """
+
+    def __init__(self, stream):
+        """
+        Initialize the writer, and start the object.
+
+        Args:
+            stream: The text file-like object to write the JSON text to.
+        """
+        self.stream = stream
+        # The name of the array being written, if any
+        self.array_name = None
+        # The separators to write before the next property, and array item
+        self.separator = self.item_separator = ""
+        stream.write("{")
+
+    def write(self, name, index, value):
+        """
+        Write a top-level property, or an item of a top-level array, in the
+        format generated by parse().
+
+        Args:
+            name:   The name of the property.
+            index:  The index of the array item, or None for the whole
+                    property value, which is an empty list for arrays, to
+                    be followed by their items.
+            value:  The property value, or the array item.
+        """
+        if index is None:
+            if self.array_name is not None:
+                self.stream.write("]")
+                self.array_name = None
+            self.stream.write(self.separator + json.dumps(name) + ": ")
+            self.separator = ", "
+            if value == [] and isinstance(value, list):
+                self.stream.write("[")
+                self.array_name = name
+                self.item_separator = ""
+            else:
+                self.stream.write(json.dumps(value))
+        else:
+            assert name == self.array_name, \
+                "Array item doesn't follow its array, or other items"
+            self.stream.write(self.item_separator + json.dumps(value))
+            self.item_separator = ", "
+
+    def close(self):
+        """Finish the object"""
+        if self.array_name is not None:
+            self.stream.write("]")
+            self.array_name = None
+        self.stream.write("}")
+
+
+def dump(items, stream):
+    """
+    Write a JSON object to a stream incrementally, from its top-level
+    properties, and the items of top-level arrays, in the format generated
+    by parse(), so that only one of them needs to be kept in memory at a
+    time.
+
+    Args:
+        items:  An iterable of tuples, one for each top-level property, and
+                each item of a top-level array: the property name, the item
+                index, and the value. The index is None for whole property
+                values, which are empty lists for arrays, to be followed by
+                the tuples for their items.
+        stream: The text file-like object to write the JSON text to.
+    """
+    writer = Writer(stream)
+    for item in items:
+        writer.write(*item)
+    writer.close()
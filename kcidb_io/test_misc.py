@@ -1,7 +1,8 @@
 """Tests for miscellaneous definitions"""
 
 import math
-from kcidb_io.misc import json_cmp
+from kcidb_io import misc
+from kcidb_io.misc import JSON_TYPES, json_cmp, json_digest, json_sort_key
 
 
 def test_json_cmp():
@@ -38,3 +39,37 @@ def test_json_cmp():
     assert json_cmp(dict(a=[1, 2], b=[2, 3]),
                     dict(b=[3, 2], a=[2, 1]),
                     set_depth=math.inf) == 0
+
+
+def test_json_digest():
+    """Check json_digest() agrees with json_cmp() on equality"""
+    values = [
+        None, True, False, 0, 1, -1, 0.0, -0.0, 1.0, 10 ** 30, "", "1",
+        "-0.0", "é", [], [1, 10], [10, 1], [[1, 2], [2, 1]], [0.0], [-0.0],
+        {}, dict(a=1), dict(a=1.0), dict(a=True), dict(a=[1, 2], b=[2, 3]),
+        dict(b=[3, 2], a=[2, 1]), dict(a=[dict(b=[1, 2])]),
+        dict(a=[dict(b=[2, 1])]), [float("nan")], [float("inf")],
+    ]
+    for set_depth in (0, 1, 2, 3, math.inf):
+        for a in values:
+            for b in values:
+                assert (json_digest(a, set_depth) ==
+                        json_digest(b, set_depth)) == \
+                    (json_sort_key(a, set_depth) ==
+                     json_sort_key(b, set_depth)), \
+                    f"Disagreement on {a!r} and {b!r} at {set_depth}"
+    assert json_digest([1, 10], set_depth=1) == \
+        json_digest([10, 1], set_depth=1)
+    assert json_digest([1, 10]) != json_digest([10, 1])
+    assert json_digest(dict(a=1, b=2)) == json_digest(dict(b=2, a=1))
+
+
+def test_json_encode_tags():
+    """Check each canonical encoding tag is used by one JSON type only"""
+    tags = {}
+    # Containers are encoded with digests (not JSON text) at set depth one
+    for value in (None, True, False, 0, 1.0, "", [], {}):
+        # Private, but tested, pylint: disable=protected-access
+        tag = misc._json_encode(value, 1)[:1]
+        assert tags.setdefault(tag, JSON_TYPES[type(value)]) == \
+            JSON_TYPES[type(value)], f"Tag {tag!r} is shared"
@@ -0,0 +1,116 @@
+"""Tests for streaming definitions"""
+
+import io
+import json
+import pytest
+from kcidb_io import stream
+
+
+@pytest.mark.parametrize("read_size", [1, 3, stream.READ_SIZE])
+def test_parse(monkeypatch, read_size):
+    """Check parse() works correctly"""
+    monkeypatch.setattr(stream, "READ_SIZE", read_size)
+    value = dict(
+        a=None, b=[], c=[1, 23456, -7.5e10, "é", [[]], dict(x={})],
+        d=dict(e=[1, 2]), f=12345678901234567890, g="\0",
+    )
+    expected = [
+        ("a", None, None),
+        ("b", None, []),
+        ("c", None, []),
+        ("c", 0, 1),
+        ("c", 1, 23456),
+        ("c", 2, -7.5e10),
+        ("c", 3, "é"),
+        ("c", 4, [[]]),
+        ("c", 5, dict(x={})),
+        ("d", None, dict(e=[1, 2])),
+        ("f", None, 12345678901234567890),
+        ("g", None, "\0"),
+    ]
+    for indent in (None, 4):
+        text = json.dumps(value, indent=indent)
+        assert list(stream.parse(io.StringIO(text))) == expected
+        assert list(stream.parse(io.BytesIO(text.encode()))) == expected
+    assert not list(stream.parse(io.StringIO(" { } ")))
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 4, 5, 7])
+def test_parse_numbers(monkeypatch, read_size):
+    """Check parse() doesn't cut numbers at read boundaries"""
+    monkeypatch.setattr(stream, "READ_SIZE", read_size)
+    values = [1.5e10, 12, -3, 0.25, 1e-7, 123456789, -1.5E+10]
+    for value in values:
+        text = '{"abc": ' + json.dumps(value) + '}'
+        assert list(stream.parse(io.StringIO(text))) == [("abc", None, value)]
+    text = '{"abc": [' + ", ".join(map(json.dumps, values)) + ']}'
+    assert [item[2] for item in stream.parse(io.StringIO(text))] == \
+        [[]] + values
+
+
+class ShortReadStream(io.RawIOBase):
+    """A raw stream returning at most one byte per read"""
+
+    def __init__(self, data):
+        """Initialize the stream with the bytes to return"""
+        super().__init__()
+        self.data = data
+        self.pos = 0
+
+    def readable(self):
+        """Check the stream is readable"""
+        return True
+
+    def read(self, size=-1):
+        """Read at most one byte"""
+        chunk = self.data[self.pos:self.pos + min(1, size)]
+        self.pos += len(chunk)
+        return chunk
+
+
+def test_parse_short_reads():
+    """Check parse() handles reads ending inside multi-byte characters"""
+    text = '{"a": ["é", 1, "日本"]}'
+    assert list(stream.parse(ShortReadStream(text.encode()))) == [
+        ("a", None, []), ("a", 0, "é"), ("a", 1, 1), ("a", 2, "日本"),
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "", "[]", "1", "{", "{]", '{"a"}', '{"a": }', '{"a": 1,}', '{"a": [1,]}',
+    '{"a": [1 2]}', '{"a": 1} 2', '{1: 2}',
+])
+def test_parse_invalid(text):
+    """Check parse() detects invalid JSON"""
+    with pytest.raises(json.JSONDecodeError):
+        list(stream.parse(io.StringIO(text)))
+
+
+def test_dump():
+    """Check dump() writes what parse() reads"""
+    value = dict(
+        a=None, b=[], c=[1, 23456, -7.5e10, "é", [[]], dict(x={})],
+        d=dict(e=[1, 2]), f=12345678901234567890, g="\0",
+    )
+    text = json.dumps(value)
+    output = io.StringIO()
+    stream.dump(stream.parse(io.StringIO(text)), output)
+    assert output.getvalue() == text
+    assert json.loads(output.getvalue()) == value
+    output = io.StringIO()
+    stream.dump([], output)
+    assert output.getvalue() == "{}"
+
+
+def test_writer():
+    """Check Writer writes items pushed one by one"""
+    output = io.StringIO()
+    writer = stream.Writer(output)
+    writer.write("a", None, [])
+    writer.write("a", 0, 1)
+    writer.write("a", 1, dict(b=2))
+    writer.write("c", None, "d")
+    writer.write("e", None, [])
+    writer.close()
+    assert json.loads(output.getvalue()) == dict(a=[1, dict(b=2)], c="d",
+                                                 e=[])
@@ -1,5 +1,7 @@
 """kcidb_io module test"""
 
+import sys
+import subprocess
 import unittest
 from kcidb_io.misc import LIGHT_ASSERTS
 
@@ -12,3 +14,28 @@ class LightAssertsTestCase(unittest.TestCase):
         self.assertFalse(LIGHT_ASSERTS,
                          "Tests must run with KCIDB_IO_HEAVY_ASSERTS "
                          "environment variable set to a non-empty string")
+
+
+class LazyLoadingTestCase(unittest.TestCase):
+    """Lazy loading test case"""
+
+    def test_import_loads_no_schemas(self):
+        """Check importing the package doesn't load schema versions"""
+        output = subprocess.check_output([
+            sys.executable, "-c",
+            "import sys, kcidb_io; "
+            "print(sorted(m for m in sys.modules "
+            "if m.startswith('kcidb_io.schema.')))"
+        ], text=True)
+        self.assertEqual(output.strip(), "[]")
+
+    def test_access_loads_schemas(self):
+        """Check accessing schema versions loads them"""
+        # It's lazy, pylint: disable=import-outside-toplevel
+        from kcidb_io import schema
+        self.assertIs(schema.LATEST, schema.V5_3)
+        self.assertIs(schema.V1, schema.V1_1)
+        self.assertIs(schema.get(4, 0), schema.V4)
+        self.assertIn("V4_5", dir(schema))
+        with self.assertRaises(AttributeError):
+            _ = schema.V0